@@ -0,0 +1,122 @@
+"""
+Compare the size, write time and load time of plain, .yml.gz and .yml.zst logs
+(see faid.logging.set_log_compression) on realistic logs:
+
+- a fairness experiment log with sampled rows and attribution lists,
+- a data card with Croissant-style field metadata,
+- the bundled risk register example.
+
+The load time is a full parse from disk (bypassing the document cache), and
+"peak" is the peak memory allocated while loading, measured with tracemalloc.
+
+Usage: python <path to>/benchmarks/bench_compression.py [--rows 2000] [--repeat 3]
+Like any faid script, run it from a project folder (e.g. one of the demos),
+not from the repository root where `faid/logging` shadows the standard library.
+"""
+import os
+import sys
+import random
+import argparse
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from faid.logging import FaidProject, get_current_folder_path, set_log_compression
+from faid.logging import serializer
+from faid.logging.yaml_utils import read, write
+from faid.logging.log_compression import find_log_file
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        result = fn()
+        timings.append(perf_counter() - start)
+    return min(timings), result
+
+
+def fairness_log(rows:int) -> dict:
+    rng = random.Random(0)
+    features = [f"feature_{i}" for i in range(20)]
+    def example():
+        return {"features": {name: rng.choice([rng.randint(0, 90), rng.random(), rng.choice(["a", "b", "c"])]) for name in features},
+                "y_true": rng.randint(0, 1), "y_pred": rng.randint(0, 1), "group": rng.choice(["female", "male"])}
+    return {
+        "id": "2024-05-01T10:00:00",
+        "name": "benchmark",
+        "context": {"description": "A benchmark experiment", "tags": ["nlp"], "start_time": "2024-05-01T10:00:00"},
+        "data": {"sample": [example() for _ in range(rows)]},
+        "model": {"name": "bert", "captum_records": [
+            {"word_attributions": [round(rng.uniform(-1, 1), 6) for _ in range(128)], "pred_prob": rng.random(),
+             "pred_class": "pos", "true_class": "pos", "attr_class": "pos", "attr_score": rng.random(),
+             "raw_input_ids": [f"token_{rng.randint(0, 5000)}" for _ in range(128)], "convergence_score": None}
+            for _ in range(rows // 10)]},
+        "sample_data": {cell: [example() for _ in range(10)] for cell in ["tps", "fps", "tns", "fns"]},
+        "bias_metrics": [{"group_name": group, "metrics": [{"name": "accuracy", "value": rng.random()},
+                                                          {"name": "selection_rate", "value": rng.random()}]}
+                         for group in ["female", "male", "overall"]],
+    }
+
+
+def data_card(rows:int) -> dict:
+    rng = random.Random(1)
+    return {
+        "description": {"name": "benchmark", "summary": "A Croissant-style dataset description"},
+        "croissant": {"@type": "sc:Dataset", "recordSet": [
+            {"@type": "cr:RecordSet", "name": f"table_{t}", "field": [
+                {"@type": "cr:Field", "name": f"table_{t}/column_{c}", "description": f"Column {c} of table {t}",
+                 "dataType": rng.choice(["sc:Integer", "sc:Text", "sc:Float"]),
+                 "source": {"fileObject": {"@id": f"table_{t}.csv"}, "extract": {"column": f"column_{c}"}}}
+                for c in range(rows // 20)]}
+            for t in range(20)]},
+    }
+
+
+def risk_register() -> dict:
+    with open(os.path.join(get_current_folder_path(), "template_example_descriptions", "risks_template_description.yml")) as file:
+        return serializer.parse(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="number of sampled rows (and scale of the other logs)")
+    parser.add_argument("--repeat", type=int, default=3, help="keep the best of this many runs")
+    args = parser.parse_args()
+
+    codecs = ["plain", "gz"]
+    try:
+        import zstandard  # noqa: F401
+        codecs.append("zst")
+    except ImportError:
+        print("zstandard is not installed, skipping .yml.zst")
+
+    logs = {"fairness_benchmark": fairness_log(args.rows), "data": data_card(args.rows), "risks": risk_register()}
+    print(f"{'log':<20} {'codec':<6} {'size':>10} {'ratio':>6} {'write':>8} {'load':>8} {'peak':>9}")
+    with tempfile.TemporaryDirectory() as root:
+        project = FaidProject(root)
+        os.makedirs(project.log_path)
+        with project.activate():
+            for name, document in logs.items():
+                filename = project.get_log_file_path(name)
+                plain_size = None
+                for codec in codecs:
+                    set_log_compression(name.split("_")[0], codec)
+                    write_time, _ = best_of(args.repeat, lambda: write(document, filename))
+                    size = os.path.getsize(find_log_file(filename))
+                    plain_size = plain_size or size
+                    load_time, loaded = best_of(args.repeat, lambda: read(filename))
+                    assert loaded == document
+                    tracemalloc.start()
+                    read(filename)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    print(f"{name:<20} {codec:<6} {size / 1e3:>8.1f}KB {plain_size / size:>5.1f}x "
+                          f"{write_time * 1e3:>6.1f}ms {load_time * 1e3:>6.1f}ms {peak / 1e6:>7.1f}MB")
+        project.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Stress test of concurrent writers on one logs/faid folder: N worker processes
+add risk entries to the same risk register, then the entries that made it to
+the file are counted. Reports the throughput and the number of lost updates.
+
+Usage: python <path to>/benchmarks/bench_concurrent_writers.py [--workers 32] [--entries 20]
+Like any faid script, run it from a project folder (e.g. one of the demos),
+not from the repository root where `faid/logging` shadows the standard library.
+"""
+import os
+import sys
+import argparse
+import tempfile
+import multiprocessing
+from time import perf_counter
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def worker(root, worker_id, entries, ready, start):
+    os.chdir(root)
+    from faid.logging import add_risk_entry, flush
+    ready.release()
+    start.wait()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for i in range(entries):
+            add_risk_entry(f"worker {worker_id} risk {i}", "Low", "Low", "None")
+        flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=32, help="number of concurrent writer processes")
+    parser.add_argument("--entries", type=int, default=20, help="risk entries added by each worker")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        os.chdir(root)
+        from faid.logging import init_log, get_risk_entries
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            init_log()
+        initial = len(get_risk_entries())
+
+        # start timing once every worker has imported faid
+        context = multiprocessing.get_context("spawn")
+        ready, start = context.Semaphore(0), context.Event()
+        workers = [context.Process(target=worker, args=(root, w, args.entries, ready, start))
+                   for w in range(args.workers)]
+        for process in workers:
+            process.start()
+        for _ in workers:
+            ready.acquire()
+        started = perf_counter()
+        start.set()
+        for process in workers:
+            process.join()
+        elapsed = perf_counter() - started
+
+        expected = args.workers * args.entries
+        written = len(get_risk_entries()) - initial
+        print(f"workers: {args.workers}, entries per worker: {args.entries}")
+        print(f"elapsed: {elapsed:.2f}s, throughput: {expected / elapsed:.1f} entries/s")
+        print(f"written: {written}/{expected}, lost updates: {expected - written}")
+
+
+if __name__ == "__main__":
+    main()
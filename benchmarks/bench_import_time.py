@@ -0,0 +1,85 @@
+"""
+Import-time regression check: imports each faid subpackage in a fresh interpreter
+with `python -X importtime`, and compares its cumulative import time (the median of
+a few runs) to a budget. Also checks that the heavy dependencies, which are loaded
+on first use only, are not imported.
+
+Exits with status 1 if a budget is exceeded or a heavy dependency is imported.
+
+Usage: python <path to>/benchmarks/bench_import_time.py [--repeat 5] [--scale 1.0]
+`--scale` multiplies the budgets, e.g. on slow CI machines.
+"""
+import os
+import sys
+import argparse
+import tempfile
+import subprocess
+from statistics import median
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# cumulative import time budgets in milliseconds
+BUDGETS = {
+    "faid.logging": 150,
+    "faid.report": 50,
+}
+
+# modules that must not be loaded by `import <subpackage>`
+HEAVY_MODULES = ["fairlearn", "pandas", "sklearn", "scipy", "matplotlib", "plotly", "pkg_resources", "jinja2"]
+
+
+def import_time(module):
+    """
+    Import a module in a fresh interpreter, return its cumulative import time (ms)
+    and the names of all modules it imported
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get("PYTHONPATH", "")]))
+    # run from an empty folder, not the repository root where `faid/logging` shadows the standard library
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                cwd=cwd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    cumulative = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if not total.strip().isdigit():
+            continue  # the header
+        imported.add(name)
+        if name == module:
+            cumulative = int(total) / 1000
+    return cumulative, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="number of fresh interpreters per subpackage")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the budgets by this factor")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'subpackage':<15}{'import (ms)':>13}{'budget (ms)':>13}  heavy modules")
+    for module, budget in BUDGETS.items():
+        budget *= args.scale
+        times = []
+        heavy = set()
+        for _ in range(args.repeat):
+            elapsed, imported = import_time(module)
+            times.append(elapsed)
+            heavy |= {name for name in imported if name.split(".")[0] in HEAVY_MODULES}
+        elapsed = median(times)
+        heavy = sorted({name.split(".")[0] for name in heavy})
+        ok = elapsed <= budget and not heavy
+        failed |= not ok
+        print(f"{module:<15}{elapsed:>13.1f}{budget:>13.0f}  {', '.join(heavy) or '-'}{'' if ok else '  FAIL'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare the libyaml (C) and pure-Python serializer paths of faid.logging
+on the bundled template_example_descriptions logs scaled up 1000x.
+
+Usage: python <path to>/benchmarks/bench_yaml_serializer.py [--scale 1000] [--repeat 3]
+Like any faid script, run it from a project folder (e.g. one of the demos),
+not from the repository root where `faid/logging` shadows the standard library.
+"""
+import os
+import sys
+import glob
+import copy
+import argparse
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from faid.logging import get_current_folder_path
+from faid.logging import serializer
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        result = fn()
+        timings.append(perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1000, help="how many copies of each log to serialize")
+    parser.add_argument("--repeat", type=int, default=3, help="keep the best of this many runs")
+    args = parser.parse_args()
+
+    if not serializer.LIBYAML:
+        print("PyYAML was built without libyaml, only the pure-Python path is available.")
+
+    files = sorted(glob.glob(os.path.join(get_current_folder_path(), "template_example_descriptions", "*.yml")))
+    print(f"{'log':<45} {'size':>9} {'dump py':>9} {'dump c':>9} {'load py':>9} {'load c':>9} {'same':>5}")
+    for filename in files:
+        with open(filename) as file:
+            document = serializer.parse(file)
+        scaled = {f"entry_{i}": copy.deepcopy(document) for i in range(args.scale)}
+
+        dump_py, text_py = best_of(args.repeat, lambda: serializer.dump(scaled, fast=False))
+        dump_c, text_c = best_of(args.repeat, lambda: serializer.dump(scaled, fast=True))
+        load_py, _ = best_of(args.repeat, lambda: serializer.parse(text_py, fast=False))
+        load_c, _ = best_of(args.repeat, lambda: serializer.parse(text_py, fast=True))
+
+        print(f"{os.path.basename(filename):<45} {len(text_py) / 1e6:>7.1f}MB "
+              f"{dump_py:>8.2f}s {dump_c:>8.2f}s {load_py:>8.2f}s {load_c:>8.2f}s {str(text_py == text_c):>5}")
+
+
+if __name__ == "__main__":
+    main()
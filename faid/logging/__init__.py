@@ -5,77 +5,138 @@ from faid.logging.message import (
     warning_msg
 )
 
+from faid.logging.project import (
+    FaidProject,
+    get_project,
+    get_default_project
+)
+
 from faid.logging.yaml_utils import (
     update, 
     load, 
+    load_section,
+    flush,
+    set_flush_interval,
+    get_cache_info,
+    set_cache_size,
+    compact_journal,
+    transaction,
+    set_storage_backend,
+    get_storage_backend,
     get_project_log_path,
     get_current_folder_path
 )
 
-from faid.logging.model_card_utils import (
-    ModelCard,
-    initialize_model_log,
-    get_model_log_file_path,
-    get_model_entry
-)
-
-from faid.logging.data_card_utils import (
-    DataCard,
-    initialize_data_log,
-    get_data_log_path,
-    pretty_croissant,
-    pretty_croissant_rai,
-    pretty_uci_metadata,
-    get_data_entry
+from faid.logging.log_compression import (
+    set_log_compression,
+    get_log_compression
 )
 
-from faid.logging.fairness_utils import (
-    FairnessExperimentRecord,
-    initialize_fairness_experiment_log,
-    get_fairness_experiment_log_path,
-    pretty_aisi_summary
+from faid.logging.backends import (
+    StorageBackend,
+    YamlBackend,
+    SQLiteBackend
 )
 
-from faid.logging.risk_register_utils import (
-    initialize_risk_log,
-    get_risk_register_log_path,
-    add_risk_entry,
-    get_risk_entries,
-    add_assumption_entry,
-    get_assumption_entries,
-    add_issue_entry,
-    get_issue_entries,
-    add_dependency_entry,
-    get_dependency_entries
+from faid.logging.writer import BackgroundWriter
 
-)
+# The modules below are imported on first use of one of their names (PEP 562),
+# so `import faid.logging` does not load fairlearn, pandas or pkg_resources
+_lazy_imports = {
+    'faid.logging.model_card_utils': [
+        'ModelCard',
+        'initialize_model_log',
+        'get_model_log_file_path',
+        'get_model_entry'
+    ],
+    'faid.logging.data_card_utils': [
+        'DataCard',
+        'initialize_data_log',
+        'get_data_log_path',
+        'pretty_croissant',
+        'pretty_croissant_rai',
+        'pretty_uci_metadata',
+        'get_data_entry'
+    ],
+    'faid.logging.fairness_utils': [
+        'FairnessExperimentRecord',
+        'initialize_fairness_experiment_log',
+        'get_fairness_experiment_log_path',
+        'pretty_aisi_summary'
+    ],
+    'faid.logging.experiment_index': [
+        'ExperimentIndex',
+        'get_experiment_index',
+        'query_experiments',
+        'rebuild_experiment_index'
+    ],
+    'faid.logging.maintenance': [
+        'compact_log',
+        'compact_logs',
+        'archive_experiments',
+        'read_archive_index'
+    ],
+    'faid.logging.merge': [
+        'merge_logs'
+    ],
+    'faid.logging.watcher': [
+        'LogWatcher'
+    ],
+    'faid.logging.risk_register_utils': [
+        'initialize_risk_log',
+        'get_risk_register_log_path',
+        'add_risk_entry',
+        'get_risk_entries',
+        'add_assumption_entry',
+        'get_assumption_entries',
+        'add_issue_entry',
+        'get_issue_entries',
+        'add_dependency_entry',
+        'get_dependency_entries',
+        'RaidRegister',
+        'get_raid_register'
+    ],
+    'faid.logging.transparency_utils': [
+        'initialize_transparency_log',
+        'get_transparency_log_path',
+        'get_transparency_record',
+        'add_transparency_entry'
+    ],
+    'faid.logging.logging': [
+        'init_log'
+    ],
+    'faid.logging.utils': [
+        'get_imported_libraries',
+        'get_package_licenses'
+    ],
+    # Bring information from one to another
+    'faid.logging.sync': [
+        'sync_risk_to_model',
+        'sync_data_to_model',
+        'sync_model_to_risk',
+        'sync_data_to_risk',
+        'sync_risk_to_data',
+        'sync_risk_to_transparency',
+        'sync_data_to_transparency',
+        'sync_model_to_transparency',
+        'sync_all',
+        'plan_sync',
+        'reset_sync_state',
+        'affected_edges'
+    ]
+}
+_lazy_names = {name: module for module, names in _lazy_imports.items() for name in names}
 
-from faid.logging.transparency_utils import (
-    initialize_transparency_log,
-    get_transparency_log_path,
-    get_transparency_record,
-    add_transparency_entry
-)
+def __getattr__(name):
+    if name in _lazy_names:
+        import importlib
+        value = getattr(importlib.import_module(_lazy_names[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-from faid.logging.logging import (
-    init_log
-)
-
-from faid.logging.utils import (
-    get_imported_libraries,
-    get_package_licenses
-)
-
-# Bring information from one to another
-from faid.logging.sync import (
-    sync_risk_to_model,
-    sync_data_to_model,
-    sync_model_to_risk,
-    sync_risk_to_data,
-    sync_risk_to_transparency,
-    sync_data_to_transparency,
-    sync_model_to_transparency,
-)
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_names))
 
 __all__ = [
     #logging
@@ -85,11 +146,33 @@ __all__ = [
     'success_msg',
     'info_msg',
     'warning_msg',
+    # project
+    'FaidProject',
+    'get_project',
+    'get_default_project',
     # yaml_utils
     'update',
     'load',
+    'load_section',
+    'flush',
+    'set_flush_interval',
+    'get_cache_info',
+    'set_cache_size',
+    'compact_journal',
+    'transaction',
+    'set_storage_backend',
+    'get_storage_backend',
     'get_project_log_path',
     'get_current_folder_path',
+    # log_compression
+    'set_log_compression',
+    'get_log_compression',
+    # backends
+    'StorageBackend',
+    'YamlBackend',
+    'SQLiteBackend',
+    # writer
+    'BackgroundWriter',
     # model_card_utils
     'get_model_log_file_path',
     'get_model_entry',
@@ -110,6 +193,20 @@ __all__ = [
     'initialize_fairness_experiment_log',
     'get_exp_ctx',
     'pretty_aisi_summary',
+    # experiment_index
+    'ExperimentIndex',
+    'get_experiment_index',
+    'query_experiments',
+    'rebuild_experiment_index',
+    # maintenance
+    'compact_log',
+    'compact_logs',
+    'archive_experiments',
+    'read_archive_index',
+    # merge
+    'merge_logs',
+    # watcher
+    'LogWatcher',
     # risk_register_utils
     'initialize_risk_log',
     'get_risk_register_log_path',
@@ -121,6 +218,8 @@ __all__ = [
     'get_issue_entries',
     'add_dependency_entry',
     'get_dependency_entries',
+    'RaidRegister',
+    'get_raid_register',
     # transparency_utils
     'initialize_transparency_log',
     'get_transparency_log_path',
@@ -130,10 +229,15 @@ __all__ = [
     'sync_risk_to_model',
     'sync_data_to_model',
     'sync_model_to_risk',
+    'sync_data_to_risk',
     'sync_risk_to_data',
     'sync_risk_to_transparency',
     'sync_data_to_transparency',
     'sync_model_to_transparency',
+    'sync_all',
+    'plan_sync',
+    'reset_sync_state',
+    'affected_edges',
     # utils
     'get_imported_libraries',
     'get_package_licenses'
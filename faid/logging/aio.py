@@ -0,0 +1,197 @@
+# %%
+"""
+Awaitable versions of the faid.logging entry points, for use inside asyncio event loops
+(e.g. inspect_ai tasks).
+
+The file I/O runs in a worker thread, so the event loop is never blocked. Writes to the
+same file are serialized with an asyncio lock, and the mutations made in the same loop
+tick are applied in one transaction, i.e. with a single write of the file:
+
+    await asyncio.gather(*(aio.add_risk_entry(...) for risk in risks))
+"""
+import asyncio
+import weakref
+from functools import partial
+
+from faid.logging import yaml_utils
+from faid.logging import risk_register_utils
+from faid.logging import transparency_utils
+from faid.logging.project import get_project
+
+# %%
+class _LoopState:
+    """
+    The per-file locks and the batches waiting to be written, for one event loop
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.locks = {}
+        self.pending = {}
+
+    def lock(self, filename:str) -> asyncio.Lock:
+        return self.locks.setdefault(filename, asyncio.Lock())
+
+    def submit(self, project, filename:str, mutation) -> asyncio.Future:
+        """
+        Add a mutation to the batch of a file, which is written on the next loop iteration
+        """
+        future = self.loop.create_future()
+        key = (project, filename)
+        if key not in self.pending:
+            self.pending[key] = []
+            self.loop.call_soon(self._dispatch, key)
+        self.pending[key].append((mutation, future))
+        return future
+
+    def _dispatch(self, key:tuple):
+        batch = self.pending.pop(key)
+        self.loop.create_task(self._write(*key, batch))
+
+    async def _write(self, project, filename:str, batch:list):
+        async with self.lock(filename):
+            try:
+                results = await asyncio.to_thread(_apply_batch, project, filename, [mutation for mutation, _ in batch])
+            except BaseException as e:
+                results = [(None, e)] * len(batch)
+            for (_, future), (result, error) in zip(batch, results):
+                if future.cancelled():
+                    continue
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+_states = weakref.WeakKeyDictionary()
+
+def _state() -> _LoopState:
+    loop = asyncio.get_running_loop()
+    state = _states.get(loop)
+    if state is None:
+        state = _states[loop] = _LoopState(loop)
+    return state
+
+def _apply_batch(project, filename:str, mutations:list) -> list:
+    """
+    Run the mutations of a batch in one transaction (in a worker thread).
+    An error in one mutation does not discard the others.
+    """
+    results = []
+    with project.activate(), yaml_utils.transaction(filename):
+        for mutation in mutations:
+            try:
+                results.append((mutation(), None))
+            except BaseException as e:
+                # error_msg exits, report it to the awaiting coroutine instead
+                results.append((None, e))
+    return results
+
+async def _mutate(filename:str, function, *args, **kwargs):
+    return await _state().submit(get_project(), yaml_utils.resolve_log_path(filename), partial(function, *args, **kwargs))
+
+async def _read(filename:str, function, *args, **kwargs):
+    async with _state().lock(yaml_utils.resolve_log_path(filename)):
+        return await asyncio.to_thread(function, *args, **kwargs)
+
+# %% yaml_utils
+async def load(filename:str, keys:list=None):
+    return await _read(filename, yaml_utils.load, filename, keys=keys)
+
+async def load_section(filename:str, key:str):
+    return await _read(filename, yaml_utils.load_section, filename, key)
+
+async def update(yaml_data, key:str=None, filename:str=None):
+    return await _mutate(filename, yaml_utils.update, yaml_data, key=key, filename=filename)
+
+async def append_entry(path:list, value, filename:str=None, op:str="set"):
+    return await _mutate(filename, yaml_utils.append_entry, path, value, filename=filename, op=op)
+
+async def flush(filename:str=None):
+    if filename is None:
+        return await asyncio.to_thread(yaml_utils.flush)
+    return await _read(filename, yaml_utils.flush, filename)
+
+# %% risk_register_utils
+async def add_risk_entry(description:str, impact:str, likelihood:str, mitigation:str):
+    return await _mutate(risk_register_utils.get_risk_register_log_path(), risk_register_utils.add_risk_entry,
+                         description, impact, likelihood, mitigation)
+
+async def add_assumption_entry(description:str, impact:str, action:str):
+    return await _mutate(risk_register_utils.get_risk_register_log_path(), risk_register_utils.add_assumption_entry,
+                         description, impact, action)
+
+async def add_issue_entry(description:str, impact:str, status:str, action:str):
+    return await _mutate(risk_register_utils.get_risk_register_log_path(), risk_register_utils.add_issue_entry,
+                         description, impact, status, action)
+
+async def add_dependency_entry(description:str, impact:str, status:str, action:str):
+    return await _mutate(risk_register_utils.get_risk_register_log_path(), risk_register_utils.add_dependency_entry,
+                         description, impact, status, action)
+
+async def get_risk_entries():
+    return await _read(risk_register_utils.get_risk_register_log_path(), risk_register_utils.get_risk_entries)
+
+async def get_assumption_entries():
+    return await _read(risk_register_utils.get_risk_register_log_path(), risk_register_utils.get_assumption_entries)
+
+async def get_issue_entries():
+    return await _read(risk_register_utils.get_risk_register_log_path(), risk_register_utils.get_issue_entries)
+
+async def get_dependency_entries():
+    return await _read(risk_register_utils.get_risk_register_log_path(), risk_register_utils.get_dependency_entries)
+
+# %% transparency_utils
+async def add_transparency_entry(key, entry):
+    return await _mutate(transparency_utils.get_transparency_log_path(), transparency_utils.add_transparency_entry, key, entry)
+
+async def get_transparency_record():
+    return await _read(transparency_utils.get_transparency_log_path(), transparency_utils.get_transparency_record)
+
+# %% fairness_utils
+class FairnessExperimentRecord:
+    """
+    An awaitable wrapper of faid.logging.FairnessExperimentRecord.
+    Create it with `record = await FairnessExperimentRecord.open(name)`.
+    """
+
+    def __init__(self, record):
+        self.record = record
+
+    @classmethod
+    async def open(cls, name:str, journal:bool=False):
+        from faid.logging.fairness_utils import FairnessExperimentRecord as Record
+        return cls(await asyncio.to_thread(Record, name, journal=journal))
+
+    @property
+    def filename(self) -> str:
+        return self.record.filename
+
+    def __getattr__(self, name:str):
+        # getters and attributes (e.g. get_context_entry, metrics) are served from memory
+        return getattr(self.record, name)
+
+    async def _mutate(self, function, *args, **kwargs):
+        # write in the project the record was opened in
+        with self.record.project.activate():
+            return await _mutate(self.filename, function, *args, **kwargs)
+
+    async def add_context_entry(self, key:str, entry):
+        return await self._mutate(self.record.add_context_entry, key, entry)
+
+    async def add_data_entry(self, key:str, entry):
+        return await self._mutate(self.record.add_data_entry, key, entry)
+
+    async def add_sample_data_entry(self, key:str, entry):
+        return await self._mutate(self.record.add_sample_data_entry, key, entry)
+
+    async def add_model_entry(self, key:str, entry):
+        return await self._mutate(self.record.add_model_entry, key, entry)
+
+    async def add_metric_entry(self, entry:dict={}):
+        return await self._mutate(self.record.add_metric_entry, entry)
+
+    async def add_metric_entry_from_fairlearn(self, entry):
+        return await self._mutate(self.record.add_metric_entry_from_fairlearn, entry)
+
+    async def set_context(self, **kwargs):
+        return await self._mutate(self.record.set_context, **kwargs)
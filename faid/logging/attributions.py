@@ -0,0 +1,113 @@
+# %%
+import io
+import os
+import hashlib
+
+from faid.logging import warning_msg
+from faid.logging.file_utils import atomic_open
+
+# The fields of captum's VisualizationDataRecord, in the order of its constructor
+ATTRIBUTION_FIELDS = [
+    "word_attributions",
+    "pred_prob",
+    "pred_class",
+    "true_class",
+    "attr_class",
+    "attr_score",
+    "raw_input_ids",
+    "convergence_score"
+]
+
+# %%
+def get_attribution_folder(filename:str) -> str:
+    """
+    Get the folder of the attribution arrays kept next to an experiment log
+    """
+    return os.path.splitext(filename)[0] + ".attributions"
+
+def is_array_reference(value) -> bool:
+    """
+    Check if a logged value refers to an array stored next to the log
+    """
+    return isinstance(value, dict) and value.get("format") == "npy" and "path" in value
+
+def save_array(filename:str, name:str, array) -> dict:
+    """
+    Write an array as a .npy file in the attribution folder of a log,
+    and return the reference to keep in the log: path, shape, dtype and checksum
+    """
+    import numpy as np
+
+    buffer = io.BytesIO()
+    np.save(buffer, np.ascontiguousarray(array), allow_pickle=False)
+    content = buffer.getvalue()
+    checksum = hashlib.sha256(content).hexdigest()
+
+    folder = get_attribution_folder(filename)
+    os.makedirs(folder, exist_ok=True)
+    # the checksum in the name keeps the arrays of earlier (or rolled back) entries intact
+    path = os.path.join(folder, f"{name}_{checksum[:12]}.npy")
+    if not os.path.exists(path):
+        with atomic_open(path, 'wb') as file:
+            file.write(content)
+
+    return {
+        "format": "npy",
+        "path": os.path.relpath(path, os.path.dirname(filename)),
+        "shape": list(array.shape),
+        "dtype": str(array.dtype),
+        "sha256": checksum
+    }
+
+def load_array(reference:dict, log_folder:str, verify:bool=False):
+    """
+    Memory-map an array stored next to a log. The file is only read when the
+    array is accessed; the mapping is copy-on-write, so the array can be modified.
+    With `verify`, the whole file is read to compare its checksum.
+    """
+    import numpy as np
+
+    path = os.path.join(log_folder, reference["path"])
+    if verify:
+        with open(path, 'rb') as file:
+            if hashlib.sha256(file.read()).hexdigest() != reference["sha256"]:
+                warning_msg(f"{path} was changed after it was logged, the checksum does not match")
+    return np.load(path, mmap_mode='c', allow_pickle=False)
+
+# %%
+def viz_record_to_entry(record, filename:str, index:int=0) -> dict:
+    """
+    Convert a captum VisualizationDataRecord to a log entry.
+    Tensors and arrays are stored as .npy files next to the log, scalars are kept in the log.
+    """
+    import numpy as np
+
+    entry = {}
+    for field in ATTRIBUTION_FIELDS:
+        value = getattr(record, field)
+        if hasattr(value, 'detach'):
+            value = value.detach().cpu().numpy()
+        if isinstance(value, np.ndarray) and value.ndim > 0 and value.dtype.kind in "biuf":
+            value = save_array(filename, f"{index}_{field}", value)
+        elif isinstance(value, (np.ndarray, np.generic)):
+            value = value.tolist()
+        entry[field] = value
+    return entry
+
+def entry_to_viz_record(entry:dict, log_folder:str):
+    """
+    Rebuild a captum VisualizationDataRecord from a log entry, without copying
+    the stored arrays. Entries logged as nested lists are supported too.
+    """
+    import torch
+    from captum.attr import visualization as viz
+
+    values = []
+    for field in ATTRIBUTION_FIELDS:
+        value = entry.get(field)
+        if is_array_reference(value):
+            value = torch.from_numpy(load_array(value, log_folder))
+        elif field == "word_attributions":
+            value = torch.tensor(value, dtype=torch.float64)
+        values.append(value)
+    return viz.VisualizationDataRecord(*values)
@@ -0,0 +1,314 @@
+# %%
+import os
+import sqlite3
+import threading
+
+from faid.logging import warning_msg
+from faid.logging import yaml_utils, serializer
+from faid.logging.journal import apply_journal_record
+from faid.logging.log_compression import log_exists
+
+RAID_KINDS = ["risks", "assumptions", "issues", "dependencies"]
+
+# %%
+class StorageBackend:
+    """
+    The interface of the storage behind `load`, `load_section`, `update` and `append_entry`.
+    Every method receives the resolved path of the yaml log (e.g. ".../logs/faid/model.yml"),
+    which identifies the document even if the backend does not store yaml files.
+    """
+
+    def load(self, filename:str, keys:list=None) -> dict:
+        """
+        Return the whole document, or only its top-level `keys`
+        """
+        raise NotImplementedError
+
+    def load_section(self, filename:str, key:str):
+        """
+        Return one top-level section of the document, raise a KeyError if it does not exist
+        """
+        raise NotImplementedError
+
+    def update(self, yaml_data, key:str=None, filename:str=None):
+        """
+        Replace the document (key=None) or merge `yaml_data` into one of its top-level sections
+        """
+        raise NotImplementedError
+
+    def append_entry(self, path:list, value, filename:str=None, op:str="set"):
+        """
+        Set or append to a list the value at a key path of the document
+        """
+        raise NotImplementedError
+
+    def update_entries(self, records:list, filename:str=None):
+        """
+        Apply a batch of `append_entry` changes ({"op", "path", "value"} records)
+        """
+        for record in records:
+            self.append_entry(record["path"], record["value"], filename=filename, op=record["op"])
+
+    def flush(self, filename:str=None):
+        """
+        Persist the pending changes
+        """
+        pass
+
+# %%
+class YamlBackend(StorageBackend):
+    """
+    The default backend: one yaml file per log, held in the process-wide document store
+    """
+
+    def load(self, filename:str, keys:list=None) -> dict:
+        return yaml_utils.load_yaml(filename, keys=keys)
+
+    def load_section(self, filename:str, key:str):
+        return yaml_utils.load_yaml_section(filename, key)
+
+    def update(self, yaml_data, key:str=None, filename:str=None):
+        yaml_utils.update_yaml(yaml_data, key=key, filename=filename)
+
+    def append_entry(self, path:list, value, filename:str=None, op:str="set"):
+        yaml_utils.append_yaml_entry(path, value, filename=filename, op=op)
+
+    def update_entries(self, records:list, filename:str=None):
+        yaml_utils.update_yaml_entries(records, filename=filename)
+
+    def flush(self, filename:str=None):
+        yaml_utils.get_document_store().flush(filename)
+
+# %%
+class SQLiteBackend(StorageBackend):
+    """
+    An embedded SQLite backend. Each top-level section of a log is stored as one row and
+    each RAID (risk, assumption, issue, dependency) entry of the risk register as one row,
+    so reading a section or the risk entries is an indexed lookup.
+
+    The yaml logs stay the exchange format: a log that is not in the database yet is imported
+    from its yaml file on first access, and `export_yaml` writes the yaml files back for diffs and reports.
+    """
+
+    def __init__(self, db_path:str=None):
+        if db_path is None:
+            db_path = os.path.join(yaml_utils.get_project_log_path(), "faid.sqlite")
+        if not os.path.exists(os.path.dirname(os.path.abspath(db_path))):
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)))
+        self.db_path = db_path
+        self.root = os.path.dirname(os.path.abspath(db_path))
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    document TEXT PRIMARY KEY
+                );
+                CREATE TABLE IF NOT EXISTS sections (
+                    document TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (document, key)
+                );
+                CREATE TABLE IF NOT EXISTS raid_entries (
+                    document TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    entry_id INTEGER NOT NULL,
+                    description TEXT,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (document, kind, entry_id)
+                );
+                CREATE INDEX IF NOT EXISTS raid_entries_description
+                    ON raid_entries (document, kind, description);
+            """)
+
+    # %% helpers
+    def _document(self, filename:str) -> str:
+        """
+        The name of a log in the database: its path relative to the database folder
+        """
+        return os.path.relpath(os.path.abspath(filename), self.root)
+
+    @staticmethod
+    def _is_raid(document:str, key:str) -> bool:
+        return os.path.basename(document) == "risks.yml" and key in RAID_KINDS
+
+    @staticmethod
+    def _dump(value) -> str:
+        return serializer.dump(value)
+
+    @staticmethod
+    def _parse(value:str):
+        return serializer.parse(value)
+
+    def _ensure(self, filename:str) -> str:
+        """
+        Make sure the document is in the database, importing its yaml file if needed
+        """
+        document = self._document(filename)
+        known = self.connection.execute("SELECT 1 FROM documents WHERE document = ?", (document,)).fetchone()
+        if known is None:
+            if log_exists(filename):
+                self.import_yaml(filename)
+            else:
+                warning_msg(f"File {filename} not found. Creating a new document.")
+                with self.connection:
+                    self.connection.execute("INSERT INTO documents VALUES (?)", (document,))
+        return document
+
+    def _write_section(self, document:str, key:str, value):
+        if self._is_raid(document, key):
+            self.connection.execute("DELETE FROM raid_entries WHERE document = ? AND kind = ?", (document, key))
+            self._upsert_raid_entries(document, key, value or {})
+            value = None
+        position = self.connection.execute(
+            "SELECT COALESCE((SELECT position FROM sections WHERE document = ? AND key = ?), "
+            "(SELECT COUNT(*) FROM sections WHERE document = ?))", (document, str(key), document)).fetchone()[0]
+        self.connection.execute("INSERT OR REPLACE INTO sections VALUES (?, ?, ?, ?)",
+                                (document, str(key), position, self._dump(value)))
+
+    def _upsert_raid_entries(self, document:str, kind:str, entries:dict):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO raid_entries VALUES (?, ?, ?, ?, ?)",
+            [(document, kind, int(entry_id), (entry or {}).get("description"), self._dump(entry))
+             for entry_id, entry in entries.items()])
+
+    def _read_raid_entries(self, document:str, kind:str) -> dict:
+        rows = self.connection.execute(
+            "SELECT entry_id, value FROM raid_entries WHERE document = ? AND kind = ? ORDER BY entry_id",
+            (document, kind))
+        return {entry_id: self._parse(value) for entry_id, value in rows}
+
+    # %% StorageBackend
+    def load(self, filename:str, keys:list=None) -> dict:
+        if keys is not None:
+            data = {}
+            for key in keys:
+                try:
+                    data[key] = self.load_section(filename, key)
+                except KeyError:
+                    pass
+            return data
+
+        with self.lock:
+            document = self._ensure(filename)
+            rows = self.connection.execute(
+                "SELECT key, value FROM sections WHERE document = ? ORDER BY position", (document,)).fetchall()
+            if len(rows) == 1 and rows[0][0] == "":
+                # the document is not a mapping
+                return self._parse(rows[0][1])
+            data = {}
+            for key, value in rows:
+                if self._is_raid(document, key):
+                    data[key] = self._read_raid_entries(document, key)
+                else:
+                    data[key] = self._parse(value)
+            return data
+
+    def load_section(self, filename:str, key:str):
+        with self.lock:
+            document = self._ensure(filename)
+            row = self.connection.execute(
+                "SELECT value FROM sections WHERE document = ? AND key = ?", (document, str(key))).fetchone()
+            if row is None:
+                raise KeyError(key)
+            if self._is_raid(document, key):
+                return self._read_raid_entries(document, key)
+            return self._parse(row[0])
+
+    def update(self, yaml_data, key:str=None, filename:str=None):
+        with self.lock, self.connection:
+            document = self._ensure(filename)
+            if key is None:
+                self._replace_document(document, yaml_data)
+                return
+
+            if self._is_raid(document, key) and isinstance(yaml_data, dict):
+                # merging into the register only touches the given entries
+                self._upsert_raid_entries(document, key, yaml_data)
+                if self.connection.execute("SELECT 1 FROM sections WHERE document = ? AND key = ?",
+                                           (document, key)).fetchone() is None:
+                    self._write_section(document, key, self._read_raid_entries(document, key))
+                return
+
+            if isinstance(yaml_data, dict):
+                try:
+                    existing = self.load_section(filename, key)
+                except KeyError:
+                    existing = {}
+                yaml_data = {**(existing or {}), **yaml_data}
+            self._write_section(document, key, yaml_data)
+
+    def append_entry(self, path:list, value, filename:str=None, op:str="set"):
+        key, *rest = path
+        with self.lock:
+            try:
+                section = self.load_section(filename, key)
+            except KeyError:
+                section = None
+            section = apply_journal_record({key: section}, {"op": op, "path": [key, *rest], "value": value})[key]
+            with self.connection:
+                self._write_section(self._ensure(filename), key, section)
+
+    def update_entries(self, records:list, filename:str=None):
+        # each section is read and written once, whatever the number of records
+        with self.lock:
+            sections = {}
+            for record in records:
+                key, *rest = record["path"]
+                if key not in sections:
+                    try:
+                        sections[key] = self.load_section(filename, key)
+                    except KeyError:
+                        sections[key] = None
+                sections[key] = apply_journal_record({key: sections[key]}, {**record, "path": [key, *rest]})[key]
+            with self.connection:
+                document = self._ensure(filename)
+                for key, section in sections.items():
+                    self._write_section(document, key, section)
+
+    def _replace_document(self, document:str, data):
+        self.connection.execute("DELETE FROM sections WHERE document = ?", (document,))
+        self.connection.execute("DELETE FROM raid_entries WHERE document = ?", (document,))
+        if isinstance(data, dict):
+            for key, value in data.items():
+                self._write_section(document, key, value)
+        else:
+            self.connection.execute("INSERT INTO sections VALUES (?, '', 0, ?)", (document, self._dump(data)))
+
+    # %% yaml exchange
+    def import_yaml(self, filename:str):
+        """
+        Import (or re-import) a yaml log into the database
+        """
+        data = yaml_utils.read(filename)
+        with self.lock, self.connection:
+            document = self._document(filename)
+            self.connection.execute("INSERT OR IGNORE INTO documents VALUES (?)", (document,))
+            self._replace_document(document, data)
+
+    def export_yaml(self, filename:str=None):
+        """
+        Write a log (or all logs) in the database back to its yaml file
+        """
+        with self.lock:
+            if filename is None:
+                documents = [row[0] for row in self.connection.execute("SELECT document FROM documents")]
+            else:
+                documents = [self._document(filename)]
+            for document in documents:
+                path = os.path.join(self.root, document)
+                yaml_utils.write(self.load(path), path)
+                yaml_utils.get_document_store().discard(path)
+
+    def flush(self, filename:str=None):
+        with self.lock:
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
@@ -1,32 +1,33 @@
-from os.path import join, exists
-from shutil import copy
+from os.path import join
 
-from faid.logging import error_msg, warning_msg, success_msg, update, load, get_project_log_path, get_current_folder_path
+from faid.logging import error_msg, warning_msg, success_msg, update, load, load_section, get_project_log_path, get_current_folder_path
+from faid.logging.log_compression import log_exists, copy_log_template
+from faid.logging.project import get_project, in_project
 
-data_file_path = join(get_project_log_path(), "data.yml")
 data_file_template_path = join(get_current_folder_path(), "templates/data.yml")
 data_file_template_with_description_path = join(get_current_folder_path(), "template_example_descriptions/data_template_description.yml")
 
 def initialize_data_log(test:bool=False):
-    if not exists(data_file_path):
+    data_file_path = get_data_log_path()
+    if not log_exists(data_file_path):
         if test:
-            copy(data_file_template_with_description_path, data_file_path)
+            copy_log_template(data_file_template_with_description_path, data_file_path)
             success_msg("Data log file created with sample descriptions.")
         else:
-            copy(data_file_template_path, data_file_path)
+            copy_log_template(data_file_template_path, data_file_path)
             success_msg("Data log file created.")
     else:
         warning_msg("Data log file already exists. Logging will be appended to the existing file.")
 
 def get_data_log_path():
-    return data_file_path
+    return join(get_project_log_path(), "data.yml")
 
 def get_data_entry(key:str=None):
     if key is None:
-        return load(data_file_path)
+        return load(get_data_log_path())
     else:
         try:
-            return load(data_file_path)[key]
+            return load_section(get_data_log_path(), key)
         except AttributeError | KeyError:
             error_msg(f"Key {key} not found in the metadata file")
             return None
@@ -125,7 +126,9 @@ def pretty_uci_metadata(metadata) -> dict:
 
 class DataCard:
     def __init__(self):
-        self.data_info = load(data_file_path)
+        self.project = get_project()
+        self.data_file_path = get_data_log_path()
+        self.data_info = load(self.data_file_path)
         self.description_schema = {
             "name": "",
             "summary": "",
@@ -357,12 +360,13 @@ class DataCard:
                 collection_protocol[key] = existing_collection_protocol[key]
         self.data_info["collection_protocol"] = collection_protocol
 
+    @in_project
     def save(self):
         """
         Saves the data information to the data log file.
         """
         for key, value in self.data_info.items():
-            update(value, key=key, filename=data_file_path)
+            update(value, key=key, filename=self.data_file_path)
         success_msg("Data info saved to the data log file.")
 
     def to_dict(self):
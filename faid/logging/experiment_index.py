@@ -0,0 +1,209 @@
+# %%
+import os
+import json
+import sqlite3
+import threading
+
+from faid.logging import load, get_project_log_path
+from faid.logging.project import get_project
+from faid.logging.file_utils import ignore_local_state
+from faid.logging.log_compression import log_exists, logical_log_path
+
+# The keys of an experiment log that the index is built from
+INDEX_KEYS = ["id", "name", "context", "model", "bias_metrics"]
+
+EXPERIMENT_INDEX_FILENAME = "experiments.sqlite"
+
+def headline_metrics(bias_metrics) -> dict:
+    """
+    Get the overall {metric: value} of the `bias_metrics` entries of an experiment
+    """
+    for group in bias_metrics or []:
+        if isinstance(group, dict) and group.get("group_name") == "overall":
+            return {metric["name"]: metric["value"] for metric in group.get("metrics") or []
+                    if metric.get("name") and isinstance(metric.get("value"), (int, float))}
+    return {}
+
+def _to_iso(value) -> str:
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+# %%
+class ExperimentIndex:
+    """
+    An SQLite index of the fairness experiments of a project: name, id, path, start time,
+    tags, model name and overall metrics of each experiment log, kept up to date by
+    FairnessExperimentRecord. Listing and querying the experiments (e.g. tagged "nlp"
+    since 2024-05-01) does not open the experiment logs.
+
+    The index is built from the logs when it does not exist; use `rebuild()` after
+    copying or editing experiment logs outside of faid.
+    """
+
+    def __init__(self, db_path:str=None):
+        if db_path is None:
+            db_path = os.path.join(get_project_log_path(), EXPERIMENT_INDEX_FILENAME)
+        self.db_path = db_path
+        self.root = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(self.root, exist_ok=True)
+        ignore_local_state(self.root)
+        exists = os.path.exists(db_path)
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS experiments (
+                    path TEXT PRIMARY KEY,
+                    name TEXT,
+                    id TEXT,
+                    start_time TEXT,
+                    model TEXT,
+                    tags TEXT NOT NULL,
+                    metrics TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS experiments_name ON experiments (name);
+                CREATE INDEX IF NOT EXISTS experiments_start_time ON experiments (start_time);
+                CREATE TABLE IF NOT EXISTS experiment_tags (
+                    path TEXT NOT NULL,
+                    tag TEXT NOT NULL,
+                    PRIMARY KEY (tag, path)
+                );
+            """)
+        if not exists:
+            self.rebuild()
+
+    def _document(self, filename:str) -> str:
+        """
+        The key of a log in the index: its path relative to the index folder
+        """
+        return os.path.relpath(os.path.abspath(filename), self.root)
+
+    def update(self, filename:str, log:dict):
+        """
+        Add or update the entry of an experiment log from its content
+        (the INDEX_KEYS sections are enough)
+        """
+        context = log.get("context") or {}
+        model = log.get("model") or {}
+        tags = context.get("tags") or []
+        if isinstance(tags, str):
+            tags = [tags]
+        tags = sorted({str(tag) for tag in tags})
+        document = self._document(filename)
+        row = (document, log.get("name") or None, str(log.get("id") or "") or None,
+               _to_iso(context.get("start_time") or "") or None,
+               (model.get("name") if isinstance(model, dict) else None) or None,
+               json.dumps(tags), json.dumps(headline_metrics(log.get("bias_metrics"))))
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO experiments VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+            self.connection.execute("DELETE FROM experiment_tags WHERE path = ?", (document,))
+            self.connection.executemany("INSERT INTO experiment_tags VALUES (?, ?)", [(document, tag) for tag in tags])
+
+    def remove(self, filename:str):
+        """
+        Remove an experiment log from the index
+        """
+        document = self._document(filename)
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM experiments WHERE path = ?", (document,))
+            self.connection.execute("DELETE FROM experiment_tags WHERE path = ?", (document,))
+
+    def rebuild(self):
+        """
+        Rebuild the index from the experiment logs of its folder
+        """
+        # compressed logs are indexed by their .yml path
+        filenames = sorted({os.path.join(self.root, logical_log_path(f)) for f in os.listdir(self.root)
+                            if f.startswith("fairness_") and logical_log_path(f).endswith(".yml")})
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM experiments")
+            self.connection.execute("DELETE FROM experiment_tags")
+        for filename in filenames:
+            self.update(filename, load(filename, keys=INDEX_KEYS))
+
+    def _row(self, row) -> dict:
+        path, name, id, start_time, model, tags, metrics = row
+        return {
+            "name": name,
+            "id": id,
+            "path": os.path.join(self.root, path),
+            "start_time": start_time,
+            "model": model,
+            "tags": json.loads(tags),
+            "metrics": json.loads(metrics)
+        }
+
+    def query(self, tag:str=None, since=None, until=None, model:str=None, name:str=None) -> list:
+        """
+        Get the experiments with a tag, a model or a name, started between `since` and `until`
+        (dates, datetimes or ISO strings), ordered by start time
+        """
+        conditions, parameters = [], []
+        if tag is not None:
+            conditions.append("path IN (SELECT path FROM experiment_tags WHERE tag = ?)")
+            parameters.append(str(tag))
+        if since is not None:
+            conditions.append("start_time >= ?")
+            parameters.append(_to_iso(since))
+        if until is not None:
+            conditions.append("start_time <= ?")
+            parameters.append(_to_iso(until))
+        if model is not None:
+            conditions.append("model = ?")
+            parameters.append(model)
+        if name is not None:
+            conditions.append("name = ?")
+            parameters.append(name)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT * FROM experiments {where} ORDER BY start_time IS NULL, start_time, path", parameters).fetchall()
+        return [self._row(row) for row in rows]
+
+    def get(self, name:str) -> dict:
+        """
+        Get the index entry of an experiment by name
+        """
+        experiments = self.query(name=name)
+        return experiments[0] if experiments else None
+
+    def paths(self) -> list:
+        """
+        Get the paths of the indexed experiment logs. The logs deleted since they
+        were indexed are dropped from the index.
+        """
+        with self.lock:
+            documents = [row[0] for row in self.connection.execute("SELECT path FROM experiments ORDER BY path")]
+        paths = []
+        for document in documents:
+            path = os.path.join(self.root, document)
+            if log_exists(path):
+                paths.append(path)
+            else:
+                self.remove(path)
+        return paths
+
+    def close(self):
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
+
+# %%
+def get_experiment_index() -> ExperimentIndex:
+    """
+    Get the experiment index of the active project
+    """
+    return get_project().experiment_index
+
+def query_experiments(tag:str=None, since=None, until=None, model:str=None, name:str=None) -> list:
+    """
+    Find experiments in the index, e.g. `query_experiments(tag="nlp", since="2024-05-01")`
+    """
+    return get_experiment_index().query(tag=tag, since=since, until=until, model=model, name=name)
+
+def rebuild_experiment_index():
+    """
+    Rebuild the experiment index from the experiment logs
+    """
+    get_experiment_index().rebuild()
@@ -1,21 +1,42 @@
-from os.path import join, exists
-from shutil import copy
+from os.path import join
+from copy import deepcopy
+from contextlib import contextmanager
 from datetime import datetime
-from fairlearn.metrics import MetricFrame
+from typing import TYPE_CHECKING
 
-from faid.logging import error_msg, warning_msg, success_msg, update, load, get_project_log_path, get_current_folder_path, ModelCard, DataCard
+from faid.logging import error_msg, warning_msg, success_msg, update, load, load_section, flush, transaction, get_project_log_path, get_current_folder_path, ModelCard, DataCard
+from faid.logging.log_compression import log_exists, copy_log_template
+from faid.logging.yaml_utils import append_entry, update_entries
+from faid.logging.writer import BackgroundWriter, coalesce
+from faid.logging.project import get_project, in_project
+from faid.logging.attributions import viz_record_to_entry
+from faid.logging.sampling import ConfusionReservoirSampler
+from faid.logging.metric_table import (
+    COLUMNAR_MIN_GROUPS,
+    metric_frame_to_table,
+    metric_frame_to_entries,
+    metric_groups_to_entries,
+    save_metric_table,
+    load_metric_table,
+    metric_table_to_frame
+)
+from faid.logging.metric_series import MetricSeries, get_metric_series_path, metric_frame_to_groups
+
+if TYPE_CHECKING:
+    # fairlearn (and pandas, scikit-learn) are only needed when metrics are logged
+    from fairlearn.metrics import MetricFrame
 
-exp_file_path = join(get_project_log_path(), "fairness.yml")
 exp_file_template_path = join(get_current_folder_path(), "templates/fairness.yml")
 exp_file_template_with_description_path = join(get_current_folder_path(), "template_example_descriptions/fairness_template_description.yml")
 
 def initialize_fairness_experiment_log(test:bool=False):
-    if not exists(exp_file_path):
+    exp_file_path = join(get_project_log_path(), "fairness.yml")
+    if not log_exists(exp_file_path):
         if(test):
-            copy(exp_file_template_with_description_path, exp_file_path)
+            copy_log_template(exp_file_template_with_description_path, exp_file_path)
             success_msg("Fairness experiment log created with sample descriptions.")
         else:
-            copy(exp_file_template_path, exp_file_path)
+            copy_log_template(exp_file_template_path, exp_file_path)
             success_msg("Fairness experiment log created.")
     else:
         warning_msg("Fairness experiment log already exists. Logging will be appended to the existing file.")
@@ -23,15 +44,17 @@ def initialize_fairness_experiment_log(test:bool=False):
 def get_fairness_experiment_log_path():
     """
     Returns the path to the fairness log file
+    (use faid.logging.query_experiments to find experiments by tag, model or start time)
     """
     import os
 
     if os.path.exists(get_project_log_path()):
-        fairness_files = [f for f in os.listdir(get_project_log_path()) if f.startswith('fairness_')]
+        # the experiment index lists the logs without scanning the folder
+        fairness_files = get_project().experiment_index.paths()
         if len(fairness_files) == 1:
-            return os.path.join(get_project_log_path(), fairness_files[0])
+            return fairness_files[0]
         else:
-            return [os.path.join(get_project_log_path(), f) for f in fairness_files]
+            return fairness_files
     else:
         import inquirer
         from IPython import get_ipython
@@ -89,29 +112,63 @@ def pretty_aisi_summary(filepath:str) -> dict:
 class FairnessExperimentRecord:
     """
     A class to record fairness-related information throughout an experiment.
+
+    In journal mode, each `add_*_entry` call appends a small record to a
+    journal next to the log instead of rewriting the whole log. Loading the
+    log replays the journal transparently.
+
+    In background mode, the changes are queued and persisted by a writer thread,
+    so the `add_*_entry` calls return immediately and do not print. Use `flush()`
+    to wait for the queued changes, and `close()` (or a `with` block) when the
+    experiment is done. `max_queue` bounds the queue and `backpressure` decides
+    what happens when it is full: "block", "drop-oldest" or "raise".
+
+    Metric frames with many groups are stored as a table next to the log
+    (see `add_metric_entry_from_fairlearn` and `get_metric_frame`). The metrics of
+    each step of a training or of a production window are appended to a time series
+    with `log_metrics(step, metric_frame)` and read with `get_metric_series()`.
+
+    Inside `with record.batch():`, the changes are staged in memory and written
+    at once when the block ends, or discarded if the block raises.
+
+    The name, start time, tags, model and overall metrics of the experiment are kept
+    in the project's experiment index (see `faid.logging.query_experiments`).
     """
 
-    def __init__(self, name:str):
+    # the in-memory state that a failed batch restores
+    batch_state = ["context", "data", "sample_data", "model", "metrics", "metrics_table", "metrics_series", "description"]
+
+    def __init__(self, name:str, journal:bool=False, background:bool=False,
+                 max_queue:int=1024, backpressure:str="block"):
 
         if name is None:
             warning_msg("Please provide a name for the experiment")
             return
 
         self.name = name            
+        self.project = get_project()
         self.filename = convert_experiment_filepath_format(name)
+        self.journal = journal
+        self.writer = None
+        self._staged = None
+        self._staged_steps = None
+        self._series = None
         
-        if not exists(self.filename):
-            copy(exp_file_template_path, self.filename)
+        if not log_exists(self.filename):
+            copy_log_template(exp_file_template_path, self.filename)
         
-        self.id = load(self.filename)["id"]
+        log = load(self.filename)
+        self.id = log["id"]
         if self.id == "":
             # define a unique id based on the current time
             self.id = datetime.now().isoformat()
-        self.context = load(self.filename)["context"]
-        self.data = load(self.filename)["data"]
-        self.sample_data = load(self.filename)["sample_data"]
-        self.model = load(self.filename)["model"]
-        self.metrics = load(self.filename)["bias_metrics"]
+        self.context = log["context"]
+        self.data = log["data"]
+        self.sample_data = log["sample_data"]
+        self.model = log["model"]
+        self.metrics = log["bias_metrics"]
+        self.metrics_table = log.get("bias_metrics_table")
+        self.metrics_series = log.get("bias_metrics_series")
 
         self.metrics_schema = {'group_name': '',
                                 'description': '', 
@@ -127,6 +184,124 @@ class FairnessExperimentRecord:
                                     'sg_params': {}}]}
         
         self.init_fairness_log()
+        if journal:
+            # write the initialised log now, so the changes are appended to its journal from the first one
+            flush(self.filename)
+        self._update_index()
+
+        if background:
+            self.writer = BackgroundWriter(self._persist, max_queue=max_queue, backpressure=backpressure,
+                                           name=f"faid-writer-{self.name}")
+            self.project.writers.add(self.writer)
+
+    @in_project
+    def _persist(self, records:list):
+        """
+        Write a batch of queued changes (called from the writer thread)
+        """
+        if self.journal:
+            for record in records:
+                append_entry(record["path"], record["value"], filename=self.filename, op=record["op"])
+        else:
+            update_entries(records, filename=self.filename)
+        flush(self.filename)
+        self._update_index()
+
+    def _deferred(self) -> bool:
+        """
+        Whether changes are staged in a batch or queued for the writer thread instead of written now
+        """
+        return self._staged is not None or self.writer is not None
+
+    def _stage(self, path:list, value, op:str="set"):
+        """
+        Stage a change in the current batch, or queue it for the writer thread
+        """
+        record = {"op": op, "path": path, "value": deepcopy(value)}
+        if self._staged is not None:
+            self._staged.append(record)
+        else:
+            self.writer.submit(record)
+
+    @contextmanager
+    def batch(self):
+        """
+        Stage the changes made in the block and write them with a single write at the end.
+        If the block raises, the changes are discarded and the record is restored.
+        """
+        if self._staged is not None:
+            # nested batches are part of the outer one
+            yield self
+            return
+
+        snapshot = deepcopy({name: value for name, value in vars(self).items() if name in self.batch_state})
+        self._staged = []
+        self._staged_steps = []
+        try:
+            yield self
+        except BaseException:
+            self._staged = None
+            self._staged_steps = None
+            for name in self.batch_state:
+                if name in snapshot:
+                    setattr(self, name, snapshot[name])
+                elif hasattr(self, name):
+                    delattr(self, name)
+            raise
+
+        staged, self._staged = coalesce(self._staged), None
+        steps, self._staged_steps = self._staged_steps, None
+        for step, groups in steps:
+            self._metric_series().append(step, groups)
+        if not staged:
+            return
+        if self.writer is not None:
+            for record in staged:
+                self.writer.submit(record)
+            return
+        with self.project.activate(), transaction(self.filename):
+            update_entries(staged, filename=self.filename)
+        self._update_index()
+
+    def _update_index(self):
+        """
+        Update the entry of the experiment in the project's experiment index
+        """
+        self.project.experiment_index.update(self.filename, {
+            "id": self.id,
+            "name": self.name,
+            "context": self.context,
+            "model": self.model,
+            "bias_metrics": self.metrics
+        })
+
+    def _log(self, message:str):
+        if self.writer is None:
+            print(message)
+
+    @in_project
+    def flush(self):
+        """
+        Wait until the queued changes are written to the log
+        """
+        if self.writer is not None:
+            self.writer.flush()
+        flush(self.filename)
+
+    @in_project
+    def close(self):
+        """
+        Write the queued changes and stop the writer thread
+        """
+        if self.writer is not None:
+            self.writer.close()
+        flush(self.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def init_fairness_log(self) -> dict:
         expCtx = load(self.filename)
@@ -154,60 +329,199 @@ class FairnessExperimentRecord:
         summary = self.to_dict()
         return "\n".join(f"{key}: {value}" for key, value in summary.items())
 
+    @in_project
+    def _add_entries(self, section:str, entries:dict) -> dict:
+        """
+        Set keys under a top-level section of the log and return the updated section
+        """
+        if self._deferred():
+            for key, entry in entries.items():
+                self._stage([section, key], entry)
+            section_data = getattr(self, section)
+            section_data.update(entries)
+        elif self.journal:
+            for key, entry in entries.items():
+                append_entry([section, key], entry, filename=self.filename)
+            section_data = getattr(self, section)
+            section_data.update(entries)
+        else:
+            section_data = load_section(self.filename, section)
+            section_data.update(entries)
+            update(yaml_data=section_data, key=section, filename=self.filename)
+        if section in ("context", "model") and not self._deferred():
+            setattr(self, section, section_data)
+            self._update_index()
+        return section_data
+
+    def _add_entry(self, section:str, key:str, entry) -> dict:
+        """
+        Set `key` under a top-level section of the log and return the updated section
+        """
+        section_data = self._add_entries(section, {key: entry})
+        self._log(f"Added {key} to project metadata under ['{section}'] and log updated")
+        return section_data
+
     def add_context_entry(self, key:str, entry):
-        self.context = load(self.filename)["context"]
-        self.context[key] = entry
-        update(yaml_data=self.context, key="context", filename=self.filename)
-        print(f"Added {key} to project metadata under ['context'] and log updated")
+        self.context = self._add_entry("context", key, entry)
 
     def add_data_entry(self, key:str, entry):
-        self.data = load(self.filename)["data"]
-        self.data[key] = entry
-        update(yaml_data=self.data, key="data", filename=self.filename)
-        print(f"Added {key} to project metadata under ['data'] and log updated")
+        self.data = self._add_entry("data", key, entry)
     
     def add_sample_data_entry(self, key:str, entry):
-        self.sample_data = load(self.filename)["sample_data"]
-        self.sample_data[key] = entry
-        update(yaml_data=self.sample_data, key="sample_data", filename=self.filename)
-        print(f"Added {key} to project metadata under ['sample_data'] and log updated")
+        self.sample_data = self._add_entry("sample_data", key, entry)
     
     def add_model_entry(self, key:str, entry):
-        self.model = load(self.filename)["model"]
-        self.model[key] = entry
-        update(yaml_data=self.model, key="model", filename=self.filename)
-        print(f"Added {key} to project metadata under ['model'] and log updated")
-
-    def add_metric_entry_from_fairlearn(self, entry:MetricFrame):
-        groups = entry.by_group.transpose().to_dict()
-        groups["overall"] = entry.overall.to_dict()
-        m = []
-        for group, values in groups.items():
-            ms = self.metrics_schema.copy()
-            ms['group_name'] = group
-            msm = []
-            print("For the given Group: ", group)
-            print("======================")
-            for key, value in values.items():
-                print(key, value)
-                metric = ms['metrics'][0].copy()
-                metric['name'] = key
-                metric['value'] = value
-                msm.append(metric)
-            ms['metrics'] = msm
-            m.append(ms)
-        self.metrics = m
-        update(yaml_data=self.metrics, key="bias_metrics", filename=self.filename)
-        print("Added the metrics to project metadata under ['bias_metrics'] and log updated")
+        self.model = self._add_entry("model", key, entry)
 
-    
+    @contextmanager
+    def collect_samples(self, k:int=5, positive_label=1, seed:int=None):
+        """
+        Sample k examples per confusion cell and sensitive group from predictions
+        streamed in chunks, and write them to `sample_data` once, at the end of the block:
+
+            with record.collect_samples(k=10) as sampler:
+                for X, y_true, y_pred, group in chunks:
+                    sampler.update(X, y_true, y_pred, group)
+        """
+        sampler = ConfusionReservoirSampler(k=k, positive_label=positive_label, seed=seed)
+        yield sampler
+        self.add_sample_data_from_sampler(sampler)
+
+    def add_sample_data_from_sampler(self, sampler:ConfusionReservoirSampler):
+        """
+        Set the tps, fps, tns and fns of `sample_data` to the examples of a sampler,
+        and `counts` to the number of rows they were sampled from
+        """
+        self.sample_data = self._add_entries("sample_data", {**sampler.samples(), "counts": sampler.counts()})
+        self._log("Added the sampled examples to project metadata under ['sample_data'] and log updated")
+
+    @in_project
+    def add_metric_entry_from_fairlearn(self, entry:"MetricFrame", columnar:bool=None, thresholds=None, silent:bool=False):
+        """
+        Log the metrics of a fairlearn MetricFrame.
+
+        With `columnar`, the per-group values are stored as a table next to the log
+        (read it with `get_metric_frame()`) and `bias_metrics` only keeps the overall metrics.
+        By default, the table is used for frames with at least COLUMNAR_MIN_GROUPS groups.
+
+        `thresholds` is a table of the threshold (and bigger_is_better, description, label, notes)
+        of each metric, optionally per group: a DataFrame, a {metric: threshold} dict or the path
+        of a .csv or .yml file, see `read_metric_thresholds`. With `silent`, nothing is printed.
+        """
+        if columnar is None:
+            columnar = len(entry.by_group.index) >= COLUMNAR_MIN_GROUPS
+        table = None
+        if columnar:
+            try:
+                table = metric_frame_to_table(entry)
+            except ValueError as e:
+                if not silent:
+                    warning_msg(f"{e}. Storing the metrics in the log instead.")
+
+        if table is None:
+            self.metrics = metric_frame_to_entries(entry, thresholds=thresholds)
+            changes = {"bias_metrics": self.metrics}
+            if self.metrics_table:
+                # the previous table is outdated
+                self.metrics_table = None
+                changes["bias_metrics_table"] = None
+        else:
+            self.metrics_table = save_metric_table(self.filename, table)
+            self.metrics = metric_groups_to_entries({"overall": dict(zip(table["metrics"].tolist(), table["overall"].tolist()))},
+                                                    thresholds=thresholds)
+            changes = {"bias_metrics": self.metrics, "bias_metrics_table": self.metrics_table}
+
+        self._set_entries(changes)
+        if not self._deferred():
+            self._update_index()
+        if not silent:
+            self._log("Added the metrics to project metadata under ['bias_metrics'] and log updated")
+
+    def _set_entries(self, changes:dict):
+        """
+        Set top-level keys of the log
+        """
+        if self._deferred():
+            for key, value in changes.items():
+                self._stage([key], value)
+        elif self.journal:
+            for key, value in changes.items():
+                append_entry([key], value, filename=self.filename)
+        else:
+            update_entries([{"op": "set", "path": [key], "value": value} for key, value in changes.items()],
+                           filename=self.filename)
+
+    def _metric_series(self) -> MetricSeries:
+        if self._series is None:
+            self._series = MetricSeries(get_metric_series_path(self.filename))
+        return self._series
+
+    @in_project
+    def log_metrics(self, step:int, entry):
+        """
+        Append the metrics of a step (e.g. an epoch or a production window) to the time series
+        of the experiment. `entry` is a fairlearn MetricFrame or a {group: {metric: value}} dict.
+        Only the new values are written, the log is only updated when the series is created.
+        """
+        groups = entry if isinstance(entry, dict) else metric_frame_to_groups(entry)
+        if self._staged_steps is not None:
+            self._staged_steps.append((step, deepcopy(groups)))
+        else:
+            self._metric_series().append(step, groups)
+        if not self.metrics_series:
+            self.metrics_series = self._metric_series().reference()
+            self._set_entries({"bias_metrics_series": self.metrics_series})
+
+    def get_metric_series(self, start:int=None, stop:int=None, groups:list=None, metrics:list=None):
+        """
+        Get the metrics logged with `log_metrics` for the steps from `start` to `stop`,
+        as a DataFrame indexed by (step, group) with one column per metric
+        """
+        return self._metric_series().read(start=start, stop=stop, groups=groups, metrics=metrics)
+
+    def get_metric_frame(self):
+        """
+        Get the bias metrics as a DataFrame of groups x metrics.
+        If the metrics are stored as a table, it is read directly, without building the per-group entries.
+        """
+        if self.metrics_table:
+            return metric_table_to_frame(load_metric_table(self.filename, self.metrics_table))
+        import pandas as pd
+        rows = {group["group_name"]: {metric["name"]: metric["value"] for metric in group.get("metrics") or []}
+                for group in self.metrics if group.get("group_name") not in ("", "overall")}
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+    def get_overall_metrics(self):
+        """
+        Get the overall bias metrics as a pandas Series
+        """
+        import pandas as pd
+        if self.metrics_table:
+            table = load_metric_table(self.filename, self.metrics_table)
+            return pd.Series(table["overall"], index=table["metrics"].tolist(), name="overall")
+        for group in self.metrics:
+            if group.get("group_name") == "overall":
+                return pd.Series({metric["name"]: metric["value"] for metric in group.get("metrics") or []}, name="overall")
+        return pd.Series(dtype=float, name="overall")
+
+    @in_project
     def add_metric_entry(self, entry:dict={}):
-        existing_metrics = load(self.filename)["bias_metrics"]
-        entry = {**self.metrics_schema, **entry}
-        existing_metrics.append(entry)
-        self.metrics = existing_metrics
-        update(yaml_data=self.metrics, key="bias_metrics", filename=self.filename)
-        print("Added the metrics to project metadata under ['bias_metrics'] and log updated")
+        # the schema's metrics list must not end up shared with the logged entries
+        entry = {**deepcopy(self.metrics_schema), **entry}
+        if self._deferred():
+            self._stage(["bias_metrics"], entry, op="append")
+            self.metrics.append(entry)
+        elif self.journal:
+            append_entry(["bias_metrics"], entry, filename=self.filename, op="append")
+            self.metrics.append(entry)
+        else:
+            existing_metrics = load_section(self.filename, "bias_metrics")
+            existing_metrics.append(entry)
+            self.metrics = existing_metrics
+            update(yaml_data=self.metrics, key="bias_metrics", filename=self.filename)
+        if not self._deferred():
+            self._update_index()
+        self._log("Added the metrics to project metadata under ['bias_metrics'] and log updated")
 
     def get_metric_entry(self, key:str=None):
         if key is None:
@@ -217,19 +531,18 @@ class FairnessExperimentRecord:
         return self.metrics.get(key, None)
 
     def add_viz_entry(self, entry):
+        """
+        Log one captum VisualizationDataRecord, or a list of them with a single update of the log.
+        The attribution tensors are stored as .npy files next to the log, which only keeps
+        their shape, dtype and checksum.
+        """
         from captum.attr import visualization as viz
-        if isinstance(entry, viz.VisualizationDataRecord):
-            entry_dict = {
-                "word_attributions": entry.word_attributions.detach().cpu().numpy().tolist() if hasattr(entry.word_attributions, 'detach') else entry.word_attributions,
-                "pred_prob": entry.pred_prob.detach().cpu().numpy().tolist() if hasattr(entry.pred_prob, 'detach') else entry.pred_prob,
-                "pred_class": entry.pred_class.detach().cpu().numpy().tolist() if hasattr(entry.pred_class, 'detach') else entry.pred_class,
-                "true_class": entry.true_class.detach().cpu().numpy().tolist() if hasattr(entry.true_class, 'detach') else entry.true_class,
-                "attr_class": entry.attr_class.detach().cpu().numpy().tolist() if hasattr(entry.attr_class, 'detach') else entry.attr_class,
-                "attr_score": entry.attr_score.detach().cpu().numpy().tolist() if hasattr(entry.attr_score, 'detach') else entry.attr_score,
-                "raw_input_ids": entry.raw_input_ids.detach().cpu().numpy().tolist() if hasattr(entry.raw_input_ids, 'detach') else entry.raw_input_ids,
-                "convergence_score": entry.convergence_score.detach().cpu().numpy().tolist() if hasattr(entry.convergence_score, 'detach') else entry.convergence_score,
-            }
-            self.add_model_entry("captum_records", entry_dict)
+        records = entry if isinstance(entry, (list, tuple)) else [entry]
+        records = [record for record in records if isinstance(record, viz.VisualizationDataRecord)]
+        if len(records) == 0:
+            return
+        entries = [viz_record_to_entry(record, self.filename, index) for index, record in enumerate(records)]
+        self.add_model_entry("captum_records", entries)
 
     def set_context(self, 
             description:str="", 
@@ -241,19 +554,14 @@ class FairnessExperimentRecord:
         self.description = description
         if start_time is None:
             start_time = datetime.now().isoformat()
-        self.context.start_time = start_time
-        self.context.tags = tags
-        self.context.authors = authors
-        self.context.hardware = hardware
-        self.context.license_info = license_info
-
-        expCtx = load(self.filename)["context"]
-        expCtx["description"] = self.description
-        expCtx["start_time"] = self.context.start_time
-        expCtx["tags"] = self.context.tags
-        expCtx["authors"] = self.context.authors
-        expCtx["hardware"] = self.context.hardware
-        update(yaml_data=expCtx, key="context", filename=self.filename)
+        self.context = self._add_entries("context", {
+            "description": description,
+            "start_time": start_time,
+            "tags": tags,
+            "authors": authors,
+            "hardware": hardware,
+            "license_info": license_info
+        })
 
 
     def get_context_entry(self, key:str=None):
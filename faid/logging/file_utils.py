@@ -0,0 +1,123 @@
+# %%
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # advisory file locks are not available (e.g. on Windows), locks only work across threads
+    fcntl = None
+
+# the machine-local files kept next to the logs: the locks, the experiment index,
+# the state of the log syncs and the temporary files of atomic writes
+LOCAL_STATE_PATTERNS = ["*.lock", "experiments.sqlite", "experiments.sqlite-*", "sync_state.json", ".*.tmp"]
+
+_ignored_folders = set()
+
+def ignore_local_state(folder:str):
+    """
+    Write a .gitignore for the machine-local files of a log folder, so they are not committed
+    with the logs. An existing .gitignore is left as it is.
+    """
+    folder = os.path.abspath(folder)
+    if folder in _ignored_folders:
+        return
+    try:
+        with open(os.path.join(folder, ".gitignore"), 'x') as file:
+            file.write("# machine-local faid state\n" + "\n".join(LOCAL_STATE_PATTERNS) + "\n")
+    except FileExistsError:
+        pass
+    except OSError:
+        # e.g. a read-only folder, the logs can still be written
+        return
+    _ignored_folders.add(folder)
+
+# %%
+class FileLock:
+    """
+    An advisory lock (fcntl.flock) on a `.lock` file next to a log.
+    The lock is reentrant within a process and also serializes the threads of the process.
+    """
+
+    def __init__(self, filename:str):
+        self.path = os.path.abspath(filename) + ".lock"
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.fd = None
+
+    def acquire(self):
+        self.thread_lock.acquire()
+        try:
+            if self.depth == 0:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                ignore_local_state(os.path.dirname(self.path))
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                self.fd = fd
+            self.depth += 1
+        except BaseException:
+            self.thread_lock.release()
+            raise
+
+    def release(self):
+        try:
+            self.depth -= 1
+            if self.depth == 0:
+                if fcntl is not None:
+                    fcntl.flock(self.fd, fcntl.LOCK_UN)
+                os.close(self.fd)
+                self.fd = None
+        finally:
+            self.thread_lock.release()
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+@contextmanager
+def file_lock(filename:str):
+    """
+    Hold the advisory lock of a log file, across processes and threads
+    """
+    path = os.path.abspath(filename)
+    with _locks_guard:
+        lock = _locks.setdefault(path, FileLock(path))
+    lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
+
+# %%
+@contextmanager
+def atomic_open(filename:str, mode:str='w'):
+    """
+    Open a temporary file in the same folder as `filename`, and on success fsync it
+    and rename it into place. Readers see either the old or the new file, never a truncated one.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(filename) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(filename):
+            os.chmod(tmp_path, os.stat(filename).st_mode & 0o777)
+        else:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    # persist the rename itself
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
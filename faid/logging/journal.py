@@ -0,0 +1,102 @@
+# %%
+import os
+from yaml import YAMLError
+
+from faid.logging import warning_msg
+from faid.logging.serializer import parse, dump_flow
+
+# Compact the journal into the yaml snapshot once it grows beyond this size (in bytes)
+JOURNAL_COMPACT_THRESHOLD = 1024 * 1024
+
+# %%
+def get_journal_path(filename:str) -> str:
+    """
+    Get the path of the append-only journal kept next to a yaml log
+    """
+    return filename + ".journal"
+
+def journal_size(filename:str) -> int:
+    """
+    Get the size of the journal of a yaml log in bytes (0 if there is none)
+    """
+    try:
+        return os.path.getsize(get_journal_path(filename))
+    except FileNotFoundError:
+        return 0
+
+def remove_journal(filename:str):
+    """
+    Remove the journal of a yaml log, e.g. after it is compacted into the snapshot
+    """
+    try:
+        os.remove(get_journal_path(filename))
+    except FileNotFoundError:
+        pass
+
+# %%
+def append_journal_record(filename:str, path:list, value, op:str="set"):
+    """
+    Append one mutation to the journal of a yaml log.
+    Each record is a single line: a flow-style mapping inside a yaml sequence,
+    so the whole journal can be parsed as one yaml document.
+
+    op can be one of ["set", "append"]: set the value at the key path, or
+    append it to the list at the key path.
+    """
+    if op not in ("set", "append"):
+        raise ValueError(f"Unknown journal operation: {op}")
+    record = dump_flow({"op": op, "path": list(path), "value": value})
+    with open(get_journal_path(filename), 'a') as file:
+        file.write("- " + record)
+
+def read_journal(filename:str) -> list:
+    """
+    Read the records of a journal. A partially written last record (e.g. after a crash) is ignored.
+    """
+    try:
+        with open(get_journal_path(filename), 'r') as file:
+            content = file.read()
+    except FileNotFoundError:
+        return []
+
+    try:
+        return parse(content) or []
+    except YAMLError:
+        records = []
+        for line in content.splitlines():
+            try:
+                records.extend(parse(line) or [])
+            except YAMLError:
+                warning_msg(f"Ignoring a corrupted record in {get_journal_path(filename)}")
+                break
+        return records
+
+# %%
+def apply_journal_record(document:dict, record:dict) -> dict:
+    """
+    Apply a journal record to a parsed yaml document
+    """
+    if document is None:
+        document = {}
+    *parents, leaf = record["path"]
+    node = document
+    for key in parents:
+        if not isinstance(node.get(key), dict):
+            node[key] = {}
+        node = node[key]
+
+    if record["op"] == "append":
+        if not isinstance(node.get(leaf), list):
+            node[leaf] = []
+        node[leaf].append(record["value"])
+    else:
+        node[leaf] = record["value"]
+    return document
+
+def replay_journal(document:dict, filename:str) -> dict:
+    """
+    Apply all journal records of a yaml log to its parsed snapshot
+    """
+    for record in read_journal(filename):
+        document = apply_journal_record(document, record)
+    return document
@@ -0,0 +1,172 @@
+# %%
+import io
+import os
+import gzip
+import shutil
+from contextlib import contextmanager
+
+from faid.logging import error_msg
+from faid.logging.project import get_project
+from faid.logging.file_utils import atomic_open
+
+PLAIN = "plain"
+
+# the compressed variants of a .yml log: logs/faid/data.yml.gz, logs/faid/data.yml.zst
+CODEC_SUFFIXES = {"gz": ".gz", "zst": ".zst"}
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# %%
+def logical_log_path(filename:str) -> str:
+    """
+    The path a log is known by (e.g. ".../data.yml"), whether or not its file is compressed
+    """
+    for suffix in CODEC_SUFFIXES.values():
+        if filename.endswith(".yml" + suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+def log_type(filename:str) -> str:
+    """
+    The type of a log, as used by the compression policy: "model", "data", "risks",
+    "transparency", or "fairness" for all the experiment logs
+    """
+    name = os.path.basename(logical_log_path(filename))
+    if name.endswith(".yml"):
+        name = name[:-len(".yml")]
+    return name.split("_")[0]
+
+def _codec(path:str) -> str:
+    for codec, suffix in CODEC_SUFFIXES.items():
+        if path.endswith(suffix):
+            return codec
+    return PLAIN
+
+def _variants(filename:str) -> list:
+    filename = logical_log_path(filename)
+    return [filename] + [filename + suffix for suffix in CODEC_SUFFIXES.values()]
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        error_msg("The zstandard package is needed for .yml.zst logs. Please install it with `pip install zstandard`.")
+    return zstandard
+
+# %%
+def set_log_compression(log_type:str, codec:str=None):
+    """
+    Set how the logs of a type ("fairness", "data", "model", "risks", "transparency",
+    or "*" for all of them) are written: "gz", "zst" or "plain".
+    With `codec=None`, the logs of the type keep the format of their file.
+
+        set_log_compression("fairness", "zst")
+        set_log_compression("risks", "plain")  # keep the risk register reviewable
+    """
+    policy = get_project().compression
+    if codec is None:
+        policy.pop(log_type, None)
+        return
+    if codec != PLAIN and codec not in CODEC_SUFFIXES:
+        error_msg(f"Unknown compression {codec}. Please use one of: {PLAIN}, {', '.join(CODEC_SUFFIXES)}.")
+        return
+    if codec == "zst":
+        _zstandard()
+    policy[log_type] = codec
+
+def get_log_compression(filename:str) -> str:
+    """
+    Get the compression set for a log, or None if it keeps the format of its file
+    """
+    policy = get_project().compression
+    return policy.get(log_type(filename), policy.get("*"))
+
+def find_log_file(filename:str) -> str:
+    """
+    Get the file of a log: the plain, .gz or .zst one (the latest if there are several), or None
+    """
+    found = None
+    latest = None
+    for path in _variants(filename):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        if latest is None or mtime > latest:
+            found, latest = path, mtime
+    return found
+
+def log_exists(filename:str) -> bool:
+    """
+    Check if a log exists, compressed or not
+    """
+    return find_log_file(filename) is not None
+
+def log_size(filename:str) -> int:
+    """
+    The size of the file of a log on disk (0 if it does not exist)
+    """
+    path = find_log_file(filename)
+    return os.path.getsize(path) if path is not None else 0
+
+# %%
+@contextmanager
+def open_log(filename:str):
+    """
+    Open a log for reading as text, decompressing it on the fly
+    """
+    path = find_log_file(filename)
+    if path is None:
+        raise FileNotFoundError(filename)
+    codec = _codec(path)
+    if codec == "gz":
+        file = gzip.open(path, 'rt', encoding='utf-8')
+    elif codec == "zst":
+        raw = open(path, 'rb')
+        file = io.TextIOWrapper(_zstandard().ZstdDecompressor().stream_reader(raw), encoding='utf-8')
+    else:
+        file = open(path, 'r')
+    with file:
+        yield file
+
+@contextmanager
+def write_log(filename:str):
+    """
+    Open a log for writing as text. The file is compressed on the fly as set with
+    `set_log_compression` (or keeps its current format), and atomically replaces
+    the previous file of the log, whatever its format.
+    """
+    filename = logical_log_path(filename)
+    codec = get_log_compression(filename)
+    if codec is None:
+        existing = find_log_file(filename)
+        codec = _codec(existing) if existing is not None else PLAIN
+    path = filename + CODEC_SUFFIXES[codec] if codec != PLAIN else filename
+
+    if codec == PLAIN:
+        with atomic_open(path) as file:
+            yield file
+    else:
+        with atomic_open(path, 'wb') as raw:
+            if codec == "gz":
+                compressed = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=GZIP_LEVEL, mtime=0)
+            else:
+                compressed = _zstandard().ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False)
+            text = io.TextIOWrapper(compressed, encoding='utf-8')
+            yield text
+            text.flush()
+            text.detach()
+            # end the gzip member or the zstd frame, the file itself is closed by atomic_open
+            compressed.close()
+
+    for other in _variants(filename):
+        if other != path and os.path.exists(other):
+            os.remove(other)
+
+def copy_log_template(template:str, filename:str):
+    """
+    Create a log from a yaml template, in the format set for its type
+    """
+    with open(template, 'r') as source, write_log(filename) as target:
+        shutil.copyfileobj(source, target)
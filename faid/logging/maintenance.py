@@ -0,0 +1,367 @@
+# %%
+"""
+Compaction and garbage collection of a faid log folder:
+
+- entries that are duplicated (same content, e.g. added by repeated syncs) are removed,
+- template placeholders (the unfilled entries of the log templates) are removed,
+- the experiments started before a date are moved to a compressed bundle (.tar.gz)
+  whose first member, index.json, lists them,
+
+and the bytes reclaimed are reported. The logs are processed one at a time, so memory use
+is bounded by the largest log. It works on the yaml logs (not on an SQLiteBackend database).
+
+    python -m faid.logging.maintenance --dry-run
+    python -m faid.logging.maintenance --archive-older-than 90
+"""
+import io
+import os
+import sys
+import glob
+import json
+import shutil
+import hashlib
+import functools
+import tarfile
+import argparse
+from datetime import datetime, timedelta
+
+from faid.logging import warning_msg, success_msg, get_project_log_path, get_current_folder_path
+from faid.logging import serializer
+from faid.logging.project import FaidProject
+from faid.logging.yaml_utils import read, write, get_document_store
+from faid.logging.file_utils import file_lock, atomic_open
+from faid.logging.journal import journal_size
+from faid.logging.metric_table import METRIC_TABLE_PATTERN
+from faid.logging.metric_series import METRIC_SERIES_SUFFIX
+from faid.logging.experiment_index import get_experiment_index
+from faid.logging.log_compression import log_exists, log_size, find_log_file, logical_log_path
+
+# the sections of the risk register, {id: entry}
+RAID_SECTIONS = ["risks", "assumptions", "issues", "dependencies"]
+
+# the files kept next to an experiment log, archived with it
+EXPERIMENT_SUFFIXES = [".yml", ".yml.gz", ".yml.zst", ".yml.journal", METRIC_TABLE_PATTERN, METRIC_SERIES_SUFFIX, ".metric_series.json", ".attributions"]
+
+ARCHIVE_INDEX = "index.json"
+
+TEMPLATE_FOLDER = os.path.join(get_current_folder_path(), "templates")
+
+# %%
+def content_hash(entry) -> str:
+    """
+    A hash of the content of an entry, independent of the order of its keys
+    """
+    return hashlib.sha256(json.dumps(entry, sort_keys=True, default=str).encode()).hexdigest()
+
+def _is_empty(value) -> bool:
+    return value is None or (isinstance(value, (dict, list)) and len(value) == 0)
+
+@functools.lru_cache(maxsize=None)
+def _template_placeholders() -> dict:
+    """
+    The unfilled entries of the log templates, by the path of their list (or RAID section):
+    {path: {content hash}}. Only these lists are compacted.
+    """
+    placeholders = {}
+
+    def collect(value, path):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                collect(item, path + (key,))
+        elif isinstance(value, list) and len(value) > 0 and all(isinstance(item, dict) for item in value):
+            placeholders.setdefault(path, set()).update(content_hash(item) for item in value)
+            for item in value:
+                # the lists in the entries, e.g. the metrics of a bias_metrics group
+                collect(item, path)
+
+    for name in sorted(os.listdir(TEMPLATE_FOLDER)):
+        with open(os.path.join(TEMPLATE_FOLDER, name)) as file:
+            template = serializer.parse(file) or {}
+        for key, value in template.items():
+            if key in RAID_SECTIONS and name == "risks.yml":
+                placeholders.setdefault((key,), set()).update(content_hash(entry) for entry in value.values())
+            else:
+                collect(value, (key,))
+    return placeholders
+
+def is_placeholder(entry) -> bool:
+    """
+    Whether an entry is an unfilled template entry: an entry of a log template, or a dict
+    whose fields are all None or empty containers
+    """
+    if not isinstance(entry, dict) or len(entry) == 0:
+        return False
+    if all(_is_empty(value) for value in entry.values()):
+        return True
+    digest = content_hash(entry)
+    return any(digest in hashes for hashes in _template_placeholders().values())
+
+def _compact_entries(items:list, dedupe:bool, drop_placeholders:bool, keep_one_placeholder:bool, stats:dict) -> list:
+    """
+    Compact (key, entry) pairs: the index or the RAID id of each entry, kept with it
+    """
+    kept = []
+    seen = set()
+    for key, entry in items:
+        if drop_placeholders and is_placeholder(entry):
+            stats["placeholders"] += 1
+            continue
+        if dedupe:
+            digest = content_hash(entry)
+            if digest in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(digest)
+        kept.append((key, entry))
+    if keep_one_placeholder and len(kept) == 0 and len(items) > 0:
+        # a list with only the template entry keeps it, it is the skeleton to fill in
+        stats["placeholders"] -= 1
+        kept.append(items[0])
+    return kept
+
+def _compact(value, path:tuple, dedupe:bool, drop_placeholders:bool, stats:dict):
+    placeholders = _template_placeholders()
+    if isinstance(value, dict):
+        return {key: _compact(item, path + (key,), dedupe, drop_placeholders, stats) for key, item in value.items()}
+    if isinstance(value, list) and path in placeholders and all(isinstance(item, dict) for item in value):
+        items = [(i, _compact(item, path, dedupe, drop_placeholders, stats)) for i, item in enumerate(value)]
+        return [entry for _, entry in _compact_entries(items, dedupe, drop_placeholders, True, stats)]
+    # the other lists (e.g. sample rows) are data, their repeated or zero entries are kept
+    return value
+
+def compact_document(document:dict, dedupe:bool=True, drop_placeholders:bool=True):
+    """
+    Remove the duplicated and placeholder entries of a log. Returns the compacted log and
+    the number of entries removed: {"duplicates": n, "placeholders": n}.
+
+    Only the RAID sections of the risk register and the lists of the log templates are
+    compacted; the RAID entries that are kept keep their id. In lists, a placeholder is
+    only removed if the list has other entries.
+    """
+    stats = {"duplicates": 0, "placeholders": 0}
+    if not isinstance(document, dict):
+        return document, stats
+    compacted = {}
+    for key, value in document.items():
+        if key in RAID_SECTIONS and isinstance(value, dict):
+            items = list(value.items())
+            compacted[key] = dict(_compact_entries(items, dedupe, drop_placeholders, False, stats))
+        else:
+            compacted[key] = _compact(value, (key,), dedupe, drop_placeholders, stats)
+    return compacted, stats
+
+# %%
+def _size(path:str) -> int:
+    if os.path.isdir(path):
+        return sum(_size(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def compact_log(filename:str, dedupe:bool=True, drop_placeholders:bool=True, dry_run:bool=False) -> dict:
+    """
+    Compact one yaml log (its journal is merged too) and report the entries and bytes removed
+    """
+    store = get_document_store()
+    with store.lock, file_lock(filename):
+        # write the pending changes first, then work on the file, not on a cached copy
+        store.flush(filename)
+        store.discard(filename)
+        bytes_before = log_size(filename) + journal_size(filename)
+        document, stats = compact_document(read(filename), dedupe=dedupe, drop_placeholders=drop_placeholders)
+        changed = sum(stats.values()) > 0 or journal_size(filename) > 0
+        if changed and not dry_run:
+            write(document, filename)
+            bytes_after = log_size(filename)
+        elif changed:
+            bytes_after = len(serializer.dump(document).encode())
+        else:
+            bytes_after = bytes_before
+    return {"file": filename, **stats, "bytes_before": bytes_before, "bytes_after": bytes_after}
+
+def compact_logs(dedupe:bool=True, drop_placeholders:bool=True, dry_run:bool=False) -> dict:
+    """
+    Compact every yaml log of the project, one at a time
+    """
+    log_path = get_project_log_path()
+    results = []
+    names = sorted({logical_log_path(name) for name in os.listdir(log_path)})
+    for name in names:
+        if name.endswith(".yml"):
+            results.append(compact_log(os.path.join(log_path, name), dedupe=dedupe,
+                                       drop_placeholders=drop_placeholders, dry_run=dry_run))
+    return _summary(results)
+
+def _summary(results:list) -> dict:
+    bytes_before = sum(result["bytes_before"] for result in results)
+    bytes_after = sum(result["bytes_after"] for result in results)
+    return {"files": results, "bytes_before": bytes_before, "bytes_after": bytes_after,
+            "bytes_reclaimed": bytes_before - bytes_after}
+
+# %%
+def _experiment_files(filename:str) -> list:
+    base = glob.escape(os.path.splitext(filename)[0])
+    return list(dict.fromkeys(path for suffix in EXPERIMENT_SUFFIXES for path in sorted(glob.glob(base + suffix))))
+
+def _file_digest(path:str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _walk(path:str) -> list:
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(folder, name) for folder, _, names in sorted(os.walk(path)) for name in sorted(names)]
+
+def _to_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if hasattr(value, "isoformat"):
+        return datetime.fromisoformat(value.isoformat())
+    return datetime.fromisoformat(str(value))
+
+def archive_experiments(before, bundle:str=None, dry_run:bool=False) -> dict:
+    """
+    Move the experiments started before a date (a date, datetime or ISO string) to a .tar.gz bundle,
+    with their metric tables, time series and attributions. The first member of the bundle,
+    index.json, lists the archived experiments (see `read_archive_index`). Experiments without
+    a start time are archived if their log was last modified before the date.
+    """
+    before = _to_datetime(before)
+    log_path = get_project_log_path()
+    index = get_experiment_index()
+
+    experiments = []
+    for experiment in index.query():
+        if not log_exists(experiment["path"]):
+            continue
+        try:
+            start_time = _to_datetime(experiment["start_time"]) if experiment["start_time"] else None
+        except ValueError:
+            start_time = None
+        if start_time is None:
+            start_time = datetime.fromtimestamp(os.path.getmtime(find_log_file(experiment["path"])))
+        if start_time.tzinfo is not None and before.tzinfo is None:
+            start_time = start_time.replace(tzinfo=None)
+        if start_time < before:
+            experiments.append(experiment)
+    if len(experiments) == 0:
+        return {"bundle": None, "experiments": [], **_summary([])}
+
+    store = get_document_store()
+    for experiment in experiments:
+        # the pending changes of the experiments are part of the archive
+        store.flush(experiment["path"])
+        experiment["files"] = []
+        for path in _experiment_files(experiment["path"]):
+            for member in _walk(path):
+                experiment["files"].append({"path": os.path.relpath(member, log_path), "size": _size(member),
+                                            "sha256": _file_digest(member)})
+    bytes_before = sum(file["size"] for experiment in experiments for file in experiment["files"])
+
+    if bundle is None:
+        bundle = os.path.join(log_path, "archive", f"experiments_{datetime.now().strftime('%Y%m%dT%H%M%S')}.tar.gz")
+    manifest = {
+        "created": datetime.now().isoformat(),
+        "before": before.isoformat(),
+        "experiments": [{key: experiment[key] for key in ("name", "id", "start_time", "tags", "model", "metrics", "files")}
+                        for experiment in experiments]
+    }
+    if dry_run:
+        return {"bundle": bundle, "experiments": manifest["experiments"], "bytes_before": bytes_before,
+                "bytes_after": None, "bytes_reclaimed": None}
+
+    os.makedirs(os.path.dirname(os.path.abspath(bundle)), exist_ok=True)
+    content = json.dumps(manifest, indent=2).encode()
+    with atomic_open(bundle, 'wb') as file:
+        with tarfile.open(fileobj=file, mode="w:gz") as tar:
+            info = tarfile.TarInfo(ARCHIVE_INDEX)
+            info.size = len(content)
+            info.mtime = int(datetime.now().timestamp())
+            tar.addfile(info, io.BytesIO(content))
+            for experiment in experiments:
+                for member in experiment["files"]:
+                    tar.add(os.path.join(log_path, member["path"]), arcname=member["path"], recursive=False)
+
+    for experiment in experiments:
+        for path in _experiment_files(experiment["path"]):
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        base = os.path.splitext(experiment["path"])[0]
+        for lock in (base + ".yml.lock", base + METRIC_SERIES_SUFFIX + ".lock"):
+            if os.path.exists(lock):
+                os.remove(lock)
+        store.discard(experiment["path"])
+        index.remove(experiment["path"])
+
+    bytes_after = _size(bundle)
+    success_msg(f"Archived {len(experiments)} experiments to {bundle}")
+    return {"bundle": bundle, "experiments": manifest["experiments"], "bytes_before": bytes_before,
+            "bytes_after": bytes_after, "bytes_reclaimed": bytes_before - bytes_after}
+
+def read_archive_index(bundle:str) -> dict:
+    """
+    Read the index of an archive bundle, without decompressing the archived files
+    """
+    with tarfile.open(bundle, mode="r:gz") as tar:
+        member = tar.next()
+        if member is None or member.name != ARCHIVE_INDEX:
+            warning_msg(f"{bundle} has no {ARCHIVE_INDEX}")
+            return {}
+        return json.load(tar.extractfile(member))
+
+# %%
+def _format_bytes(size) -> str:
+    if size is None:
+        return "-"
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def main(argv:list=None):
+    parser = argparse.ArgumentParser(prog="python -m faid.logging.maintenance", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--project", default=".", help="the project folder, which holds logs/faid (default: .)")
+    parser.add_argument("--no-dedupe", action="store_true", help="keep duplicated entries")
+    parser.add_argument("--keep-placeholders", action="store_true", help="keep template placeholder entries")
+    archive = parser.add_mutually_exclusive_group()
+    archive.add_argument("--archive-before", metavar="DATE", help="archive the experiments started before DATE (ISO format)")
+    archive.add_argument("--archive-older-than", metavar="DAYS", type=int, help="archive the experiments started more than DAYS days ago")
+    parser.add_argument("--bundle", help="the path of the archive bundle (default: logs/faid/archive/experiments_<time>.tar.gz)")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be removed, without changing the logs")
+    args = parser.parse_args(argv)
+
+    project = FaidProject(args.project)
+    if not os.path.exists(project.log_path):
+        warning_msg(f"No faid logs in {project.log_path}")
+        return 1
+
+    with project.activate():
+        before = None
+        if args.archive_before is not None:
+            before = args.archive_before
+        elif args.archive_older_than is not None:
+            before = datetime.now() - timedelta(days=args.archive_older_than)
+        if before is not None:
+            archived = archive_experiments(before, bundle=args.bundle, dry_run=args.dry_run)
+            print(f"{len(archived['experiments'])} experiments archived to {archived['bundle']}: "
+                  f"{_format_bytes(archived['bytes_before'])} -> {_format_bytes(archived['bytes_after'])}")
+
+        compacted = compact_logs(dedupe=not args.no_dedupe, drop_placeholders=not args.keep_placeholders, dry_run=args.dry_run)
+        for result in compacted["files"]:
+            if result["bytes_before"] != result["bytes_after"] or result["duplicates"] or result["placeholders"]:
+                print(f"{os.path.relpath(result['file'], project.log_path)}: {result['duplicates']} duplicates, "
+                      f"{result['placeholders']} placeholders, {_format_bytes(result['bytes_before'])} -> {_format_bytes(result['bytes_after'])}")
+
+        reclaimed = compacted["bytes_reclaimed"]
+        if before is not None and archived["bytes_reclaimed"] is not None:
+            reclaimed += archived["bytes_reclaimed"]
+        print(f"{'Would reclaim' if args.dry_run else 'Reclaimed'} {_format_bytes(reclaimed)}")
+    project.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+# %%
+"""
+Merge the logs written by the shards of a distributed run (e.g. one
+`fairness_<name>.yml` per node) into a single log:
+
+    merge_logs(["node0/logs/faid/fairness_eval.yml", "node1/logs/faid/fairness_eval.yml"],
+               "fairness_eval")
+
+The shards are read one at a time, in a single pass.
+"""
+import os
+import shutil
+from collections import OrderedDict
+
+from faid.logging import error_msg, warning_msg, success_msg
+from faid.logging.yaml_utils import read, write, resolve_log_path, get_document_store, get_project_log_path
+from faid.logging.sampling import CONFUSION_CELLS, merge_reservoirs
+from faid.logging.attributions import get_attribution_folder, is_array_reference
+from faid.logging.metric_table import (
+    COLUMNAR_MIN_GROUPS,
+    load_metric_table,
+    save_metric_table
+)
+from faid.logging.metric_series import MetricSeries, get_metric_series_path
+from faid.logging.maintenance import RAID_SECTIONS, content_hash, is_placeholder
+
+# what to do when shards log different values for the same (group, metric)
+CONFLICT_POLICIES = ["first", "last", "mean", "min", "max", "error"]
+
+# %%
+def _is_empty(value) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+def _merge_values(merged, value):
+    """
+    Merge a section of a shard into the merged section: keys are unioned, lists are
+    concatenated without duplicates, and the first non-empty scalar is kept
+    """
+    if _is_empty(merged):
+        return value
+    if isinstance(merged, dict) and isinstance(value, dict):
+        for key, item in value.items():
+            merged[key] = _merge_values(merged.get(key), item)
+        return merged
+    if isinstance(merged, list) and isinstance(value, list):
+        seen = {content_hash(item) for item in merged}
+        for item in value:
+            digest = content_hash(item)
+            if digest not in seen:
+                seen.add(digest)
+                merged.append(item)
+        return merged
+    return merged
+
+# %%
+class _MetricUnion:
+    """
+    The union of the bias metrics of the shards, by (group, metric)
+    """
+
+    def __init__(self, conflict:str):
+        self.conflict = conflict
+        self.groups = OrderedDict()
+        self.levels = None
+        self.conflicts = 0
+
+    def add(self, group, entry:dict, metric:dict):
+        if group not in self.groups:
+            self.groups[group] = {"entry": {key: value for key, value in entry.items() if key != "metrics"},
+                                  "metrics": OrderedDict()}
+        metrics = self.groups[group]["metrics"]
+        name = metric.get("name")
+        value = metric.get("value")
+        if name not in metrics:
+            metrics[name] = {"metric": dict(metric), "values": [value]}
+            return
+        values = metrics[name]["values"]
+        if any(other != value for other in values):
+            self.conflicts += 1
+            if self.conflict == "error":
+                error_msg(f"The shards have different values for {name} of group {group}: {values + [value]}")
+        values.append(value)
+        if self.conflict == "last":
+            metrics[name]["metric"] = dict(metric)
+
+    def add_entries(self, entries:list):
+        for entry in entries or []:
+            if not isinstance(entry, dict) or is_placeholder(entry) or entry.get("group_name") in (None, ""):
+                continue
+            group = entry["group_name"]
+            group = tuple(group) if isinstance(group, list) else group
+            for metric in entry.get("metrics") or []:
+                if metric.get("name"):
+                    self.add(group, entry, metric)
+
+    def add_table(self, table:dict):
+        levels = table["group_levels"].tolist()
+        if self.levels is None:
+            self.levels = levels
+        elif self.levels != levels:
+            warning_msg(f"The shards are grouped by different sensitive features: {self.levels} and {levels}")
+        metrics = table["metrics"].tolist()
+        for key, values in zip(table["group_keys"].tolist(), table["values"].tolist()):
+            group = key[0] if len(key) == 1 else tuple(key)
+            for name, value in zip(metrics, values):
+                self.add(group, {"group_name": group}, {"name": name, "value": value})
+        for name, value in zip(metrics, table["overall"].tolist()):
+            self.add("overall", {"group_name": "overall"}, {"name": name, "value": value})
+
+    def _value(self, values:list):
+        if self.conflict == "last":
+            return values[-1]
+        numbers = [value for value in values if isinstance(value, (int, float))]
+        if self.conflict in ("mean", "min", "max") and len(numbers) == len(values):
+            if self.conflict == "mean":
+                return sum(numbers) / len(numbers)
+            return min(numbers) if self.conflict == "min" else max(numbers)
+        return values[0]
+
+    def entries(self) -> list:
+        entries = []
+        for group, merged in self.groups.items():
+            metrics = []
+            for name, metric in merged["metrics"].items():
+                metrics.append({**metric["metric"], "value": self._value(metric["values"])})
+            entries.append({**merged["entry"], "group_name": list(group) if isinstance(group, tuple) else group,
+                            "metrics": metrics})
+        return entries
+
+    def table(self) -> dict:
+        """
+        The merged metrics as a metric table, or None if they are not all numeric
+        """
+        import numpy as np
+
+        groups = [group for group in self.groups if group != "overall"]
+        metrics = list(OrderedDict.fromkeys(name for group in self.groups.values() for name in group["metrics"]))
+        levels = self.levels or ["group"]
+        keys = [group if isinstance(group, tuple) else (group,) for group in groups]
+        if any(len(key) != len(levels) for key in keys):
+            return None
+        try:
+            def row(group):
+                found = self.groups.get(group, {"metrics": {}})["metrics"]
+                return [float(self._value(found[name]["values"])) if name in found else np.nan for name in metrics]
+            values = np.array([row(group) for group in groups], dtype=np.float64).reshape(len(groups), len(metrics))
+            overall = np.array(row("overall"), dtype=np.float64)
+        except (TypeError, ValueError):
+            return None
+        return {
+            "group_levels": np.array(levels, dtype=str),
+            "group_keys": np.array([[str(k) for k in key] for key in keys], dtype=str).reshape(len(keys), len(levels)),
+            "metrics": np.array(metrics, dtype=str),
+            "values": values,
+            "overall": overall,
+        }
+
+# %%
+def _merge_samples(shards:list, k:int, seed:int) -> dict:
+    """
+    Merge the `sample_data` of the shards: for each confusion cell and group, a uniform sample
+    of k examples over the rows of all the shards
+    """
+    merged = {cell: [] for cell in CONFUSION_CELLS}
+    counts = []
+    for cell in CONFUSION_CELLS:
+        groups = OrderedDict()
+        for sample_data in shards:
+            seen = {(count["cell"], count["group"]): count["seen"] for count in sample_data.get("counts") or []}
+            by_group = OrderedDict()
+            for example in sample_data.get(cell) or []:
+                if is_placeholder(example):
+                    continue
+                group = example.get("group") if isinstance(example, dict) else None
+                by_group.setdefault(group, []).append(example)
+            for group, examples in by_group.items():
+                # without counts (e.g. samples logged by hand), the examples are the whole population
+                groups.setdefault(group, []).append((examples, seen.get((cell, group), len(examples))))
+        for group in sorted(groups, key=str):
+            size = k if k is not None else max(len(examples) for examples, _ in groups[group])
+            merged[cell].extend(merge_reservoirs(groups[group], size, seed=seed))
+            counts.append({"cell": cell, "group": group, "seen": sum(seen for _, seen in groups[group])})
+    merged["counts"] = counts
+    return merged
+
+def _copy_arrays(value, shard_folder:str, out:str):
+    """
+    Copy the attribution arrays referenced by a shard next to the merged log, and update the references
+    """
+    if is_array_reference(value):
+        source = os.path.join(shard_folder, value["path"])
+        folder = get_attribution_folder(out)
+        os.makedirs(folder, exist_ok=True)
+        target = os.path.join(folder, os.path.basename(source))
+        if os.path.exists(source) and not os.path.exists(target):
+            shutil.copyfile(source, target)
+        return {**value, "path": os.path.relpath(target, os.path.dirname(out))}
+    if isinstance(value, dict):
+        return {key: _copy_arrays(item, shard_folder, out) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_arrays(item, shard_folder, out) for item in value]
+    return value
+
+# %%
+class _FairnessLogMerge:
+    """
+    Fold fairness experiment logs, one at a time, into a merged log
+    """
+
+    def __init__(self, out:str, conflict:str, k:int, seed:int):
+        self.out = out
+        self.k = k
+        self.seed = seed
+        self.merged = {}
+        self.metrics = _MetricUnion(conflict)
+        self.sample_data = []
+        self.series = None
+        self.columnar = False
+
+    def add(self, path:str, shard:dict):
+        folder = os.path.dirname(os.path.abspath(path))
+        if shard.get("bias_metrics_table"):
+            self.columnar = True
+            self.metrics.add_table(load_metric_table(path, shard["bias_metrics_table"]))
+        else:
+            self.metrics.add_entries(shard.get("bias_metrics"))
+        if shard.get("bias_metrics_series"):
+            # the steps of each shard are appended to the merged series
+            if self.series is None:
+                self.series = MetricSeries(get_metric_series_path(self.out))
+            frame = MetricSeries(os.path.join(folder, shard["bias_metrics_series"]["path"])).read()
+            for step, values in frame.groupby(level="step"):
+                self.series.append(step, values.droplevel("step").to_dict(orient="index"))
+        # only the samples are kept until the end, they are re-sampled together
+        self.sample_data.append(shard.get("sample_data") or {})
+        for key, value in shard.items():
+            if key not in ("bias_metrics", "bias_metrics_table", "bias_metrics_series", "sample_data"):
+                self.merged[key] = _merge_values(self.merged.get(key), _copy_arrays(value, folder, self.out))
+
+    def result(self) -> tuple:
+        metrics = self.metrics
+        if self.columnar or len(metrics.groups) >= COLUMNAR_MIN_GROUPS:
+            table = metrics.table()
+            if table is not None:
+                self.merged["bias_metrics_table"] = save_metric_table(self.out, table)
+                metrics.groups = OrderedDict((group, merged) for group, merged in metrics.groups.items() if group == "overall")
+        self.merged["bias_metrics"] = metrics.entries()
+        self.merged["sample_data"] = _merge_samples(self.sample_data, self.k, self.seed)
+        if self.series is not None:
+            self.merged["bias_metrics_series"] = self.series.reference()
+        return self.merged, {"conflicts": metrics.conflicts}
+
+class _RegisterMerge:
+    """
+    Fold risk registers, one at a time, into a merged register
+    """
+
+    def __init__(self, conflict:str):
+        self.conflict = conflict
+        self.entries = {kind: OrderedDict() for kind in RAID_SECTIONS}
+        self.others = {}
+        self.duplicates = 0
+
+    def add(self, path:str, shard:dict):
+        for key, value in shard.items():
+            if key not in RAID_SECTIONS:
+                self.others[key] = _merge_values(self.others.get(key), value)
+                continue
+            for _, entry in sorted((value or {}).items(), key=lambda item: str(item[0])):
+                if not isinstance(entry, dict) or is_placeholder(entry):
+                    continue
+                description = entry.get("description")
+                if description in self.entries[key]:
+                    self.duplicates += 1
+                    if self.conflict != "last":
+                        continue
+                self.entries[key][description] = entry
+
+    def result(self) -> tuple:
+        register = {kind: {i: entry for i, entry in enumerate(entries.values())} for kind, entries in self.entries.items()}
+        return {**register, **self.others}, {"duplicates": self.duplicates}
+
+def merge_logs(paths:list, out:str, conflict:str="first", k:int=None, seed:int=None) -> dict:
+    """
+    Merge the fairness logs, or the risk registers, of several shards into `out`
+    (a path, or a log name such as "fairness_eval" or "risks").
+
+    Fairness logs: the bias metrics are unioned by (group, metric). When shards log different values
+    for the same metric, `conflict` decides which is kept: "first", "last", "mean", "min", "max"
+    (of the shard values) or "error". The sampled examples are re-sampled to `k` per confusion cell
+    and group (by default the size of the largest shard sample), weighted by the number of rows
+    each shard saw. Metric tables, time series and attribution arrays are merged next to `out`.
+
+    Risk registers: the RAID entries are deduplicated by description (the first one is kept,
+    or the last one with conflict="last") and renumbered from 0.
+    """
+    if conflict not in CONFLICT_POLICIES:
+        error_msg(f"Unknown conflict policy {conflict}. Please use one of: {', '.join(CONFLICT_POLICIES)}.")
+        return
+    if len(paths) == 0:
+        warning_msg("No logs to merge")
+        return
+    paths = [resolve_log_path(path) for path in paths]
+    out = resolve_log_path(out)
+    if out not in paths:
+        # a previous merge into `out` is replaced, not extended
+        for sidecar in (get_metric_series_path(out), os.path.splitext(get_metric_series_path(out))[0] + ".json"):
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+
+    store = get_document_store()
+    store.flush()
+    merge = None
+    for path in paths:
+        shard = read(path)
+        if merge is None:
+            # the kind of logs is given by the first shard
+            if any(key in shard for key in RAID_SECTIONS):
+                merge = _RegisterMerge(conflict)
+            else:
+                merge = _FairnessLogMerge(out, conflict, k, seed)
+        merge.add(path, shard)
+        del shard
+    merged, stats = merge.result()
+    write(merged, out)
+    store.invalidate(out)
+
+    if isinstance(merge, _FairnessLogMerge) and os.path.dirname(os.path.abspath(out)) == os.path.abspath(get_project_log_path()):
+        from faid.logging.experiment_index import get_experiment_index
+        get_experiment_index().update(out, merged)
+    success_msg(f"Merged {len(paths)} logs into {out}")
+    return {"out": out, "shards": len(paths), **stats}
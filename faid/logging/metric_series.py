@@ -0,0 +1,218 @@
+# %%
+import os
+import json
+
+from faid.logging import warning_msg
+from faid.logging.file_utils import file_lock, atomic_open
+
+METRIC_SERIES_SUFFIX = ".metric_series.bin"
+METRIC_SERIES_FORMAT = "faid-metric-series"
+
+# one fixed-size row per (step, group, metric) value; the names are kept in the .json next to it
+ROW_FIELDS = [("step", "<i8"), ("group", "<i4"), ("metric", "<i4"), ("value", "<f8")]
+
+# %%
+def get_metric_series_path(filename:str) -> str:
+    """
+    Get the path of the metric time series kept next to an experiment log
+    """
+    return os.path.splitext(filename)[0] + METRIC_SERIES_SUFFIX
+
+def group_label(key) -> str:
+    """
+    The name of a group in a series, e.g. "female, 18-25" for a MultiIndex group
+    """
+    if isinstance(key, tuple):
+        return ", ".join(str(k) for k in key)
+    return str(key)
+
+def metric_frame_to_groups(metric_frame) -> dict:
+    """
+    Convert a fairlearn MetricFrame to {group: {metric: value}}, with the overall values under "overall"
+    """
+    import pandas as pd
+
+    by_group = metric_frame.by_group
+    overall = metric_frame.overall
+    if isinstance(by_group, pd.Series):
+        # a single metric
+        name = by_group.name or "metric"
+        by_group = by_group.to_frame(name=name)
+        overall = pd.Series([overall], index=[name])
+    groups = {group_label(key): values for key, values in by_group.to_dict(orient="index").items()}
+    groups["overall"] = overall.to_dict()
+    return groups
+
+# %%
+class MetricSeries:
+    """
+    An append-only store of metric values per step, group and metric, e.g. the bias metrics
+    of each training epoch or production window.
+
+    The values are fixed-size rows in a binary file, so appending a step only writes its rows
+    at the end of the file, and reading memory-maps the file. When the steps are logged in
+    increasing order, a range of steps is found with a binary search.
+    """
+
+    def __init__(self, path:str):
+        self.path = path
+        self.meta_path = os.path.splitext(path)[0] + ".json"
+        self.meta_mtime = None
+        self.meta = self._read_meta()
+
+    @staticmethod
+    def _dtype():
+        import numpy as np
+        return np.dtype(ROW_FIELDS)
+
+    def _read_meta(self) -> dict:
+        if os.path.exists(self.meta_path):
+            mtime = os.stat(self.meta_path).st_mtime_ns
+            if mtime == self.meta_mtime:
+                return self.meta
+            with open(self.meta_path) as file:
+                meta = json.load(file)
+            self.meta_mtime = mtime
+            return meta
+        return {"format": METRIC_SERIES_FORMAT, "groups": [], "metrics": [], "sorted": True}
+
+    def _write_meta(self):
+        with atomic_open(self.meta_path) as file:
+            json.dump(self.meta, file)
+        self.meta_mtime = os.stat(self.meta_path).st_mtime_ns
+
+    def reference(self) -> dict:
+        """
+        The reference to keep in the log
+        """
+        return {
+            "path": os.path.basename(self.path),
+            "format": METRIC_SERIES_FORMAT,
+        }
+
+    def append(self, step:int, groups:dict):
+        """
+        Append the {group: {metric: value}} values of a step.
+        Values that are not numbers are skipped.
+        """
+        import numpy as np
+
+        step = int(step)
+        with file_lock(self.path):
+            # another process may have added names since the last append
+            self.meta = self._read_meta()
+            group_ids = {name: i for i, name in enumerate(self.meta["groups"])}
+            metric_ids = {name: i for i, name in enumerate(self.meta["metrics"])}
+            changed = False
+
+            rows = []
+            skipped = set()
+            for group, values in groups.items():
+                group = group_label(group)
+                for metric, value in values.items():
+                    metric = str(metric)
+                    try:
+                        value = float(value)
+                    except (TypeError, ValueError):
+                        skipped.add(metric)
+                        continue
+                    if group not in group_ids:
+                        group_ids[group] = len(self.meta["groups"])
+                        self.meta["groups"].append(group)
+                        changed = True
+                    if metric not in metric_ids:
+                        metric_ids[metric] = len(self.meta["metrics"])
+                        self.meta["metrics"].append(metric)
+                        changed = True
+                    rows.append((step, group_ids[group], metric_ids[metric], value))
+            if skipped:
+                warning_msg(f"Only numeric metrics are stored in the series, skipped: {', '.join(sorted(skipped))}")
+
+            if self.meta["sorted"]:
+                last_step = self._last_step()
+                if last_step is not None and step < last_step:
+                    self.meta["sorted"] = False
+                    changed = True
+            if changed:
+                self._write_meta()
+
+            if rows:
+                with open(self.path, 'ab') as file:
+                    file.write(np.array(rows, dtype=self._dtype()).tobytes())
+
+    def _last_step(self):
+        """
+        The step of the last row, read from the end of the file
+        """
+        import numpy as np
+
+        dtype = self._dtype()
+        if not os.path.exists(self.path):
+            return None
+        count = os.path.getsize(self.path) // dtype.itemsize
+        if count == 0:
+            return None
+        with open(self.path, 'rb') as file:
+            file.seek((count - 1) * dtype.itemsize)
+            return int(np.frombuffer(file.read(dtype.itemsize), dtype=dtype)["step"][0])
+
+    def _rows(self):
+        import numpy as np
+
+        dtype = self._dtype()
+        if not os.path.exists(self.path):
+            return np.empty(0, dtype=dtype)
+        # a row cut short by a crash is ignored
+        count = os.path.getsize(self.path) // dtype.itemsize
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode='r', shape=(count,))
+
+    def __len__(self) -> int:
+        return len(self._rows())
+
+    def steps(self) -> list:
+        """
+        Get the logged steps
+        """
+        import numpy as np
+        return np.unique(self._rows()["step"]).tolist()
+
+    def read(self, start:int=None, stop:int=None, groups:list=None, metrics:list=None):
+        """
+        Read the values of the steps from `start` to `stop` (both included) as a DataFrame
+        indexed by (step, group) with one column per metric. A step logged twice keeps its last values.
+        """
+        import numpy as np
+        import pandas as pd
+
+        self.meta = self._read_meta()
+        rows = self._rows()
+        if self.meta.get("sorted", True):
+            low = 0 if start is None else np.searchsorted(rows["step"], start, side="left")
+            high = len(rows) if stop is None else np.searchsorted(rows["step"], stop, side="right")
+            rows = rows[low:high]
+        else:
+            mask = np.ones(len(rows), dtype=bool)
+            if start is not None:
+                mask &= rows["step"] >= start
+            if stop is not None:
+                mask &= rows["step"] <= stop
+            rows = rows[mask]
+        if groups is not None:
+            ids = [i for i, name in enumerate(self.meta["groups"]) if name in {group_label(g) for g in groups}]
+            rows = rows[np.isin(rows["group"], ids)]
+        if metrics is not None:
+            ids = [i for i, name in enumerate(self.meta["metrics"]) if name in set(metrics)]
+            rows = rows[np.isin(rows["metric"], ids)]
+
+        frame = pd.DataFrame({
+            "step": np.asarray(rows["step"]),
+            "group": np.asarray(self.meta["groups"], dtype=object)[rows["group"]] if len(rows) else np.empty(0, dtype=object),
+            "metric": np.asarray(self.meta["metrics"], dtype=object)[rows["metric"]] if len(rows) else np.empty(0, dtype=object),
+            "value": np.asarray(rows["value"]),
+        })
+        frame = frame.drop_duplicates(subset=["step", "group", "metric"], keep="last")
+        frame = frame.set_index(["step", "group", "metric"])["value"].unstack("metric")
+        frame.columns.name = None
+        return frame.sort_index()
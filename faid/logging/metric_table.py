@@ -0,0 +1,214 @@
+# %%
+import io
+import os
+import hashlib
+
+from faid.logging import warning_msg, serializer
+from faid.logging.file_utils import atomic_open
+from faid.logging.metric_series import group_label
+
+# Experiments with at least this many groups store their bias metrics as a table by default
+COLUMNAR_MIN_GROUPS = 64
+
+METRIC_TABLE_SUFFIX = ".bias_metrics.npz"
+# the tables are named after their checksum: <log>.bias_metrics_<sha256[:12]>.npz
+METRIC_TABLE_PATTERN = ".bias_metrics*.npz"
+
+# the fields of a metric in the `bias_metrics` entries of an experiment log
+METRIC_FIELDS = ["name", "description", "value", "threshold", "bigger_is_better", "label", "notes", "sg_params"]
+
+# %%
+def get_metric_table_path(filename:str, checksum:str) -> str:
+    """
+    Get the path of a bias metrics table kept next to an experiment log
+    """
+    return os.path.splitext(filename)[0] + f".bias_metrics_{checksum[:12]}.npz"
+
+def _metric_frames(metric_frame) -> tuple:
+    """
+    The by_group DataFrame (groups x metrics) and the overall Series of a MetricFrame,
+    also for a MetricFrame of a single metric
+    """
+    import pandas as pd
+
+    by_group = metric_frame.by_group
+    overall = metric_frame.overall
+    if isinstance(by_group, pd.Series):
+        # a single metric
+        by_group = by_group.to_frame(name=by_group.name or "metric")
+        overall = pd.Series([overall], index=by_group.columns)
+    return by_group, overall
+
+def metric_frame_to_table(metric_frame) -> dict:
+    """
+    Convert a fairlearn MetricFrame to columns: the group keys (one column per
+    sensitive feature), the metric names, the (groups x metrics) value matrix
+    and the overall values. Raises a ValueError if a metric is not numeric.
+    """
+    import numpy as np
+
+    by_group, overall = _metric_frames(metric_frame)
+
+    index = by_group.index
+    group_levels = [str(name) if name is not None else f"level_{i}" for i, name in enumerate(index.names)]
+    group_keys = [key if isinstance(key, tuple) else (key,) for key in index]
+    try:
+        values = by_group.to_numpy(dtype=np.float64)
+        overall = overall.reindex(by_group.columns).to_numpy(dtype=np.float64)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Only numeric metrics can be stored as a table: {e}")
+
+    return {
+        "group_levels": np.array(group_levels, dtype=str),
+        "group_keys": np.array([[str(k) for k in key] for key in group_keys], dtype=str).reshape(len(group_keys), len(group_levels)),
+        "metrics": np.array([str(c) for c in by_group.columns], dtype=str),
+        "values": values,
+        "overall": overall,
+    }
+
+# %%
+def read_metric_thresholds(thresholds) -> dict:
+    """
+    Read a table of metric thresholds as {(group, metric): {field: value}}, where group is None
+    for the rows that apply to every group. The table is a DataFrame (or a list of rows, or the
+    path of a .csv or .yml file) with a "metric" column, an optional "group" column and any of the
+    "threshold", "bigger_is_better", "description", "label" and "notes" columns, or a dict
+    {metric: threshold} or {metric: {field: value}}.
+    """
+    import pandas as pd
+
+    if thresholds is None:
+        return {}
+    if isinstance(thresholds, str):
+        if thresholds.endswith(".csv"):
+            thresholds = pd.read_csv(thresholds)
+        else:
+            with open(thresholds, 'r') as file:
+                thresholds = serializer.parse(file)
+    if isinstance(thresholds, dict):
+        return {(None, str(metric)): dict(fields) if isinstance(fields, dict) else {"threshold": fields}
+                for metric, fields in thresholds.items()}
+
+    table = pd.DataFrame(thresholds)
+    if "metric" not in table.columns:
+        table = table.rename_axis("metric").reset_index()
+    fields = [field for field in METRIC_FIELDS if field in table.columns and field not in ("name", "value")]
+    groups = table["group"].where(table["group"].notna(), None) if "group" in table.columns else [None] * len(table)
+    rows = table[fields].astype(object).where(table[fields].notna(), None).to_dict(orient="records")
+    return {(None if group is None else str(group), str(metric)): {field: value for field, value in row.items() if value is not None}
+            for group, metric, row in zip(groups, table["metric"], rows)}
+
+def _python_value(value):
+    # numpy scalars are logged as plain numbers
+    return value.item() if hasattr(value, "item") else value
+
+def _metric_entries(labels:list, metrics:list, rows:list, thresholds:dict) -> list:
+    """
+    Build the `bias_metrics` entries from group names, metric names, the (groups x metrics)
+    values and the thresholds read with `read_metric_thresholds`
+    """
+    # the fields of each metric are resolved once, not per group
+    defaults = {"description": "", "value": 0, "threshold": 0, "bigger_is_better": False, "label": "", "notes": "", "sg_params": {}}
+    templates = [{"name": metric, **defaults, **thresholds.get((None, metric), {})} for metric in metrics]
+    by_group = {}
+    for (group, metric), fields in thresholds.items():
+        if group is not None:
+            by_group.setdefault(group, {})[metric] = fields
+
+    entries = []
+    for label, row in zip(labels, rows):
+        overrides = by_group.get(label, {})
+        entries.append({
+            "group_name": label,
+            "description": "",
+            "label": "",
+            # each metric gets its own sg_params, the entries share no objects
+            "metrics": [{**template, **overrides.get(metric, {}), "value": value, "sg_params": {}}
+                        for metric, value, template in zip(metrics, row, templates)]
+        })
+    return entries
+
+def metric_groups_to_entries(groups:dict, thresholds=None) -> list:
+    """
+    Convert {group: {metric: value}} to the `bias_metrics` entries of an experiment log,
+    with the fields of the `thresholds` table (see `read_metric_thresholds`)
+    """
+    metrics = list(dict.fromkeys(str(metric) for values in groups.values() for metric in values))
+    rows = [[_python_value(values.get(metric)) for metric in metrics] for values in
+            ({str(metric): value for metric, value in values.items()} for values in groups.values())]
+    return _metric_entries([group_label(group) for group in groups], metrics, rows, read_metric_thresholds(thresholds))
+
+def metric_frame_to_entries(metric_frame, thresholds=None) -> list:
+    """
+    Convert a fairlearn MetricFrame to the `bias_metrics` entries of an experiment log: one entry
+    per group (named like "female, 18-25" when there are several sensitive features), then "overall".
+    The values are converted column-wise, and `thresholds` (see `read_metric_thresholds`) sets
+    the threshold and the other fields of the metrics.
+    """
+    by_group, overall = _metric_frames(metric_frame)
+    metrics = [str(metric) for metric in by_group.columns]
+    labels = [group_label(key) for key in by_group.index] + ["overall"]
+    values = by_group.to_numpy()
+    if values.dtype.kind in "biuf":
+        rows = values.tolist()
+    else:
+        rows = [[_python_value(value) for value in row] for row in values.tolist()]
+    rows.append([_python_value(value) for value in overall.reindex(by_group.columns).tolist()])
+    return _metric_entries(labels, metrics, rows, read_metric_thresholds(thresholds))
+
+# %%
+def save_metric_table(filename:str, table:dict) -> dict:
+    """
+    Write a metric table next to an experiment log, and return the reference
+    to keep in the log: file name, shape, metric names and checksum
+    """
+    import numpy as np
+
+    buffer = io.BytesIO()
+    np.savez(buffer, **table)
+    content = buffer.getvalue()
+    checksum = hashlib.sha256(content).hexdigest()
+
+    # the checksum in the name keeps the tables of earlier (or rolled back) entries intact
+    path = get_metric_table_path(filename, checksum)
+    if not os.path.exists(path):
+        with atomic_open(path, 'wb') as file:
+            file.write(content)
+
+    return {
+        "path": os.path.basename(path),
+        "format": "npz",
+        "groups": int(table["values"].shape[0]),
+        "group_levels": [str(level) for level in table["group_levels"]],
+        "metrics": [str(metric) for metric in table["metrics"]],
+        "sha256": checksum,
+    }
+
+def load_metric_table(filename:str, reference:dict) -> dict:
+    """
+    Load the metric table referenced from an experiment log
+    """
+    import numpy as np
+
+    path = os.path.join(os.path.dirname(filename), reference["path"])
+    with open(path, 'rb') as file:
+        content = file.read()
+    if reference.get("sha256") and hashlib.sha256(content).hexdigest() != reference["sha256"]:
+        warning_msg(f"{path} was changed after it was logged, the checksum does not match")
+    with np.load(io.BytesIO(content), allow_pickle=False) as table:
+        return {key: table[key] for key in table.files}
+
+def metric_table_to_frame(table:dict):
+    """
+    Build a DataFrame (groups x metrics) from a metric table,
+    indexed by a MultiIndex when there are several sensitive features
+    """
+    import pandas as pd
+
+    levels = table["group_levels"].tolist()
+    keys = table["group_keys"]
+    if len(levels) == 1:
+        index = pd.Index(keys[:, 0], name=levels[0])
+    else:
+        index = pd.MultiIndex.from_arrays(list(keys.T), names=levels)
+    return pd.DataFrame(table["values"], index=index, columns=table["metrics"].tolist())
@@ -1,34 +1,35 @@
-from os.path import join, exists
+from os.path import join
 import re
 from collections import defaultdict
-from shutil import copy
 
-from faid.logging import error_msg, warning_msg, success_msg, update, load, get_project_log_path, get_current_folder_path
+from faid.logging import error_msg, warning_msg, success_msg, update, load, load_section, get_project_log_path, get_current_folder_path
+from faid.logging.log_compression import log_exists, copy_log_template
+from faid.logging.project import get_project, in_project
 
-model_file_path = join(get_project_log_path(), "model.yml")
 model_file_template_path = join(get_current_folder_path(), "templates/model.yml")
 model_file_template_with_description_path = join(get_current_folder_path(), "template_example_descriptions/model_template_description.yml")
 
 def initialize_model_log(test:bool=False):
-    if not exists(model_file_path):
+    model_file_path = get_model_log_file_path()
+    if not log_exists(model_file_path):
         if test:
-            copy(model_file_template_with_description_path, model_file_path)
+            copy_log_template(model_file_template_with_description_path, model_file_path)
             success_msg("Model log file created with example descriptions.")
         else:
-            copy(model_file_template_path, model_file_path)
+            copy_log_template(model_file_template_path, model_file_path)
             success_msg("Model log file created.")
     else:
         warning_msg("Model log file already exists.  Logging will be appended to the existing file.")
 
 def get_model_log_file_path():
-    return model_file_path
+    return join(get_project_log_path(), "model.yml")
 
 def get_model_entry(key:str=None):
     if key is None:
-        return load(model_file_path)
+        return load(get_model_log_file_path())
     else:
         try:
-            return load(model_file_path)[key]
+            return load_section(get_model_log_file_path(), key)
         except KeyError:
             error_msg(f"Key {key} not found in the metadata file")
             return None
@@ -261,7 +262,9 @@ class ModelCard:
                 ]
             }
 
-            self.model_info = load(model_file_path)
+            self.project = get_project()
+            self.model_file_path = get_model_log_file_path()
+            self.model_info = load(self.model_file_path)
             #print("Model info is loaded from the model log file.")
 
         def get_model_info(self):
@@ -387,6 +390,7 @@ class ModelCard:
                     considerations[key] = existing_considerations[key]
             self.model_info["considerations"] = considerations
 
+        @in_project
         def save(self, print_values:bool=False):
             """
             Saves the model information to the model log file.
@@ -394,7 +398,7 @@ class ModelCard:
             for key, value in self.model_info.items():
                 if print_values:
                     print(f"Key: {key}, Value: {value}")
-                update(value, key=key, filename=model_file_path)
+                update(value, key=key, filename=self.model_file_path)
             success_msg("Model info saved to the model log file.")
         
         def to_dict(self):
@@ -0,0 +1,144 @@
+# %%
+import os
+import weakref
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# %%
+class FaidProject:
+    """
+    A handle on the faid logs of one project folder. It owns the paths of the logs
+    (`<root>/logs/faid`) and reports (`<root>/reports`), the cache of parsed logs,
+    the storage backend, the compression policy, the experiment index and the background writers of its experiment records.
+
+    The functions of faid.logging work on the active project: the one activated with
+    `with project.activate():` in the current thread or asyncio task, otherwise the
+    default project of the working directory. All of them are also available as
+    methods of the handle, so several projects can be logged from one process:
+
+        project = FaidProject("runs/model_a")
+        project.init_log()
+        project.add_risk_entry("...", "High", "Low", "...")
+        record = project.FairnessExperimentRecord("winogrande")
+    """
+
+    def __init__(self, root:str=None):
+        from faid.logging.yaml_utils import new_document_store
+        self.root = os.path.abspath(root if root is not None else os.getcwd())
+        self.log_path = os.path.join(self.root, "logs", "faid") + os.sep
+        self.report_path = os.path.join(self.root, "reports") + os.sep
+        self.store = new_document_store(self)
+        self.backend = None
+        self.compression = {}
+        self.writers = weakref.WeakSet()
+        self._experiment_index = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"FaidProject({self.root!r})"
+
+    def get_log_file_path(self, name:str) -> str:
+        """
+        Get the path of a log (e.g. "model") of the project
+        """
+        return os.path.join(self.log_path, f"{name}.yml")
+
+    @property
+    def experiment_index(self):
+        """
+        The index of the project's fairness experiments, opened on first use
+        """
+        with self._lock:
+            if self._experiment_index is None:
+                from faid.logging.experiment_index import ExperimentIndex
+                with self.activate():
+                    self._experiment_index = ExperimentIndex()
+            return self._experiment_index
+
+    @contextmanager
+    def activate(self):
+        """
+        Make this the active project of the current thread or asyncio task
+        """
+        token = _active_project.set(self)
+        try:
+            yield self
+        finally:
+            _active_project.reset(token)
+
+    def __getattr__(self, name:str):
+        # expose the faid.logging and faid.report functions, run on this project
+        if name.startswith("_"):
+            raise AttributeError(name)
+        import faid.logging
+        import faid.report
+        for package in (faid.logging, faid.report):
+            if name in package.__all__:
+                function = getattr(package, name)
+                break
+        else:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+        @functools.wraps(function)
+        def method(*args, **kwargs):
+            with self.activate():
+                return function(*args, **kwargs)
+        return method
+
+    def flush(self):
+        """
+        Write the queued and pending changes of the project's logs
+        """
+        for writer in list(self.writers):
+            writer.flush()
+        with self.activate():
+            from faid.logging.yaml_utils import get_storage_backend
+            get_storage_backend().flush()
+
+    def close(self):
+        """
+        Flush the project, then stop its writer threads and its document store
+        """
+        for writer in list(self.writers):
+            writer.close()
+        self.flush()
+        self.store.close()
+        if self._experiment_index is not None:
+            self._experiment_index.close()
+            self._experiment_index = None
+
+# %%
+_active_project = contextvars.ContextVar("faid_project", default=None)
+_default_projects = {}
+_default_projects_lock = threading.Lock()
+
+def get_default_project() -> FaidProject:
+    """
+    Get the default project, rooted at the working directory
+    """
+    root = os.getcwd()
+    with _default_projects_lock:
+        project = _default_projects.get(root)
+        if project is None:
+            project = _default_projects[root] = FaidProject(root)
+    return project
+
+def get_project() -> FaidProject:
+    """
+    Get the active project, or the default one if no project is active
+    """
+    project = _active_project.get()
+    return project if project is not None else get_default_project()
+
+def in_project(method):
+    """
+    Run a method of an object created in a project (e.g. a ModelCard) on that project,
+    wherever it is called from
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.project.activate():
+            return method(self, *args, **kwargs)
+    return wrapper
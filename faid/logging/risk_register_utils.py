@@ -1,158 +1,251 @@
-from os.path import join, exists
-from shutil import copy
-import collections
+from os.path import join
+import weakref
 
-from faid.logging import error_msg, warning_msg, success_msg, update, load, get_project_log_path, get_current_folder_path
+from faid.logging import error_msg, warning_msg, success_msg, load, load_section, transaction, get_project_log_path, get_current_folder_path
+from faid.logging import get_storage_backend, YamlBackend
+from faid.logging.project import get_project
+from faid.logging import yaml_utils
+from faid.logging.yaml_utils import update_entries, resolve_log_path, get_document_store
+from faid.logging.log_compression import log_exists, copy_log_template
 
-risk_file_path = join(get_project_log_path(), "risks.yml")
 risk_file_template_path = join(get_current_folder_path(), "templates/risks.yml")
 risk_file_template_with_description_path = join(get_current_folder_path(), "template_example_descriptions/risks_template_description.yml")
 
 def initialize_risk_log(test:bool=False):
-    if not exists(risk_file_path):
+    risk_file_path = get_risk_register_log_path()
+    if not log_exists(risk_file_path):
         if test:
-            copy(risk_file_template_with_description_path, risk_file_path)
+            copy_log_template(risk_file_template_with_description_path, risk_file_path)
             success_msg("Risks log file created with sample descriptions.")
         else:
-            copy(risk_file_template_path, risk_file_path)
+            copy_log_template(risk_file_template_path, risk_file_path)
             success_msg("Risks log file created.")
     else:
         warning_msg("Risks log file already exists. Logging will be appended to the existing file.")
 
 def get_risk_register_log_path():
-    return risk_file_path
+    return join(get_project_log_path(), "risks.yml")
+
+# %%
+# the fields of the entries of each section of the register
+RAID_FIELDS = {
+    "risks": ["description", "impact", "likelihood", "mitigation"],
+    "assumptions": ["description", "impact", "action"],
+    "issues": ["description", "impact", "status", "action"],
+    "dependencies": ["description", "impact", "status", "action"]
+}
+
+_RAID_NAMES = {"risks": "risk", "assumptions": "assumption", "issues": "issue", "dependencies": "dependency"}
+
+class RaidRegister:
+    """
+    The risks, assumptions, issues and dependencies of the risk register, with an index of
+    the entry descriptions and the next id of each section, so adding an entry does not
+    reload and scan the register. New ids are above every existing id, so they never
+    collide with an entry, even after entries were deleted.
+
+    The index is rebuilt when the register is changed outside of it (by another process,
+    or with `update`). Use `get_raid_register()` to get the register of the active project.
+
+        register = get_raid_register()
+        register.add_many("risks", [{"description": ..., "impact": ..., "likelihood": ..., "mitigation": ...}, ...])
+    """
+
+    def __init__(self, filename:str=None):
+        self.filename = resolve_log_path(filename or get_risk_register_log_path())
+        self.descriptions = {}
+        self.next_ids = {}
+        self._version = None
+
+    def _current_version(self):
+        # other backends have no cheap change token, their register is reloaded on each write
+        if isinstance(get_storage_backend(), YamlBackend):
+            return get_document_store().version(self.filename)
+        return None
+
+    def refresh(self):
+        """
+        Rebuild the index from the register
+        """
+        with get_document_store().lock:
+            data = load(self.filename, keys=list(RAID_FIELDS))
+            self.descriptions = {}
+            self.next_ids = {}
+            for kind in RAID_FIELDS:
+                entries = data.get(kind) or {}
+                self.descriptions[kind] = {entry.get("description"): id for id, entry in entries.items()
+                                           if isinstance(entry, dict)}
+                ids = [id for id in entries if isinstance(id, int)]
+                self.next_ids[kind] = max(ids) + 1 if ids else 0
+            self._version = self._current_version()
+
+    def _sync(self):
+        if self._version is None or self._version != self._current_version():
+            self.refresh()
+
+    def _check_kind(self, kind:str):
+        if kind not in RAID_FIELDS:
+            raise ValueError(f"Unknown register section {kind}. Please use one of: {', '.join(RAID_FIELDS)}.")
+
+    def find(self, kind:str, description:str) -> int:
+        """
+        Get the id of the entry with this description, or None
+        """
+        self._check_kind(kind)
+        with get_document_store().lock:
+            self._sync()
+            return self.descriptions[kind].get(description)
+
+    def add(self, kind:str, entry:dict) -> int:
+        """
+        Add an entry to a section ("risks", "assumptions", "issues" or "dependencies").
+        Returns its id, or None if the section already has an entry with the same description.
+        """
+        ids = self.add_many(kind, [entry])
+        return ids[0]
+
+    def add_many(self, kind:str, entries:list) -> list:
+        """
+        Add entries (dicts with the fields of the section, see RAID_FIELDS) to a section
+        with a single write of the register. Returns the id of each entry, None for
+        the entries whose description is already in the register (or earlier in `entries`).
+        """
+        self._check_kind(kind)
+        fields = RAID_FIELDS[kind]
+        outermost = self.filename not in yaml_utils._transactions
+        # the transaction holds the store lock, which also guards the index
+        with transaction(self.filename):
+            self._sync()
+            descriptions = self.descriptions[kind]
+            ids, records, duplicates = [], [], []
+            for entry in entries:
+                entry = {field: entry.get(field, "") for field in fields}
+                if entry["description"] in descriptions:
+                    ids.append(None)
+                    duplicates.append(entry["description"])
+                    continue
+                id = self.next_ids[kind]
+                self.next_ids[kind] = id + 1
+                descriptions[entry["description"]] = id
+                records.append({"op": "set", "path": [kind, id], "value": entry})
+                ids.append(id)
+            if records:
+                try:
+                    update_entries(records, filename=self.filename)
+                except BaseException:
+                    self._version = None
+                    raise
+                if outermost:
+                    # write the register now (instead of when the transaction ends) to keep the index
+                    # in step with the file, under the same lock
+                    get_storage_backend().flush(self.filename)
+                self._version = self._current_version()
+        if duplicates:
+            name = _RAID_NAMES[kind]
+            if len(duplicates) == 1:
+                warning_msg(f"{name.capitalize()} with description {duplicates[0]} already exists.")
+            else:
+                warning_msg(f"Skipped {len(duplicates)} {kind} whose description already exists.")
+        return ids
+
+_registers = weakref.WeakKeyDictionary()
+
+def get_raid_register() -> RaidRegister:
+    """
+    Get the register of the risk log of the active project
+    """
+    project = get_project()
+    filename = resolve_log_path(get_risk_register_log_path())
+    registers = _registers.setdefault(project, {})
+    if filename not in registers:
+        registers[filename] = RaidRegister(filename)
+    return registers[filename]
+
+def _add_entry(kind:str, entry:dict) -> int:
+    id = get_raid_register().add(kind, entry)
+    if id is not None:
+        print(f"Added the {_RAID_NAMES[kind]}: {entry['description']}.")
+    return id
 
 @staticmethod
 def add_risk_entry(description:str, impact:str, likelihood:str, mitigation:str):
     """
     Add a risk entry to the risk register
-    Key can be one of ["risks", "assumptions", "issues", "dependencies"]
     """
-    # add an id to the risk entry
-    risk_data = load(risk_file_path)["risks"]
-
-    # if the risk_data is empty, set the id to 0
-    if len(risk_data) == 0:
-        id = 0
-    else:
-        id = len(risk_data)
-
-    # if the risk data contains an entry with the same description, do not add it
-    for risk in risk_data.values():
-        if risk["description"] == description:
-            error_msg(f"Risk with description {description} already exists.")
-            return
-    
-    update({id: {
+    return _add_entry("risks", {
         "description": description,
         "impact": impact,
         "likelihood": likelihood,
         "mitigation": mitigation
-        }}, key="risks", filename=risk_file_path)
-    print(f"Added the risk: {description}.")
+        })
 
 @staticmethod
 def add_assumption_entry(description: str, impact: str, action: str):
     """
     Add an assumption entry to the risk register
     """
-    assumption_data = load(risk_file_path)["assumptions"]
-
-    if len(assumption_data) == 0:
-        id = 0
-    else:
-        id = len(assumption_data)
-
-    for assumption in assumption_data.values():
-        if assumption["description"] == description:
-            error_msg(f"Assumption with description {description} already exists.")
-            return
-
-    update({id: {
+    return _add_entry("assumptions", {
         "description": description,
         "impact": impact,
         "action": action
-        }}, key="assumptions" ,filename=risk_file_path)
-    print(f"Added the assumption: {description}.")
+        })
 
 @staticmethod
 def add_issue_entry(description: str, impact: str, status: str, action: str):
     """
     Add an issue entry to the risk register
     """
-    issue_data = load(risk_file_path)["issues"]
-
-    if len(issue_data) == 0:
-        id = 0
-    else:
-        id = len(issue_data)
-
-    for issue in issue_data.values():
-        if issue["description"] == description:
-            error_msg(f"Issue with description {description} already exists.")
-            return
-
-    update({id: {
+    return _add_entry("issues", {
         "description": description,
         "impact": impact,
         "status": status,
         "action": action
-        }}, key="issues", filename=risk_file_path)
-    print(f"Added the issue: {description}.")
+        })
 
 @staticmethod
 def add_dependency_entry(description: str, impact: str, status: str, action: str):
     """
     Add a dependency entry to the risk register
     """
-    dependency_data = load(risk_file_path)["dependencies"]
-
-    if len(dependency_data) == 0:
-        id = 0
-    else:
-        id = len(dependency_data)
-
-    for dependency in dependency_data.values():
-        if dependency["description"] == description:
-            error_msg(f"Dependency with description {description} already exists.")
-            return
-
-    update({id: {
+    return _add_entry("dependencies", {
         "description": description,
         "impact": impact,
         "status": status,
         "action": action
-    }}, key="dependencies", filename=risk_file_path)
-    print(f"Added the dependency: {description}.")
+        })
 
 @staticmethod
 def get_risk_entries():
+    risk_file_path = get_risk_register_log_path()
     try:
-        return load(risk_file_path)["risks"]
+        return load_section(risk_file_path, "risks")
     except KeyError:
         error_msg("Risk field could not be found in the metadata file")
         return None
     
 @staticmethod
 def get_assumption_entries():
+    risk_file_path = get_risk_register_log_path()
     try:
-        return load(risk_file_path)["assumptions"]
+        return load_section(risk_file_path, "assumptions")
     except KeyError:
         error_msg("Assumption field could not be found in the metadata file")
         return None
 
 @staticmethod
 def get_issue_entries():
+    risk_file_path = get_risk_register_log_path()
     try:
-        return load(risk_file_path)["issues"]
+        return load_section(risk_file_path, "issues")
     except KeyError:
         error_msg("Issue field could not be found in the metadata file")
         return None
     
 @staticmethod
 def get_dependency_entries():
+    risk_file_path = get_risk_register_log_path()
     try:
-        return load(risk_file_path)["dependencies"]
+        return load_section(risk_file_path, "dependencies")
     except KeyError:
         error_msg("Dependency field could not be found in the metadata file")
         return None
\ No newline at end of file
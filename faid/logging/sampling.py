@@ -0,0 +1,147 @@
+# %%
+CONFUSION_CELLS = ["tps", "fps", "tns", "fns"]
+
+def _to_python(value):
+    """
+    Convert numpy scalars and arrays to values the yaml logs can store
+    """
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {_to_python(k): _to_python(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_python(v) for v in value]
+    return value
+
+# %%
+class ConfusionReservoirSampler:
+    """
+    Keep a uniform random sample of k examples per confusion cell (tps, fps, tns, fns)
+    and per sensitive group, from predictions consumed in chunks.
+    Memory is O(k) per cell and group, whatever the number of rows (reservoir sampling, Algorithm R).
+
+        sampler = ConfusionReservoirSampler(k=5)
+        for X, y_true, y_pred, group in chunks:
+            sampler.update(X, y_true, y_pred, group)
+        sampler.samples()  # {"tps": [...], "fps": [...], "tns": [...], "fns": [...]}
+    """
+
+    def __init__(self, k:int=5, positive_label=1, seed:int=None):
+        import numpy as np
+        self.k = k
+        self.positive_label = positive_label
+        self.rng = np.random.default_rng(seed)
+        # (cell, group) -> number of rows seen and the sampled rows
+        self.seen = {}
+        self.reservoirs = {}
+
+    def update(self, features, y_true, y_pred, group=None):
+        """
+        Consume a chunk of rows. `features` can be a DataFrame, a 2D array, a list of rows or None;
+        `group` holds the sensitive group of each row (or None for a single group).
+        """
+        import numpy as np
+
+        y_true = np.asarray(y_true)
+        y_pred = np.asarray(y_pred)
+        true_positive = y_true == self.positive_label
+        predicted_positive = y_pred == self.positive_label
+        cells = {
+            "tps": predicted_positive & true_positive,
+            "fps": predicted_positive & ~true_positive,
+            "tns": ~predicted_positive & ~true_positive,
+            "fns": ~predicted_positive & true_positive,
+        }
+
+        if group is None:
+            groups = {None: np.ones(len(y_true), dtype=bool)}
+        else:
+            group = np.asarray(group)
+            groups = {key: group == key for key in np.unique(group)}
+
+        for cell, cell_mask in cells.items():
+            for key, group_mask in groups.items():
+                rows = np.flatnonzero(cell_mask & group_mask)
+                if len(rows) > 0:
+                    self._sample(cell, _to_python(key), rows, features, y_true, y_pred)
+
+    def _sample(self, cell:str, key, rows, features, y_true, y_pred):
+        import numpy as np
+        reservoir = self.reservoirs.setdefault((cell, key), [])
+        seen = self.seen.get((cell, key), 0)
+
+        # fill the reservoir, then row number n replaces a random slot with probability k/n
+        fill = min(len(rows), self.k - len(reservoir))
+        chosen = {len(reservoir) + i: row for i, row in enumerate(rows[:fill])}
+        rest = rows[fill:]
+        if len(rest) > 0:
+            counts = seen + fill + 1 + np.arange(len(rest))
+            slots = (self.rng.random(len(rest)) * counts).astype(int)
+            # a later row replaces an earlier one in the same slot
+            for slot, row in zip(slots, rest):
+                if slot < self.k:
+                    chosen[int(slot)] = row
+        self.seen[(cell, key)] = seen + len(rows)
+
+        # only the examples that end up in the reservoir are built
+        for slot, row in chosen.items():
+            example = self._example(row, features, y_true, y_pred, key)
+            if slot < len(reservoir):
+                reservoir[slot] = example
+            else:
+                reservoir.append(example)
+
+    @staticmethod
+    def _example(row:int, features, y_true, y_pred, key) -> dict:
+        if features is None:
+            example = {}
+        elif hasattr(features, "iloc"):
+            # column by column, a row Series would cast the values to a common dtype
+            example = {"features": {_to_python(column): _to_python(features[column].iloc[row]) for column in features.columns}}
+        else:
+            example = {"features": _to_python(features[row])}
+        example["y_true"] = _to_python(y_true[row])
+        example["y_pred"] = _to_python(y_pred[row])
+        if key is not None:
+            example["group"] = key
+        return example
+
+    def samples(self) -> dict:
+        """
+        Get the sampled examples of each confusion cell, ordered by group
+        """
+        samples = {cell: [] for cell in CONFUSION_CELLS}
+        for (cell, key) in sorted(self.reservoirs, key=lambda item: (CONFUSION_CELLS.index(item[0]), str(item[1]))):
+            samples[cell].extend(self.reservoirs[(cell, key)])
+        return samples
+
+    def counts(self) -> list:
+        """
+        Get the number of rows seen per confusion cell and group, needed to merge the samples of several runs
+        """
+        return [{"cell": cell, "group": key, "seen": self.seen[(cell, key)]}
+                for (cell, key) in sorted(self.seen, key=lambda item: (CONFUSION_CELLS.index(item[0]), str(item[1])))]
+
+# %%
+def merge_reservoirs(reservoirs:list, k:int, seed:int=None) -> list:
+    """
+    Merge uniform samples of disjoint populations into a uniform sample of k examples of
+    their union. `reservoirs` is a list of (examples, seen) pairs, where `seen` is the size of
+    the population the examples were sampled from: each draw picks a population with a
+    probability proportional to its remaining size, then one of its remaining examples.
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    pools = [list(examples) for examples, _ in reservoirs]
+    remaining = [max(int(seen), len(examples)) for examples, seen in reservoirs]
+    merged = []
+    while len(merged) < k and sum(remaining) > 0:
+        weights = np.array(remaining, dtype=float)
+        i = int(rng.choice(len(pools), p=weights / weights.sum()))
+        remaining[i] -= 1
+        if len(pools[i]) > 0:
+            merged.append(pools[i].pop(int(rng.integers(len(pools[i])))))
+        else:
+            # the population is larger than its sample, nothing left to draw from it
+            remaining[i] = 0
+    return merged
@@ -0,0 +1,185 @@
+# %%
+import yaml
+from yaml.composer import Composer, ComposerError
+from yaml.events import (
+    StreamEndEvent,
+    MappingStartEvent,
+    MappingEndEvent,
+    SequenceStartEvent,
+    SequenceEndEvent
+)
+
+# Use the libyaml bindings when PyYAML was built against libyaml
+LIBYAML = getattr(yaml, "__with_libyaml__", False)
+
+# The implementation is based on https://github.com/Anthonyhawkins/yamlmaker/
+def represent_multiline_str(dumper, data):
+    """
+    Dump multiline strings as `|` blocks
+    """
+    if '\n' in data:
+        return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='|')
+    return dumper.represent_str(data)
+
+# Register the representers once, on the pure-Python and on the libyaml dumper
+yaml.add_representer(str, represent_multiline_str, Dumper=yaml.SafeDumper)
+if LIBYAML:
+    yaml.add_representer(str, represent_multiline_str, Dumper=yaml.CSafeDumper)
+
+# %%
+def get_loader(fast:bool=True):
+    """
+    Get the safe yaml loader, backed by libyaml if available and `fast` is True
+    """
+    return yaml.CSafeLoader if fast and LIBYAML else yaml.SafeLoader
+
+def get_dumper(fast:bool=True):
+    """
+    Get the safe yaml dumper, backed by libyaml if available and `fast` is True
+    """
+    return yaml.CSafeDumper if fast and LIBYAML else yaml.SafeDumper
+
+# %%
+def parse(stream, fast:bool=True):
+    """
+    Parse a yaml string or file
+    """
+    return yaml.load(stream, Loader=get_loader(fast))
+
+class _EventComposer(Composer):
+    """
+    Compose nodes from the events of any loader, including the libyaml one
+    which does not expose its composer
+    """
+
+    def __init__(self, loader):
+        super().__init__()
+        self.check_event = loader.check_event
+        self.peek_event = loader.peek_event
+        self.get_event = loader.get_event
+        self.resolve = loader.resolve
+        self.descend_resolver = loader.descend_resolver
+        self.ascend_resolver = loader.ascend_resolver
+
+    def skip_node(self):
+        """
+        Consume the events of the next node without building it
+        """
+        depth = 0
+        while True:
+            event = self.get_event()
+            if isinstance(event, (MappingStartEvent, SequenceStartEvent)):
+                depth += 1
+            elif isinstance(event, (MappingEndEvent, SequenceEndEvent)):
+                depth -= 1
+            if depth == 0:
+                return
+
+def parse_keys(stream, keys:list, fast:bool=True) -> dict:
+    """
+    Parse only the given top-level keys of a yaml mapping.
+    The other values are skipped event by event, without allocating them,
+    and parsing stops as soon as all the keys are found.
+    Keys that are not in the document are left out of the result.
+    When a requested value refers to an anchor in a skipped value, the whole document is
+    parsed again; on a stream that cannot seek back (e.g. a zstd log) the ComposerError
+    is raised instead, for the caller to reopen it.
+    """
+    seekable = hasattr(stream, "seekable") and stream.seekable()
+    if seekable:
+        start = stream.tell()
+    wanted = set(keys)
+    loader = get_loader(fast)(stream)
+    try:
+        events = _EventComposer(loader)
+        events.get_event()
+        if events.check_event(StreamEndEvent):
+            return {}
+        events.get_event()
+        if not events.check_event(MappingStartEvent):
+            data = loader.construct_document(events.compose_node(None, None))
+            return {key: data[key] for key in keys if key in data} if isinstance(data, dict) else {}
+        events.get_event()
+
+        result = {}
+        while wanted and not events.check_event(MappingEndEvent):
+            key = loader.construct_document(events.compose_node(None, None))
+            if key in wanted:
+                result[key] = loader.construct_document(events.compose_node(None, None))
+                wanted.discard(key)
+            else:
+                events.skip_node()
+        return result
+    except ComposerError:
+        # a requested value refers to an anchor in a skipped value
+        if not seekable and not isinstance(stream, (str, bytes)):
+            raise
+    finally:
+        loader.dispose()
+
+    if seekable:
+        stream.seek(start)
+    data = parse(stream, fast) or {}
+    return {key: data[key] for key in keys if key in data}
+
+# the characters written as they are; strings with other characters are double-quoted
+_PRINTABLE = frozenset(chr(code) for code in range(0x20, 0x7F)) | {"\n"}
+
+def _is_quoted(value:str, key:bool=False) -> bool:
+    """
+    Whether a string is written double-quoted (or as a key that libyaml writes as `? key`):
+    it has non-printable or non-ASCII characters, or line breaks next to spaces
+    """
+    if not value.isascii() or not _PRINTABLE.issuperset(value):
+        return True
+    if key:
+        return value == "" or len(value) >= 120 or "\n" in value
+    return "\n" in value and (" \n" in value or "\n " in value or value.endswith(" "))
+
+def _needs_pure_emitter(data) -> bool:
+    """
+    Check for values that libyaml writes differently from the pure-Python emitter:
+    double-quoted strings, which are folded differently, keys written as `? key`,
+    and documents that are a single scalar, which end with a `...` marker
+    """
+    if not isinstance(data, (dict, list)):
+        return True
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if isinstance(key, str) and _is_quoted(key, key=True):
+                    return True
+                if isinstance(value, str) and _is_quoted(value):
+                    return True
+                if isinstance(value, (dict, list)):
+                    stack.append(value)
+        else:
+            for value in node:
+                if isinstance(value, str) and _is_quoted(value):
+                    return True
+                if isinstance(value, (dict, list)):
+                    stack.append(value)
+    return False
+
+def dump(data, stream=None, fast:bool=True):
+    """
+    Dump data in the style of the faid logs: block style, keys in insertion order
+    and `|` blocks for multiline strings. Returns a string if no stream is given.
+
+    libyaml folds double-quoted scalars, writes some keys and document end markers
+    differently, so the pure-Python emitter is used for documents where the output would differ.
+    The emitter is chosen from the strings of the document before it is dumped, once.
+    """
+    dumper = yaml.CSafeDumper if fast and LIBYAML and not _needs_pure_emitter(data) else yaml.SafeDumper
+    result = yaml.dump(data, Dumper=dumper, sort_keys=False, default_flow_style=False)
+    if stream is None:
+        return result
+    stream.write(result)
+
+def dump_flow(data, fast:bool=True) -> str:
+    """
+    Dump data as a single flow-style line, e.g. for journal records
+    """
+    return yaml.dump(data, Dumper=get_dumper(fast), sort_keys=False, default_flow_style=True, width=2**31 - 1)
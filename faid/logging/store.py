@@ -0,0 +1,309 @@
+# %%
+import os
+import atexit
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from faid.logging import warning_msg
+
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_MAX_DOCUMENTS = 128
+
+# %%
+class DocumentStore:
+    """
+    A write-back store for the parsed metadata logs (each FaidProject owns one).
+
+    Each log is parsed once and kept in memory. Mutations are applied to the
+    in-memory document and the file is only marked as dirty. Dirty documents
+    are written once when the store is flushed: explicitly with `flush()`,
+    when it is closed (at the latest at interpreter exit), or every `flush_interval` seconds.
+
+    Clean documents are kept in a bounded LRU cache keyed on the file identity
+    (path, mtime_ns, size and inode), so a file changed outside the store is
+    parsed again. Dirty documents are never evicted.
+
+    Mutations made with `apply` are recorded until the document is written.
+    If another process changed the file in the meantime, the flush re-reads
+    the file and replays the recorded mutations on top of it while holding
+    the lock given by `locker`, so concurrent writers do not lose updates.
+    """
+
+    def __init__(self, reader, writer, stamp=None, locker=None, exists=None, flush_interval:float=DEFAULT_FLUSH_INTERVAL,
+                 max_documents:int=DEFAULT_MAX_DOCUMENTS):
+        self.reader = reader
+        self.writer = writer
+        self._exists = exists or os.path.exists
+        self._stamp = stamp or self._identity
+        self.locker = locker or (lambda path: nullcontext())
+        self.documents = OrderedDict()
+        self.stamps = {}
+        self.dirty = set()
+        self.pending = {}
+        self.replaced = set()
+        self.revisions = {}
+        self.max_documents = max_documents
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.RLock()
+        self.flush_interval = flush_interval
+        self._stop = threading.Event()
+        self._flusher = None
+        self._registered = False
+
+    @staticmethod
+    def _key(filename:str) -> str:
+        return os.path.abspath(filename)
+
+    @staticmethod
+    def _identity(path:str):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def exists(self, filename:str) -> bool:
+        """
+        Check if the document is either in memory or on disk
+        """
+        path = self._key(filename)
+        with self.lock:
+            return path in self.documents or self._exists(path)
+
+    def get(self, filename:str):
+        """
+        Return the in-memory document, parsing the file on first access.
+        Clean documents are re-parsed when the file was changed outside the store.
+        """
+        path = self._key(filename)
+        with self.lock:
+            document = self.peek(path)
+            if document is not None:
+                return document
+
+            self.misses += 1
+            stamp = self._stamp(path)
+            document = self.reader(path)
+            self.documents[path] = document
+            self.documents.move_to_end(path)
+            self.stamps[path] = stamp
+            self._evict()
+            return document
+
+    def peek(self, filename:str):
+        """
+        Return the in-memory document if it is up to date, without reading the file
+        """
+        path = self._key(filename)
+        with self.lock:
+            if path in self.dirty or (path in self.documents and self.stamps.get(path) == self._stamp(path)):
+                self.hits += 1
+                self.documents.move_to_end(path)
+                return self.documents[path]
+            return None
+
+    def put(self, filename:str, document):
+        """
+        Replace the in-memory document and mark it as dirty.
+        The replacement overrides any change made to the file by other processes.
+        """
+        path = self._key(filename)
+        with self.lock:
+            self.documents[path] = document
+            self.documents.move_to_end(path)
+            self.pending[path] = []
+            self.replaced.add(path)
+            self._revise(path)
+            self.mark_dirty(path)
+
+    def apply(self, filename:str, mutation):
+        """
+        Apply a mutation (a function that takes a document and returns the updated document)
+        to the in-memory document, and record it to be replayed if the file changes before the flush.
+        The mutation must not share its objects with the documents it returns.
+        """
+        path = self._key(filename)
+        with self.lock:
+            document = mutation(self.get(path))
+            self.documents[path] = document
+            self.documents.move_to_end(path)
+            self.pending.setdefault(path, []).append(mutation)
+            self._revise(path)
+            self.mark_dirty(path)
+            return document
+
+    def track(self, filename:str, document):
+        """
+        Keep a document that already matches the file on disk, without marking it as dirty
+        """
+        path = self._key(filename)
+        with self.lock:
+            self.documents[path] = document
+            self.documents.move_to_end(path)
+            self.stamps[path] = self._stamp(path)
+            self._revise(path)
+            self._evict()
+
+    def _revise(self, path:str):
+        self.revisions[path] = self.revisions.get(path, 0) + 1
+
+    def version(self, filename:str) -> tuple:
+        """
+        A token that changes whenever the document changes, in memory or on disk
+        (e.g. to keep an index built from the document up to date)
+        """
+        path = self._key(filename)
+        with self.lock:
+            return (self.revisions.get(path, 0), self._stamp(path))
+
+    def is_dirty(self, filename:str) -> bool:
+        return self._key(filename) in self.dirty
+
+    def mark_dirty(self, filename:str):
+        """
+        Mark a document as modified so it is written on the next flush
+        """
+        with self.lock:
+            self.dirty.add(self._key(filename))
+            if not self._registered:
+                # write the remaining changes at interpreter exit, until the store is closed
+                atexit.register(self.close)
+                self._registered = True
+            self._start_flusher()
+
+    def invalidate(self, filename:str):
+        """
+        Drop a clean document from the cache, e.g. after its file was written outside the store
+        """
+        path = self._key(filename)
+        with self.lock:
+            if path not in self.dirty:
+                self.documents.pop(path, None)
+                self.stamps.pop(path, None)
+
+    def cache_info(self) -> dict:
+        """
+        Get the hit, miss and eviction counters of the document cache
+        """
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self.documents),
+                "dirty": len(self.dirty),
+                "max_documents": self.max_documents
+            }
+
+    def set_max_documents(self, max_documents:int):
+        """
+        Set how many clean documents are kept in memory
+        """
+        with self.lock:
+            self.max_documents = max_documents
+            self._evict()
+
+    def _evict(self):
+        clean = [path for path in self.documents if path not in self.dirty]
+        for path in clean[:max(0, len(self.documents) - self.max_documents)]:
+            self.documents.pop(path)
+            self.stamps.pop(path, None)
+            self.evictions += 1
+
+    def discard(self, filename:str=None):
+        """
+        Drop a document (or all documents) from memory without writing them
+        """
+        with self.lock:
+            paths = list(self.documents) if filename is None else [self._key(filename)]
+            for path in paths:
+                self.documents.pop(path, None)
+                self.stamps.pop(path, None)
+                self.dirty.discard(path)
+                self.pending.pop(path, None)
+                self.replaced.discard(path)
+                self._revise(path)
+
+    def rebase(self, filename:str):
+        """
+        If the file of a dirty document changed on disk, re-read it and replay the pending mutations
+        """
+        path = self._key(filename)
+        with self.lock:
+            if path not in self.dirty or path in self.replaced or self.stamps.get(path) == self._stamp(path):
+                return
+            stamp = self._stamp(path)
+            document = self.reader(path)
+            for mutation in self.pending.get(path, []):
+                document = mutation(document)
+            self.documents[path] = document
+            self.stamps[path] = stamp
+
+    def flush(self, filename:str=None):
+        """
+        Write every dirty document (or only the given one) to disk exactly once
+        """
+        with self.lock:
+            paths = sorted(self.dirty) if filename is None else [self._key(filename)]
+            for path in paths:
+                if path not in self.dirty:
+                    continue
+                try:
+                    with self.locker(path):
+                        self.rebase(path)
+                        self.writer(self.documents[path], path)
+                except Exception as e:
+                    warning_msg(f"Error writing {path}: {e}. The changes are kept in memory.")
+                    continue
+                self.stamps[path] = self._stamp(path)
+                self.dirty.discard(path)
+                self.pending.pop(path, None)
+                self.replaced.discard(path)
+
+    def set_flush_interval(self, seconds:float=None):
+        """
+        Set how often dirty documents are flushed in the background.
+        Use None to flush only explicitly and at interpreter exit.
+        """
+        self._stop_flusher()
+        with self.lock:
+            self.flush_interval = seconds
+            if self.dirty:
+                self._start_flusher()
+
+    def close(self):
+        """
+        Stop the background flusher and write the remaining changes
+        """
+        self._stop_flusher()
+        self.flush()
+        with self.lock:
+            if self._registered:
+                atexit.unregister(self.close)
+                self._registered = False
+
+    def _start_flusher(self):
+        if not self.flush_interval or (self._flusher is not None and self._flusher.is_alive()):
+            return
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, args=(self._stop, self.flush_interval),
+                                         name="faid-store-flusher", daemon=True)
+        self._flusher.start()
+
+    def _stop_flusher(self):
+        self._stop.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join()
+        self._flusher = None
+
+    def _flush_periodically(self, stop:threading.Event, interval:float):
+        while not stop.wait(interval):
+            self.flush()
+            with self.lock:
+                if not self.dirty:
+                    # nothing left to write, restart lazily on the next mutation
+                    self._flusher = None
+                    return
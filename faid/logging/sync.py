@@ -1,172 +1,432 @@
+"""
+Sync the related information between the logs of a project: the model card, the data card,
+the risk register and the transparency record.
+
+Each sync is an edge of a graph between the logs (data → model → transparency, and
+risk → model/data/transparency; the risks listed in the model and data cards are gathered
+in the risk register first). `sync_all()` runs the edges in this order on the logs loaded
+once, and writes each changed log once.
+
+Syncs are incremental: the fingerprints of the source sections of each edge, and of the
+entries it wrote, are kept in the sync state file (logs/faid/sync_state.json). An edge whose
+sources did not change is skipped, and the entries an edge wrote before are updated in place
+instead of appended again, so re-running a sync does not grow the logs.
+"""
+import os
+import copy
+import json
+from contextlib import ExitStack
+from graphlib import TopologicalSorter
+
 from faid.logging import (
+    warning_msg,
+    success_msg,
+    load,
+    transaction,
+    get_project_log_path,
     get_model_log_file_path,
+    get_data_log_path,
     get_risk_register_log_path,
-    ModelCard,
-    DataCard,
-    get_model_entry,
-    get_data_entry,
-    get_risk_entries,
-    add_risk_entry,
-    add_transparency_entry
+    get_transparency_log_path,
+    get_storage_backend,
+    YamlBackend
 )
+from faid.logging import yaml_utils
+from faid.logging.yaml_utils import update_entries, resolve_log_path, get_document_store
+from faid.logging.file_utils import file_lock, atomic_open, ignore_local_state
+from faid.logging.log_compression import log_exists
+from faid.logging.maintenance import content_hash, is_placeholder
+
+SYNC_STATE_FILENAME = "sync_state.json"
+
+# %%
+def _section(document:dict, key:str) -> dict:
+    value = document.get(key)
+    return value if isinstance(value, dict) else {}
+
+def _register_risks(risks:dict) -> list:
+    return [risk for risk in _section(risks, "risks").values() if isinstance(risk, dict)]
+
+# %% the entries each edge derives from its source log
+def _model_to_risk(model:dict) -> list:
+    return [{
+        "description": risk.get("name") or "",
+        "impact": "",  # Add logic to determine impact if needed
+        "likelihood": "",  # Add logic to determine likelihood if needed
+        "mitigation": risk.get("mitigation_strategy") or ""
+    } for risk in _section(model, "considerations").get("risks") or [] if isinstance(risk, dict)]
+
+def _model_to_transparency(model:dict) -> dict:
+    model_details = _section(model, "model_details")
+    model_parameters = _section(model, "model_parameters")
+    version = model_details.get("version") or {}
+    model_data = model_parameters.get("data") or []
+    return {
+        "model_name": model_details.get("name", ""),
+        "model_version": "Name: " + str(version.get("name") or "") + " | Date: " + str(version.get("date") or "") + " | Diff: " + str(version.get("diff") or ""),
+        "model_task": model_details.get("overview", ""),
+        "model_input": model_parameters.get("input_format", ""),
+        "model_output": model_parameters.get("output_format", ""),
+        "model_architecture": model_parameters.get("model_architecture", ""),
+        "model_performance": model.get("qualitative_analysis", ""),
+        "datasets": "".join([str(data.get("description") or "") for data in model_data if isinstance(data, dict)]),
+        "dataset_purposes": "".join([str(data.get("purpose") or "") for data in model_data if isinstance(data, dict)])
+    }
+
+def _data_to_model(data:dict) -> list:
+    description = _section(data, "description")
+    return [{
+        "description": description.get("summary", ""),
+        "link": description.get("dataset_link"),
+        "sensitive": _section(data, "sensitive_data").get("protected_characteristics"),
+        "graphics": "",
+        "purpose": _section(data, "collection_protocol").get("data_use_cases"),
+    }]
+
+def _data_to_risk(data:dict) -> list:
+    return [{
+        "description": entry.get("name") or "",
+        "impact": "",  # Add logic to determine impact if needed
+        "likelihood": "",  # Add logic to determine likelihood if needed
+        "mitigation": entry.get("mitigation_strategy") or ""
+    } for entry in data.get("risks") or [] if isinstance(entry, dict)]
+
+def _data_to_transparency(data:dict) -> dict:
+    description = _section(data, "description")
+    content = _section(data, "content")
+    return {
+        "source_data_name": description.get("name"),
+        "data_modality": content.get("primary_data_modality"),
+        "data_description": content.get("description"),
+        "data_quantities": (content.get("dataset_snapshot") or {}).get("total_records", ""),
+        "sensitive_attributes": _section(data, "sensitive_data").get("protected_characteristics"),
+        "data_completeness_and_representative_ness": _section(data, "descriptive_statistics").get("has_missing_values", ""),
+        "source_data_url": description.get("dataset_link"),
+        "data_collection": _section(data, "collection_protocol").get("data_collection", ""),
+        "data_cleaning": "",  # Add logic if needed
+        "data_sharing_agreements": "",  # Add logic if needed
+        "data_access_and_storage": ""  # Add logic if needed
+    }
+
+def _risk_to_model(risks:dict) -> list:
+    return [{
+        "name": risk.get("description") or "",
+        "mitigation_strategy": risk.get("mitigation") or ""
+    } for risk in _register_risks(risks)]
 
-model_file_path = get_model_log_file_path()
-risk_file_path = get_risk_register_log_path()
+def _risk_to_data(risks:dict) -> list:
+    return _risk_to_model(risks)
+
+def _risk_to_transparency(risks:dict) -> dict:
+    impact_assessment = "The project risks has the following impact descriptions: \n"
+    risk_description = "The project risks has the following descriptions: \n"
+    mitigation_strategies = "The project listed the following mitigation strategies: \n"
+    for risk in _register_risks(risks):
+        # the template entries (and any entry without a description) are not described
+        if is_placeholder(risk) or not risk.get("description"):
+            continue
+        impact_assessment += str(risk.get("impact") or "")
+        risk_description += str(risk.get("description") or "")
+        mitigation_strategies += str(risk.get("mitigation") or "")
+    return {
+        "impact_assessment": impact_assessment,
+        "risks_and_mitigations": mitigation_strategies + "\n\n" + risk_description
+    }
+
+# %% placing the derived entries in the target log
+def _node(document:dict, path:list, default):
+    *parents, leaf = path
+    for key in parents:
+        if not isinstance(document.get(key), dict):
+            document[key] = {}
+        document = document[key]
+    if not isinstance(document.get(leaf), type(default)):
+        document[leaf] = default
+    return document, leaf
+
+def _place_list(items:list, entries:list, owned:set) -> list:
+    """
+    Replace the entries written by the previous sync (`owned` hashes) with the new ones, in place.
+    The new entries that are already in the list are not added again.
+    """
+    others = [content_hash(item) for item in items]
+    kept = {digest for digest in others if digest not in owned}
+    pending = [entry for entry in entries if content_hash(entry) not in kept]
+    placed = []
+    for item, digest in zip(items, others):
+        if digest not in owned:
+            placed.append(item)
+        elif pending:
+            placed.append(pending.pop(0))
+    return placed + pending
+
+def _place_register(section:dict, entries:list, owned:set):
+    """
+    Like `_place_list` for a section of the risk register ({id: entry}): the entries written by
+    the previous sync keep their id, and the descriptions the register already has are skipped
+    """
+    owned_ids = [id for id, entry in section.items() if content_hash(entry) in owned]
+    descriptions = {entry.get("description") for id, entry in section.items() if id not in owned_ids and isinstance(entry, dict)}
+    pending = []
+    for entry in entries:
+        if entry["description"] not in descriptions:
+            descriptions.add(entry["description"])
+            pending.append(entry)
+    for id in owned_ids:
+        if pending:
+            section[id] = pending.pop(0)
+        else:
+            del section[id]
+    ids = [id for id in section if isinstance(id, int)]
+    next_id = max(ids) + 1 if ids else 0
+    for entry in pending:
+        section[next_id] = entry
+        next_id += 1
+
+def _apply_edge(edge:str, source:dict, target:dict, owned:set) -> list:
+    """
+    Update the target log with the entries derived from the source log.
+    Returns the hashes of the entries the edge owns in the target log.
+    """
+    spec = SYNC_EDGES[edge]
+    entries = spec["derive"](source)
+    if isinstance(entries, dict):
+        node, leaf = _node(target, spec["path"], {})
+        node[leaf] = {**node[leaf], **entries}
+        return []
+    if spec["target"] == "risks":
+        node, leaf = _node(target, spec["path"], {})
+        _place_register(node[leaf], entries, owned)
+    else:
+        node, leaf = _node(target, spec["path"], [])
+        node[leaf] = _place_list(node[leaf], entries, owned)
+    return [content_hash(entry) for entry in entries]
+
+# %% the sync graph
+SYNC_LOGS = {
+    "model": get_model_log_file_path,
+    "data": get_data_log_path,
+    "risks": get_risk_register_log_path,
+    "transparency": get_transparency_log_path
+}
+
+# the logs each log is derived from
+LOG_DEPENDENCIES = {
+    "risks": [],
+    "data": ["risks"],
+    "model": ["data", "risks"],
+    "transparency": ["data", "model", "risks"]
+}
+
+# each edge derives entries from some sections of the source log, and places them at `path` in the target log
+SYNC_EDGES = {
+    "model_to_risk": {"source": "model", "sections": ["considerations"],
+                      "target": "risks", "path": ["risks"], "derive": _model_to_risk},
+    "data_to_risk": {"source": "data", "sections": ["risks"],
+                     "target": "risks", "path": ["risks"], "derive": _data_to_risk},
+    "risk_to_data": {"source": "risks", "sections": ["risks"],
+                     "target": "data", "path": ["risks"], "derive": _risk_to_data},
+    "data_to_model": {"source": "data", "sections": ["description", "sensitive_data", "collection_protocol"],
+                      "target": "model", "path": ["model_parameters", "data"], "derive": _data_to_model},
+    "risk_to_model": {"source": "risks", "sections": ["risks"],
+                      "target": "model", "path": ["considerations", "risks"], "derive": _risk_to_model},
+    "model_to_transparency": {"source": "model", "sections": ["model_details", "model_parameters", "qualitative_analysis"],
+                              "target": "transparency", "path": ["model_specification"], "derive": _model_to_transparency},
+    "data_to_transparency": {"source": "data", "sections": ["description", "content", "sensitive_data", "descriptive_statistics", "collection_protocol"],
+                             "target": "transparency", "path": ["data_specification"], "derive": _data_to_transparency},
+    "risk_to_transparency": {"source": "risks", "sections": ["risks"],
+                             "target": "transparency", "path": ["risks_mitigations_and_impact_assessments"], "derive": _risk_to_transparency}
+}
+
+def plan_sync(edges:list=None) -> list:
+    """
+    Order sync edges (all of them by default) so each log is updated before the logs derived from it.
+    The edges into the risk register run first: it is the root of the graph.
+    """
+    edges = list(SYNC_EDGES) if edges is None else list(edges)
+    for edge in edges:
+        if edge not in SYNC_EDGES:
+            raise ValueError(f"Unknown sync {edge}. Please use one of: {', '.join(SYNC_EDGES)}.")
+    rank = {log: i for i, log in enumerate(TopologicalSorter(LOG_DEPENDENCIES).static_order())}
+    order = list(SYNC_EDGES)
+    return sorted(dict.fromkeys(edges), key=lambda edge: (rank[SYNC_EDGES[edge]["target"]], order.index(edge)))
 
+def affected_edges(logs:list) -> list:
+    """
+    Get the sync edges to run after some logs changed (e.g. ["data"]): the edges from these logs,
+    and from the logs these edges update, in the order of `plan_sync`
+    """
+    changed = set(logs)
+    edges = set()
+    while True:
+        new = {edge for edge, spec in SYNC_EDGES.items() if spec["source"] in changed} - edges
+        if not new:
+            return plan_sync(edges)
+        edges |= new
+        changed |= {SYNC_EDGES[edge]["target"] for edge in new}
+
+# %% the sync state
+def get_sync_state_path() -> str:
+    return os.path.join(get_project_log_path(), SYNC_STATE_FILENAME)
+
+def _read_state(path:str) -> dict:
+    try:
+        with open(path, "r") as file:
+            state = json.load(file)
+    except (FileNotFoundError, ValueError):
+        state = {}
+    state.setdefault("logs", {})
+    state.setdefault("edges", {})
+    return state
+
+def _stamp(path:str) -> list:
+    # as stored in the json state file
+    return json.loads(json.dumps(yaml_utils._stamp(path)))
+
+def _fingerprints(document:dict, sections:list) -> dict:
+    return {section: content_hash(document.get(section)) for section in sections}
+
+def reset_sync_state():
+    """
+    Forget the sync state: the next sync runs every edge (the entries written before are not tracked anymore)
+    """
+    path = get_sync_state_path()
+    with file_lock(path):
+        if os.path.exists(path):
+            os.remove(path)
+
+# %%
+def sync_all(edges:list=None, force:bool=False) -> dict:
+    """
+    Run the sync edges (all of them by default, see SYNC_EDGES) in one pass: each log is
+    loaded once, the edges are applied in memory in the order of `plan_sync`, and each
+    changed log is written once. The edges whose logs do not exist are skipped.
+
+    An edge runs only if the sections it reads changed since it last ran (or with `force=True`),
+    and the logs that did not change on disk since the last sync are not parsed.
+    Returns {"synced": [edges run], "unchanged": [edges not run], "skipped": [edges whose logs
+    do not exist], "written": [logs written]}.
+    """
+    plan = plan_sync(edges)
+    paths = {log: resolve_log_path(SYNC_LOGS[log]()) for log in SYNC_LOGS}
+    logs = {log for edge in plan for log in (SYNC_EDGES[edge]["source"], SYNC_EDGES[edge]["target"])}
+    missing = {log for log in logs if not log_exists(paths[log])}
+    runnable = [edge for edge in plan if not {SYNC_EDGES[edge]["source"], SYNC_EDGES[edge]["target"]} & missing]
+    skipped = [edge for edge in plan if edge not in runnable]
+    for edge in skipped:
+        edge_logs = {SYNC_EDGES[edge]["source"], SYNC_EDGES[edge]["target"]}
+        warning_msg(f"Skipped the {edge} sync: the {' and '.join(sorted(edge_logs & missing))} log does not exist.")
+
+    store = get_document_store()
+    # the stamps of the yaml files only tell if a log changed with the yaml backend
+    stamped = isinstance(get_storage_backend(), YamlBackend)
+    state_path = get_sync_state_path()
+    synced, unchanged, written = [], [], []
+    with ExitStack() as stack:
+        # hold the locks of the logs and of the state (in a fixed order) from the read to the write
+        for path in sorted([paths[log] for log in logs - missing] + [state_path]):
+            stack.enter_context(file_lock(path) if path == state_path else transaction(path))
+        state = _read_state(state_path)
+        previous = copy.deepcopy(state)
+        originals, documents = {}, {}
+
+        def document(log:str) -> dict:
+            if log not in documents:
+                originals[log] = load(paths[log]) or {}
+                documents[log] = copy.deepcopy(originals[log])
+            return documents[log]
+
+        def fingerprints(log:str, sections:list) -> dict:
+            # a log that did not change on disk since the last sync keeps the fingerprints of its sections
+            known = state["logs"].get(log) or {}
+            if log not in documents and stamped and not store.is_dirty(paths[log]) and known.get("stamp") == _stamp(paths[log]) \
+                    and all(section in (known.get("sections") or {}) for section in sections):
+                return {section: known["sections"][section] for section in sections}
+            return _fingerprints(document(log), sections)
+
+        for edge in runnable:
+            spec = SYNC_EDGES[edge]
+            edge_state = state["edges"].get(edge) or {}
+            current = fingerprints(spec["source"], spec["sections"])
+            if not force and edge_state.get("sources") == current:
+                unchanged.append(edge)
+                continue
+            owned = _apply_edge(edge, document(spec["source"]), document(spec["target"]), set(edge_state.get("entries") or []))
+            state["edges"][edge] = {"sources": current, "entries": owned}
+            synced.append(edge)
+
+        for log, updated in documents.items():
+            changes = [{"op": "set", "path": [key], "value": value} for key, value in updated.items()
+                       if key not in originals[log] or originals[log][key] != value]
+            if changes:
+                update_entries(changes, filename=paths[log])
+                written.append(log)
+                # write it now, to record the stamp of the file
+                yaml_utils.flush(paths[log])
+
+        # the fingerprints after the sync: the changes an edge made to the source of another
+        # edge (e.g. risk_to_data to data_to_risk) do not make it run again on the next sync
+        for edge in synced + unchanged:
+            spec = SYNC_EDGES[edge]
+            state["edges"][edge]["sources"] = fingerprints(spec["source"], spec["sections"])
+        for log in documents:
+            sections = sorted({section for spec in SYNC_EDGES.values() if spec["source"] == log for section in spec["sections"]})
+            if sections:
+                state["logs"][log] = {"stamp": _stamp(paths[log]), "sections": _fingerprints(documents[log], sections)}
+        if state != previous:
+            ignore_local_state(os.path.dirname(state_path))
+            with atomic_open(state_path) as file:
+                json.dump(state, file, indent=2, sort_keys=True)
+
+    if written:
+        success_msg(f"Synced {', '.join(synced)}; updated the {', '.join(written)} logs.")
+    return {"synced": synced, "unchanged": unchanged, "skipped": skipped, "written": written}
+
+# %%
 def sync_model_to_risk():
     """
     Sync the risk field in the model metadata to the risk register
     """
-    model_risks = get_model_entry("considerations").get('risks', [])
-    
-    # Sync the related entities
-    for i, risk in enumerate(model_risks):
-       add_risk_entry(description= risk.get('name', ''), 
-                      impact= '',  # Add logic to determine impact if needed
-                      likelihood= '',  # Add logic to determine likelihood if needed
-                      mitigation= risk.get('mitigation_strategy', '')
-                      )
-       
+    return sync_all(["model_to_risk"])
+
 def sync_model_to_transparency():
     """
     Sync the related information in the model metadata to the transparency log
     """
-    # Implement the logic to sync model to transparency
-    model_info = get_model_entry()
-    model_details = model_info.get('model_details', '')
-    model_data = model_info.get('model_parameters', '').get('data', '')
-    datasets = "".join([data.get('description', '') for data in model_data])
-    dataset_purposes = "".join([data.get('purpose', '') for data in model_data])
-
-    transparency_model_specification = {
-        "model_name": model_details.get('name', ''),
-        "model_version": "Name: " + model_details.get('version', '').get('name', '') + " | Date: " + model_details.get('version', '').get('date', '') + " | Diff: " + model_details.get('version', '').get('diff', ''),
-        "model_task": model_details.get('overview', ''),
-        "model_input": model_info.get('model_parameters', '').get('input_format', ''),
-        "model_output": model_info.get('model_parameters', '').get('output_format', ''),
-        "model_architecture": model_info.get('model_parameters', '').get('model_architecture', ''),
-        "model_performance": model_info.get('qualitative_analysis', ''),
-        "datasets": datasets,
-        "dataset_purposes": dataset_purposes
-    }
-
-    add_transparency_entry(key="model_specification", entry=transparency_model_specification)
+    return sync_all(["model_to_transparency"])
 
 def sync_data_to_model():
     """
     Add the current data metadata to the model metadata
     """
-    data_entry = {
-        "description" : get_data_entry("description").get("summary", ''),
-        "link" : get_data_entry("description").get("dataset_link"),
-        "sensitive" : get_data_entry("sensitive_data").get("protected_characteristics"),
-        "graphics" : "",
-        "purpose" : get_data_entry("collection_protocol").get("data_use_cases"),
-    }
-    model_card = ModelCard()
-    data_entries = model_card.get_model_parameters().get('data', [])
-    # if data_entry not in data_entries:
-    data_entries.append(data_entry)
-    model_card.set_model_parameters({"data" : data_entries})
-    model_card.save()
+    return sync_all(["data_to_model"])
 
 def sync_data_to_risk():
     """
     Sync the risk field in the data metadata to the risk register
     """
-    data_entry = get_data_entry(key='risks')
-
-    for entry in data_entry:
-        dr = {
-            'description': entry.get('name', ''),
-            'impact': '',  # Add logic to determine impact if needed
-            'likelihood': '',  # Add logic to determine likelihood if needed
-            'mitigation': entry.get('mitigation_strategy', '')
-        }
-        add_risk_entry(dr, key='risks')
+    return sync_all(["data_to_risk"])
 
 def sync_data_to_transparency():
     """
     Sync the related information in the data metadata to the transparency recording
     """
-    description = get_data_entry(key='description')
-    content = get_data_entry(key='content')
-    descriptive_statistics = get_data_entry(key='descriptive_statistics')
-    sensitive_data = get_data_entry(key='sensitive_data')
-    collection_protocol = get_data_entry(key='collection_protocol')
-    transparency_data_specification = {
-        "source_data_name": description.get("name"),
-        "data_modality": content.get("primary_data_modality"),
-        "data_description": content.get("description"),
-        "data_quantities": content.get("dataset_snapshot").get('total_records', ''),
-        "sensitive_attributes": sensitive_data.get("protected_characteristics"),
-        "data_completeness_and_representative_ness": descriptive_statistics.get("has_missing_values", ''),
-        "source_data_url": description.get("dataset_link"),
-        "data_collection": collection_protocol.get("data_collection", ''),
-        "data_cleaning": "",  # Add logic if needed
-        "data_sharing_agreements": "",  # Add logic if needed
-        "data_access_and_storage": ""  # Add logic if needed
-    }
-    add_transparency_entry(key="data_specification", entry=transparency_data_specification)
-    
+    return sync_all(["data_to_transparency"])
+
 def sync_risk_to_model():
     """
     Add the current risks to the model metadata
     """
-    risk_entries = get_risk_entries()
-    risks = []
-    # Sync the related entities
-    ids = risk_entries.keys()
-    for id in ids:
-        risk = risk_entries[id]
-        risks.append({
-            'name': risk.get('description', ''),
-            'mitigation_strategy': risk.get('mitigation', '')
-        })
-
-    model_card = ModelCard()
-    existing_risks = model_card.get_considerations().get('risks', [])
-    existing_risks.extend(risks)
-    model_card.set_considerations({"risks" : existing_risks})
-    model_card.save()
+    return sync_all(["risk_to_model"])
 
 def sync_risk_to_data():
     """
-    Add the current risks to the data metadata"
+    Add the current risks to the data metadata
     """
-    risk_entries = get_risk_entries()
-    data_card = DataCard()
-
-    ids = risk_entries.keys()
-    for id in ids:
-        risk = risk_entries[id]
-        data_card.add_risk({
-            'name': risk.get('description', ''),
-            'mitigation_strategy': risk.get('mitigation', '')
-        })
-    
-    data_card.save()
+    return sync_all(["risk_to_data"])
 
 def sync_risk_to_transparency():
     """
     Sync the related information in the risk register to the transparency recording
     """
-    risk_entries = get_risk_entries()
-    print(risk_entries)
-
-    impact_assessment = "The project risks has the following impact descriptions: \n"
-    risk_description = "The project risks has the following descriptions: \n"
-    mitigation_strategies = "The project listed the following mitigation strategies: \n"
-
-    ids = risk_entries.keys()
-    for id in ids:
-        risk = risk_entries[id]
-        impact_assessment += risk.get('impact', '')
-        risk_description += risk.get('description', '')
-        mitigation_strategies += risk.get('mitigation', '')
-
-    add_transparency_entry(
-        key="risks_mitigations_and_impact_assessments", 
-        entry={"impact_assessment": impact_assessment, 
-               "risks_and_mitigations": mitigation_strategies + "\n\n" + risk_description
-               })
\ No newline at end of file
+    return sync_all(["risk_to_transparency"])
@@ -1,26 +1,27 @@
-from os.path import join, exists
-from shutil import copy
+from os.path import join
 
 from faid.logging import error_msg, warning_msg, success_msg, load, get_project_log_path, get_current_folder_path, update
+from faid.logging.log_compression import log_exists, copy_log_template
 
-transparency_file_path = join(get_project_log_path(), "transparency.yml")
 transparency_file_template_path = join(get_current_folder_path(), "template_example_descriptions/transparency_template_description.yml")
 
 def initialize_transparency_log(test:bool=False):
-    if not exists(transparency_file_path):
+    transparency_file_path = get_transparency_log_path()
+    if not log_exists(transparency_file_path):
         if test:
-            copy(transparency_file_template_path, transparency_file_path)
+            copy_log_template(transparency_file_template_path, transparency_file_path)
             success_msg("Transparency log file created with sample descriptions.")
         else:
-            copy(transparency_file_template_path, transparency_file_path)
+            copy_log_template(transparency_file_template_path, transparency_file_path)
             success_msg("Transparency log file created.")
     else:
         warning_msg("Transparency log file already exists. Logging will be appended to the existing file.")
 
 def get_transparency_log_path():
-    return transparency_file_path
+    return join(get_project_log_path(), "transparency.yml")
 
 def get_transparency_record():
+    transparency_file_path = get_transparency_log_path()
     try:
         return load(transparency_file_path)
     except FileNotFoundError:
@@ -28,5 +29,6 @@ def get_transparency_record():
         return None
 
 def add_transparency_entry(key, entry):
+    transparency_file_path = get_transparency_log_path()
     update(entry, key, filename=transparency_file_path)
     print(f"Added the transparency entry: {entry}.")
\ No newline at end of file
@@ -0,0 +1,298 @@
+# %%
+"""
+Keep the logs and reports of a project in sync while it is being logged to.
+
+The watcher follows the changes to the logs in logs/faid (with inotify on Linux, by polling
+the modification times elsewhere), runs the sync edges affected by the changed logs (see
+faid.logging.sync) and regenerates the reports of the changed logs. The changes are handled
+in a single worker thread: a burst of writes (e.g. a loop of `add_risk_entry` calls) is
+merged into one sync once the folder has been quiet for `debounce` seconds.
+
+    with LogWatcher():
+        ...
+
+    python -m faid.logging.watcher --project runs/model_a
+"""
+import os
+import sys
+import time
+import errno
+import ctypes
+import select
+import struct
+import argparse
+import threading
+import ctypes.util
+
+from faid.logging import warning_msg, info_msg, load
+from faid.logging import yaml_utils
+from faid.logging.project import FaidProject, get_project
+from faid.logging.log_compression import logical_log_path, log_type, log_exists
+from faid.logging.sync import SYNC_LOGS, affected_edges, sync_all
+
+DEFAULT_DEBOUNCE = 0.5
+DEFAULT_POLL_INTERVAL = 1.0
+
+# the report of each type of log, in faid.report
+REPORTS = {
+    "model": "generate_model_card_report",
+    "data": "generate_data_card_report",
+    "risks": "generate_risk_register_report",
+    "transparency": "generate_transparency_report"
+}
+
+def _log_path(folder:str, name:str) -> str:
+    """
+    The log a file of the log folder belongs to (its journal or compressed file included), or None
+    """
+    if name.startswith("."):
+        # the temporary files of atomic writes
+        return None
+    path = os.path.join(folder, name)
+    if path.endswith(".journal"):
+        path = path[:-len(".journal")]
+    path = logical_log_path(path)
+    return path if path.endswith(".yml") else None
+
+# %%
+class _Inotify:
+    """
+    The changes to the files of a folder, with the inotify API of Linux (through libc)
+    """
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, folder:str):
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"inotify_add_watch failed on {folder}")
+
+    def read(self, timeout:float) -> set:
+        """
+        Wait up to `timeout` seconds for changes, return the names of the changed files
+        """
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        names = set()
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if name:
+                names.add(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+class _Poller:
+    """
+    The changes to the files of a folder, by comparing their modification times and sizes
+    """
+
+    def __init__(self, folder:str):
+        self.folder = folder
+        self.files = self._scan()
+
+    def _scan(self) -> dict:
+        files = {}
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            pass
+        return files
+
+    def read(self, timeout:float) -> set:
+        time.sleep(timeout)
+        files = self._scan()
+        names = {name for name in files.keys() | self.files.keys() if files.get(name) != self.files.get(name)}
+        self.files = files
+        return names
+
+    def close(self):
+        pass
+
+# %%
+class LogWatcher:
+    """
+    Watch the log folder of a project (the active one by default), and sync the logs and
+    regenerate the reports affected by each change. `start()` and `stop()` it, or use it
+    as a context manager. With `polling=True`, inotify is not used even if it is available.
+    """
+
+    def __init__(self, project:FaidProject=None, debounce:float=DEFAULT_DEBOUNCE, poll_interval:float=DEFAULT_POLL_INTERVAL,
+                 reports:bool=True, polling:bool=False):
+        self.project = project or get_project()
+        self.folder = os.path.abspath(self.project.log_path)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.reports = reports
+        self.polling = polling
+        self.condition = threading.Condition()
+        self.pending = set()
+        self.deadline = None
+        self.stamps = {}
+        self.syncs = 0
+        self.source = None
+        self.threads = []
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        """
+        Start watching the log folder
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        self.source = None
+        if not self.polling:
+            try:
+                self.source = _Inotify(self.folder)
+            except (OSError, AttributeError):
+                pass
+        if self.source is None:
+            self.source = _Poller(self.folder)
+        self._stop.clear()
+        self.threads = [threading.Thread(target=self._observe, name="faid-watcher", daemon=True),
+                        threading.Thread(target=self._work, name="faid-sync", daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Stop watching; the changes seen so far are synced first
+        """
+        self._stop.set()
+        with self.condition:
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+    @property
+    def using_inotify(self) -> bool:
+        return isinstance(self.source, _Inotify)
+
+    def notify(self, filename:str):
+        """
+        Record a change to a log, synced once no other change happened for `debounce` seconds
+        """
+        with self.condition:
+            self.pending.add(filename)
+            self.deadline = time.monotonic() + self.debounce
+            self.condition.notify_all()
+
+    def _observe(self):
+        while not self._stop.is_set():
+            try:
+                names = self.source.read(self.poll_interval)
+            except OSError as e:
+                warning_msg(f"Error watching {self.folder}: {e}")
+                time.sleep(self.poll_interval)
+                continue
+            for name in names:
+                filename = _log_path(self.folder, name)
+                if filename is not None:
+                    self.notify(filename)
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while not self._stop.is_set() and (not self.pending or time.monotonic() < self.deadline):
+                    self.condition.wait(None if not self.pending else self.deadline - time.monotonic())
+                if not self.pending and self._stop.is_set():
+                    return
+                changed, self.pending = self.pending, set()
+            try:
+                self._propagate(changed)
+            except (Exception, SystemExit) as e:
+                # error_msg exits, keep watching instead
+                warning_msg(f"Error syncing the changes to {', '.join(sorted(map(os.path.basename, changed)))}: {e}")
+
+    def _propagate(self, changed:set):
+        """
+        Sync the logs affected by the changed logs, and regenerate their reports
+        """
+        with self.project.activate():
+            # the logs the watcher wrote itself are not synced again
+            changed = {filename for filename in changed if self.stamps.get(filename) != yaml_utils._stamp(filename)}
+            if not changed:
+                return
+            paths = {yaml_utils.resolve_log_path(SYNC_LOGS[log]()): log for log in SYNC_LOGS}
+            logs = {paths[filename] for filename in changed if filename in paths}
+            written = []
+            if logs:
+                result = sync_all(affected_edges(logs))
+                written = [yaml_utils.resolve_log_path(SYNC_LOGS[log]()) for log in result["written"]]
+                for filename in written:
+                    self.stamps[filename] = yaml_utils._stamp(filename)
+            self.syncs += 1
+            if self.reports:
+                for filename in sorted(changed | set(written)):
+                    self._report(filename)
+
+    def _report(self, filename:str):
+        import faid.report
+        if not log_exists(filename):
+            return
+        kind = log_type(filename)
+        if kind == "fairness":
+            faid.report.generate_experiment_overview_report(load(filename))
+        elif kind in REPORTS and filename == yaml_utils.resolve_log_path(SYNC_LOGS[kind]()):
+            getattr(faid.report, REPORTS[kind])()
+
+# %%
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--project", default=None, help="the project folder (default: the working directory)")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE, help="seconds without changes before a sync")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL, help="seconds between two scans when polling")
+    parser.add_argument("--polling", action="store_true", help="poll the modification times even if inotify is available")
+    parser.add_argument("--no-reports", action="store_true", help="only sync the logs, do not regenerate the reports")
+    args = parser.parse_args()
+
+    project = FaidProject(args.project)
+    watcher = LogWatcher(project, debounce=args.debounce, poll_interval=args.poll_interval,
+                         reports=not args.no_reports, polling=args.polling)
+    with watcher:
+        info_msg(f"Watching {watcher.folder} ({'inotify' if watcher.using_inotify else 'polling'}), press Ctrl-C to stop.")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# %%
+import atexit
+import queue
+import threading
+
+BACKPRESSURE_POLICIES = ["block", "drop-oldest", "raise"]
+
+# %%
+class BackgroundWriter:
+    """
+    Persist the changes of one log in a daemon thread, so logging never blocks the caller.
+
+    Changes are journal-like records ({"op", "path", "value"}) put in a bounded queue.
+    The writer thread drains everything that is queued, drops "set" records that are
+    overridden later in the same batch, and persists the batch with one call to `persist`.
+
+    When the queue is full, `backpressure` decides what happens:
+    "block" waits for room, "drop-oldest" discards the oldest queued record and
+    "raise" raises queue.Full.
+    """
+
+    def __init__(self, persist, max_queue:int=1024, backpressure:str="block", name:str="faid-writer"):
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {backpressure}. Use one of {BACKPRESSURE_POLICIES}")
+        self.persist = persist
+        self.backpressure = backpressure
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.error = None
+        self.closed = False
+        self._put_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        # persist what is still queued when the interpreter exits
+        atexit.register(self.close)
+
+    def submit(self, record:dict):
+        """
+        Queue a change, applying the backpressure policy if the queue is full
+        """
+        if self.closed:
+            raise RuntimeError("The writer is closed")
+        self._raise_error()
+
+        if self.backpressure == "block":
+            self.queue.put(record)
+        elif self.backpressure == "raise":
+            self.queue.put_nowait(record)
+        else:
+            with self._put_lock:
+                while True:
+                    try:
+                        self.queue.put_nowait(record)
+                        return
+                    except queue.Full:
+                        try:
+                            self.queue.get_nowait()
+                            self.queue.task_done()
+                            self.dropped += 1
+                        except queue.Empty:
+                            pass
+
+    def flush(self):
+        """
+        Wait until every queued change is persisted
+        """
+        self.queue.join()
+        self._raise_error()
+
+    def close(self):
+        """
+        Persist the queued changes and stop the writer thread
+        """
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        self.queue.put(None)
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = [record for record in batch if record is not None]
+            try:
+                if records:
+                    self.persist(coalesce(records))
+            except BaseException as e:
+                # error_msg exits: keep the thread alive and report it from flush()
+                self.error = e
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+            if len(records) < len(batch):
+                return
+
+def coalesce(records:list) -> list:
+    """
+    Drop the "set" records that are overridden by a later record on the same or a parent path
+    """
+    kept = []
+    overridden = []
+    for record in reversed(records):
+        path = list(record["path"])
+        if any(path[:len(prefix)] == prefix for prefix in overridden):
+            continue
+        kept.append(record)
+        if record["op"] == "set":
+            overridden.append(path)
+    kept.reverse()
+    return kept
@@ -1,20 +1,45 @@
 # %%
 
 import os
-import yaml
+import copy
+from contextlib import contextmanager, nullcontext
 from yaml.parser import ParserError
+from yaml.composer import ComposerError
 from faid.logging import error_msg, warning_msg
+from faid.logging import serializer
+from faid.logging.store import DocumentStore
+from faid.logging.project import get_project
+from faid.logging.file_utils import file_lock
+from faid.logging.log_compression import (
+  open_log,
+  write_log,
+  find_log_file,
+  log_exists,
+  log_size,
+  logical_log_path
+)
+from faid.logging import journal
+from faid.logging.journal import (
+  append_journal_record,
+  apply_journal_record,
+  replay_journal,
+  read_journal,
+  remove_journal,
+  journal_size,
+  get_journal_path
+)
 
 slash = '\\' if os.name == "nt" else "/"
 
+# Files from this size (in bytes) are parsed selectively when only some of their sections are loaded
+SELECTIVE_LOAD_MIN_SIZE = 1024 * 1024
+
 # %% 
 def get_project_log_path():
     """
-    Get the name of the project
+    Get the log folder of the active project (by default `logs/faid` in the working directory)
     """
-    root = os.getcwd()
-    log_folder = root + slash + "logs" + slash + "faid"
-    return log_folder + slash
+    return get_project().log_path
 
 # %%
 def get_current_folder_path():
@@ -26,83 +51,367 @@ def generate(dataDict, filename:str=None, return_result=False):
   """
   Generate a yaml file 
   """
+  if return_result:
+    return serializer.dump(dataDict)
+
   if not filename:
     error_msg("No file path provided. Please define a file path.")
     return
 
-  if not os.path.exists(get_project_log_path()):
-    os.makedirs(get_project_log_path())
+  filename = resolve_log_path(filename)
+  _write_snapshot(dataDict, filename)
+  get_document_store().invalidate(filename)
+
+def _write_snapshot(dataDict, filename:str):
+  """
+  Atomically replace a yaml file (compressed as set with set_log_compression)
+  """
+  os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+  with write_log(filename) as file:
+    serializer.dump(dataDict, file)
+
+# %%
+def read(filename:str):
+  """
+  Parse a yaml file from disk, bypassing the document store.
+  A .yml.gz or .yml.zst file is decompressed while it is parsed.
+  The records of its journal, if any, are replayed on top of the file.
+  """
+  try:
+    with open_log(filename) as file:
+      document = serializer.parse(file)
+  except FileNotFoundError:
+    error_msg(f"File {filename} not found")
+    return {}
+  except ParserError:
+    error_msg(f"File {filename} is not a valid yaml file")
+    return {}
   
+  if journal_size(filename) > 0:
+    document = replay_journal(document, filename)
+  return document
+
+def read_keys(filename:str, keys:list) -> dict:
+  """
+  Parse only the given top-level keys of a yaml file from disk, bypassing the document store.
+  The journal records under these keys, if any, are replayed on top.
+  """
+  try:
+    try:
+      with open_log(filename) as file:
+        document = serializer.parse_keys(file, keys)
+    except ComposerError:
+      # a requested value refers to an anchor in a skipped value, and the file cannot be
+      # rewound (zstd), parse it again from the start
+      with open_log(filename) as file:
+        data = serializer.parse(file) or {}
+      document = {key: data[key] for key in keys if key in data}
+  except FileNotFoundError:
+    error_msg(f"File {filename} not found")
+    return {}
+  except ParserError:
+    error_msg(f"File {filename} is not a valid yaml file")
+    return {}
+
+  if journal_size(filename) > 0:
+    for record in read_journal(filename):
+      if record["path"][0] in keys:
+        document = apply_journal_record(document, record)
+  return document
+
+def write(dataDict, filename:str):
+  """
+  Write a full yaml snapshot, which supersedes the journal of the file
+  """
+  _write_snapshot(dataDict, filename)
+  remove_journal(filename)
+
+def _stamp(filename:str):
+  """
+  The identity of a yaml file and its journal: path, mtime_ns, size and inode
+  """
+  stamps = []
+  for path in (find_log_file(filename) or filename, get_journal_path(filename)):
+    try:
+      stat = os.stat(path)
+      stamps.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+    except FileNotFoundError:
+      stamps.append(None)
+  return tuple(stamps)
+
+def new_document_store(project=None) -> DocumentStore:
+  """
+  Create a store for the parsed yaml logs of a project (each FaidProject owns one).
+  The logs are written with the compression policy of the project, also when they are
+  flushed from the background flusher or at interpreter exit, where no project is active.
+  """
+  def writer(dataDict, filename:str):
+    with project.activate() if project is not None else nullcontext():
+      write(dataDict, filename)
+
+  return DocumentStore(reader=read, writer=writer, stamp=_stamp, locker=file_lock, exists=log_exists)
+
+def get_document_store() -> DocumentStore:
+  """
+  Get the store that holds the parsed logs of the active project
+  """
+  return get_project().store
+
+# %%
+def resolve_log_path(filename:str) -> str:
+  """
+  Resolve a log name (e.g. "model") to its yaml file in the project log folder.
+  Compressed logs are known by their .yml path too.
+  """
+  filename = logical_log_path(filename)
+  # if filename does not contain .yml extension, add it
   if not filename.endswith(".yml"):
-    filename = os.path.join(get_project_log_path, f"{filename}.yml")
-  
-  # The implementation is based on https://github.com/Anthonyhawkins/yamlmaker/
-  yaml.SafeDumper.org_represent_str = yaml.SafeDumper.represent_str
+    filename = os.path.join(get_project_log_path(), f"{filename}.yml")
+  return filename
 
-  def multi_str(dumper, data):
-    if '\n' in data:
-      return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='|')
-    return dumper.org_represent_str(data)
-  yaml.add_representer(str, multi_str, Dumper=yaml.SafeDumper)
+# %%
+def update_yaml(yaml_data, key:str=None, filename:str=None):
+  """
+  Update a yaml file.
+  The change is applied in memory and written on the next `flush()`,
+  on top of the changes other processes made to the file in the meantime.
+  """
+  store = get_document_store()
+  # keep the caller's object out of the store, it may be mutated after this call
+  yaml_data = copy.deepcopy(yaml_data)
 
-  if return_result:
-    return yaml.safe_dump(dataDict, sort_keys=False, default_flow_style=False)
+  with store.lock:
+    if not store.exists(filename):
+      warning_msg(f"File {filename} not found. Creating a new file.")
+      store.put(filename, {key: yaml_data})
+      return
+    
+    if key is None:
+      store.put(filename, yaml_data)
+      return
+
+    existing_dataDict = store.get(filename)
+
+    if isinstance(yaml_data, dict) and key not in (existing_dataDict or {}):
+      error_msg(f"Key {key} not found in the yaml file. Creating the key and updating the file.")
+
+    def merge(existing_dataDict):
+      if existing_dataDict is None:
+        existing_dataDict = {}
+      value = copy.deepcopy(yaml_data)
+      if isinstance(value, dict):
+        value = {**(existing_dataDict.get(key) or {}), **value}
+      existing_dataDict[key] = value
+      return existing_dataDict
+
+    store.apply(filename, merge)
+
+def update_yaml_entries(records:list, filename:str=None):
+  """
+  Apply journal-like records ({"op", "path", "value"}) to a yaml file as a single change,
+  written on the next `flush()`.
+  """
+  store = get_document_store()
+  records = copy.deepcopy(records)
+
+  def apply(document):
+    for record in copy.deepcopy(records):
+      document = apply_journal_record(document, record)
+    return document
+
+  store.apply(filename, apply)
+
+def _copy_path(document, record:dict):
+  """
+  A copy of a document in which a journal record can be applied without changing the document:
+  the mappings along the record's path (and the list it appends to) are copied, the rest is shared
+  """
+  copied = dict(document or {})
+  node = copied
+  *parents, leaf = record["path"]
+  for key in parents:
+    if not isinstance(node.get(key), dict):
+      return copied
+    node[key] = dict(node[key])
+    node = node[key]
+  if record["op"] == "append" and isinstance(node.get(leaf), list):
+    node[leaf] = list(node[leaf])
+  return copied
+
+def append_yaml_entry(path:list, value, filename:str=None, op:str="set"):
+  """
+  Record a change to a yaml file by appending it to the file's journal
+  instead of rewriting the whole file.
+  Pending changes of the file (e.g. those of `update`) are written first.
+  The journal is compacted into the file once it is larger than `journal.JOURNAL_COMPACT_THRESHOLD`.
+  """
+  store = get_document_store()
+  record = {"op": op, "path": list(path), "value": copy.deepcopy(value)}
+
+  with store.lock, file_lock(filename):
+    if store.is_dirty(filename):
+      store.flush(filename)
+    if store.is_dirty(filename):
+      # the file could not be written, the change is kept in memory with the others
+      store.apply(filename, lambda document: apply_journal_record(document, copy.deepcopy(record)))
+      return
 
-  with open(filename, 'w') as file:
-    yaml.safe_dump(dataDict, file, sort_keys=False, default_flow_style=False)
+    # the cached document is only replaced once the record is on disk
+    document = apply_journal_record(_copy_path(store.get(filename), record), copy.deepcopy(record))
+    append_journal_record(filename, record["path"], record["value"], op=op)
+    store.track(filename, document)
+
+    if journal_size(filename) > journal.JOURNAL_COMPACT_THRESHOLD:
+      compact_journal(filename)
+
+def load_yaml(filename:str, keys:list=None):
+  """
+  Load a yaml file, or only its top-level `keys`.
+  Returns a private copy of the cached document, so callers can mutate it freely.
+
+  Large files that are not in memory yet are not parsed in full when keys are given:
+  only the requested sections are built, see `serializer.parse_keys`.
+  """
+  store = get_document_store()
+  if keys is None:
+    return copy.deepcopy(store.get(filename))
+
+  document = store.peek(filename)
+  if document is None and log_size(filename) >= SELECTIVE_LOAD_MIN_SIZE:
+    return read_keys(filename, keys)
+  if document is None:
+    document = store.get(filename)
+  return {key: copy.deepcopy(document[key]) for key in keys if key in (document or {})}
+
+def load_yaml_section(filename:str, key:str):
+  """
+  Load a top-level section of a yaml file
+  """
+  return load_yaml(filename, keys=[key])[key]
+
+# %%
+def set_storage_backend(backend=None):
+  """
+  Set the storage backend of the active project behind `load`, `update` and `append_entry`.
+  Use None to go back to the default yaml files.
+  """
+  project = get_project()
+  if project.backend is not None:
+    project.backend.flush()
+  project.backend = backend
+
+def get_storage_backend():
+  """
+  Get the storage backend of the active project behind `load`, `update` and `append_entry`
+  """
+  project = get_project()
+  if project.backend is None:
+    from faid.logging.backends import YamlBackend
+    project.backend = YamlBackend()
+  return project.backend
 
 # %%
 def update(yaml_data, key:str=None, filename:str=None):
   """
   Update a yaml file
   """
-  if not filename.endswith(".yml"):
-    filename = os.path.join(get_project_log_path, f"{filename}.yml")
-  
-  if not os.path.exists(filename):
-    warning_msg(f"File {filename} not found. Creating a new file.")
-    yaml_data = {key: yaml_data}
-    generate(yaml_data, filename)
-    return
-  
-  existing_dataDict = load(filename)
+  get_storage_backend().update(yaml_data, key=key, filename=resolve_log_path(filename))
 
-  if existing_dataDict is None:
-    existing_dataDict = {}
-  
-  if key is None:
-    generate(yaml_data, filename)
-    return
+# %%
+def append_entry(path:list, value, filename:str=None, op:str="set"):
+  """
+  Set (op="set") or append to a list (op="append") the value at a key path of a yaml file.
+  With yaml files, the change is appended to the file's journal instead of rewriting the whole file.
+  """
+  if op not in ("set", "append"):
+    raise ValueError(f"Unknown operation: {op}")
+  get_storage_backend().append_entry(path, value, filename=resolve_log_path(filename), op=op)
 
-  try:
-    if isinstance(yaml_data, dict):
-      yaml_data = {**existing_dataDict[key], **yaml_data}  
-    existing_dataDict[key] = yaml_data
-  except KeyError:
-    error_msg(f"Key {key} not found in the yaml file. Creating the key and updating the file.")
-    existing_dataDict.update({key: yaml_data})
-  
-  try:
-    generate(existing_dataDict, filename)
-  except Exception as e:
-    error_msg(f"Error updating yaml file: {e}")
+def update_entries(records:list, filename:str=None):
+  """
+  Apply a batch of changes to a yaml file at once.
+  Each change is a dict with "op" ("set" or "append"), "path" (a list of keys) and "value".
+  """
+  get_storage_backend().update_entries(records, filename=resolve_log_path(filename))
+
+def compact_journal(filename:str):
+  """
+  Merge the journal of a yaml file into the file itself
+  """
+  store = get_document_store()
+  filename = resolve_log_path(filename)
+
+  with store.lock, file_lock(filename):
+    if journal_size(filename) == 0:
+      return
+    # the document in memory is the file with its journal replayed
+    store.get(filename)
+    store.mark_dirty(filename)
+    store.flush(filename)
+
+# files with an open transaction (guarded by the store lock)
+_transactions = set()
+
+@contextmanager
+def transaction(filename:str):
+  """
+  Hold the lock of a yaml file across a read-modify-write (e.g. deriving a new id from the existing entries).
+  Changes made by other processes are loaded first, and the file is written once at the end of the block.
+  Nested transactions on the same file are merged into the outermost one.
+  """
+  store = get_document_store()
+  filename = resolve_log_path(filename)
+
+  with store.lock, file_lock(filename):
+    if filename in _transactions:
+      yield
+      return
+
+    store.rebase(filename)
+    _transactions.add(filename)
+    try:
+      yield
+    finally:
+      _transactions.discard(filename)
+    get_storage_backend().flush(filename)
 
 # %%
-def load(filename:str):
+def load(filename:str, keys:list=None):
   """
-  Load a yaml file
+  Load a yaml file.
+  With `keys`, only these top-level sections are loaded, e.g. load("data", keys=["sensitive_data"]).
   """
-  import os
-  # if filename does not contain .yml extension, add it
-  if not filename.endswith(".yml"):
-    filename = os.path.join(get_project_log_path(), f"{filename}.yml")
+  return get_storage_backend().load(resolve_log_path(filename), keys=keys)
 
-  try:
-    with open(filename, 'r') as file:
-      return yaml.safe_load(file)
-  except FileNotFoundError:
-    error_msg(f"File {filename} not found")
-  except ParserError:
-    error_msg(f"File {filename} is not a valid yaml file")
-  
-  return {}
+def load_section(filename:str, key:str):
+  """
+  Load a top-level section (e.g. "considerations") of a yaml file.
+  Raises a KeyError if the section does not exist.
+  """
+  return get_storage_backend().load_section(resolve_log_path(filename), key)
+
+# %%
+def flush(filename:str=None):
+  """
+  Write the pending changes of all logs (or only the given log) to disk
+  """
+  get_storage_backend().flush(None if filename is None else resolve_log_path(filename))
+
+def get_cache_info() -> dict:
+  """
+  Get the hit, miss and eviction counters of the parsed-document cache
+  """
+  return get_document_store().cache_info()
+
+def set_cache_size(max_documents:int):
+  """
+  Set how many parsed yaml files are kept in memory
+  """
+  get_document_store().set_max_documents(max_documents)
+
+def set_flush_interval(seconds:float=None):
+  """
+  Set how often pending changes are written in the background.
+  Use None to write only on `flush()` and at interpreter exit.
+  """
+  get_document_store().set_flush_interval(seconds)
@@ -2,19 +2,34 @@ from faid.report.file_utils import (
     get_faid_report_folder
 )
 
-from faid.report.report_utils import (
-    generate_data_card_report, 
-    generate_model_card_report, 
-    generate_risk_register_report, 
-    generate_experiment_overview_report, 
-    generate_transparency_report,
-    generate_all_reports
-)
+# report_utils (jinja2) and viz_utils (matplotlib, plotly) are imported on first use (PEP 562)
+_lazy_imports = {
+    'faid.report.report_utils': [
+        'generate_data_card_report',
+        'generate_model_card_report',
+        'generate_risk_register_report',
+        'generate_experiment_overview_report',
+        'generate_transparency_report',
+        'generate_all_reports'
+    ],
+    'faid.report.viz_utils': [
+        'figure_to_base64str',
+        'plot_metric_series',
+        'OntologyChart'
+    ]
+}
+_lazy_names = {name: module for module, names in _lazy_imports.items() for name in names}
 
-from faid.report.viz_utils import (
-    figure_to_base64str,
-    OntologyChart
-)
+def __getattr__(name):
+    if name in _lazy_names:
+        import importlib
+        value = getattr(importlib.import_module(_lazy_names[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_names))
 
 __all__ = [
     'get_faid_report_folder',
@@ -25,5 +40,6 @@ __all__ = [
     'generate_transparency_report',
     'generate_all_reports',
     'figure_to_base64str',
+    'plot_metric_series',
     'OntologyChart'
 ]
\ No newline at end of file
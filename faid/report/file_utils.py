@@ -4,10 +4,10 @@ slash = '\\' if os.name == "nt" else "/"
 # %%
 def get_faid_report_folder():
     """
-    Get the name of the faid report folder
+    Get the report folder of the active project (by default `reports` in the working directory)
     """
-    root = os.getcwd()
-    report_folder = root + slash + "reports"
+    from faid.logging.project import get_project
+    report_folder = get_project().report_path
     if not os.path.exists(report_folder):
-        os.mkdir(report_folder)
-    return report_folder + slash
\ No newline at end of file
+        os.makedirs(report_folder)
+    return report_folder
\ No newline at end of file
@@ -2,13 +2,17 @@ from jinja2 import Environment, FileSystemLoader
 from faid.report import get_faid_report_folder
 from faid.logging import (
     load, 
+    compact_journal,
     get_data_entry, 
     get_fairness_experiment_log_path,
     get_data_log_path,
     get_model_log_file_path,
     get_risk_register_log_path,
-    get_transparency_log_path
+    get_transparency_log_path,
+    get_project_log_path
 )
+from faid.logging.attributions import entry_to_viz_record
+from faid.logging.log_compression import log_exists
 import os
 
 def generate_all_reports():
@@ -30,9 +34,11 @@ def generate_experiment_overview_report(project_info:dict=None):
         fairness_files = get_fairness_experiment_log_path()
         if isinstance(fairness_files, list):
             for file in fairness_files:
+                compact_journal(file)
                 project_info = load(file)
                 experiment_overview_report(project_info)
         else:
+            compact_journal(fairness_files)
             project_info = load(fairness_files)
             experiment_overview_report(project_info)
     else:
@@ -59,25 +65,27 @@ def experiment_overview_report(info:dict, output_file:str=None):
     captum_records = None
     if "model" in info and "captum_records" in info["model"]:
         from captum.attr import visualization as viz
-        import torch
-        record = info["model"]["captum_records"]
-        visrecord = viz.VisualizationDataRecord(
-            torch.tensor(record["word_attributions"], dtype=torch.float64), 
-            record["pred_prob"], 
-            record["pred_class"],
-            record["true_class"], 
-            record["attr_class"], 
-            record["attr_score"], 
-            record["raw_input_ids"], 
-            record["convergence_score"])
-        captum_records = viz.visualize_text([visrecord])._repr_html_()
+        records = info["model"]["captum_records"]
+        if isinstance(records, dict):
+            # a single record, logged before records were stored next to the log
+            records = [records]
+        visrecords = [entry_to_viz_record(record, get_project_log_path()) for record in records]
+        captum_records = viz.visualize_text(visrecords)._repr_html_()
+    
+    metric_series = None
+    if info.get("bias_metrics_series"):
+        from faid.logging.metric_series import MetricSeries
+        from faid.report.viz_utils import plot_metric_series, figure_to_base64str
+        series = MetricSeries(os.path.join(get_project_log_path(), info["bias_metrics_series"]["path"])).read()
+        if len(series) > 0:
+            metric_series = figure_to_base64str(plot_metric_series(series))
     
     # Load Jinja2 template
     current_folder_location = os.path.dirname(os.path.abspath(__file__))
     env = Environment(loader=FileSystemLoader(current_folder_location))
     template = env.get_template('templates/experiment_overview_template.html')
     # Render the template with metrics
-    html_content = template.render(info, sample_data=sample_data_html, captum_records = captum_records)
+    html_content = template.render(info, sample_data=sample_data_html, captum_records = captum_records, metric_series=metric_series)
 
     if output_file is None:
         if "name" not in info:
@@ -96,7 +104,7 @@ def generate_risk_register_report(custom_file_path:str=None):
     Generate the risk register report
     """
     import os
-    if not os.path.exists(get_risk_register_log_path()):
+    if not log_exists(get_risk_register_log_path()):
         print("Risk log file not found")
         return
     else:
@@ -149,7 +157,7 @@ def generate_data_card_report(input_file_path:str=None, output_file_path:str=Non
             print("Input file path not found")
     else:
         info = get_data_entry()
-        if not os.path.exists(get_data_log_path()):
+        if not log_exists(get_data_log_path()):
             print("Data log file not found")
             return
         else:
@@ -191,7 +199,7 @@ def generate_model_card_report(custom_file_path:str=None):
     Generate the model card report
     """
     import os
-    if not os.path.exists(get_model_log_file_path()):
+    if not log_exists(get_model_log_file_path()):
         print("Model log file not found")
         return
     else:
@@ -236,7 +244,7 @@ def generate_transparency_report(custom_file_path:str=None):
     Generate the transparency report
     """
     import os
-    if not os.path.exists(get_transparency_log_path()):
+    if not log_exists(get_transparency_log_path()):
         print("Transparency log file not found")
         return
     else:
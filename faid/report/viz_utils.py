@@ -26,6 +26,37 @@ def figure_to_base64str(fig: matplotlib.figure.Figure) -> str:
   return base64.b64encode(buf.getbuffer().tobytes()).decode('ascii')
 
 
+def plot_metric_series(series, metrics:list=None, max_groups:int=10) -> matplotlib.figure.Figure:
+    """
+    Plot the trajectory of each metric over the steps, one line per group.
+
+    Args:
+    series: The (step, group) x metric DataFrame of FairnessExperimentRecord.get_metric_series().
+    metrics: The metrics to plot, all of them by default.
+    max_groups: The groups with the largest range of values are plotted, with the overall values.
+
+    Returns:
+    A matplotlib Figure with one plot per metric.
+    """
+    metrics = list(series.columns) if metrics is None else metrics
+    fig = matplotlib.figure.Figure(figsize=(8, 3 * max(len(metrics), 1)))
+    axes = fig.subplots(max(len(metrics), 1), 1, squeeze=False)[:, 0]
+    for ax, metric in zip(axes, metrics):
+        values = series[metric].unstack("group")
+        spread = (values.max() - values.min()).drop("overall", errors="ignore")
+        groups = list(spread.sort_values(ascending=False).index[:max_groups])
+        if "overall" in values.columns:
+            groups.append("overall")
+        for group in groups:
+            style = {"color": "black", "linewidth": 2} if group == "overall" else {}
+            ax.plot(values.index, values[group], label=str(group), **style)
+        ax.set_title(metric)
+        ax.set_xlabel("step")
+        ax.legend(fontsize="small", loc="best")
+    fig.tight_layout()
+    return fig
+
+
 def generate_fairness_log_completeness_label():
     """
     Generate a digital trust label as SVG and add it to the reports/README.md file.
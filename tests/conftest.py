@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from faid.logging import FaidProject
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """
+    An empty project in a temporary folder, active for the test
+    """
+    monkeypatch.chdir(tmp_path)
+    project = FaidProject(str(tmp_path))
+    os.makedirs(project.log_path)
+    with project.activate():
+        yield project
+    project.close()
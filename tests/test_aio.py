@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from faid.logging import aio, initialize_risk_log, get_risk_entries, yaml_utils
+from faid.logging.risk_register_utils import get_risk_register_log_path
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    written = []
+    write = yaml_utils.write
+
+    def counted(document, filename):
+        written.append(filename)
+        write(document, filename)
+
+    monkeypatch.setattr(yaml_utils, "write", counted)
+    return written
+
+
+def test_mutations_of_a_tick_are_written_once(project, writes):
+    initialize_risk_log()
+    yaml_utils.flush()
+    writes.clear()
+
+    async def main():
+        return await asyncio.gather(*(aio.add_risk_entry(f"risk {i}", "high", "low", "m") for i in range(20)))
+
+    ids = asyncio.run(main())
+    assert len(set(ids)) == 20
+    assert writes == [get_risk_register_log_path()]
+    entries = get_risk_entries()
+    assert sorted(entries[id]["description"] for id in ids) == sorted(f"risk {i}" for i in range(20))
+
+
+def test_successive_ticks_are_separate_batches(project, writes):
+    initialize_risk_log()
+    yaml_utils.flush()
+    writes.clear()
+
+    async def main():
+        first = await aio.add_risk_entry("a", "high", "low", "m")
+        second = await aio.add_risk_entry("b", "high", "low", "m")
+        return first, second, await aio.get_risk_entries()
+
+    first, second, entries = asyncio.run(main())
+    assert second == first + 1
+    assert entries[second]["description"] == "b"
+    assert len(writes) == 2
+
+
+def test_an_error_does_not_discard_the_batch(project, writes):
+    initialize_risk_log()
+    yaml_utils.flush()
+    filename = get_risk_register_log_path()
+
+    def fail():
+        raise ValueError("bad entry")
+
+    async def main():
+        state = aio._state()
+        return await asyncio.gather(aio.add_risk_entry("a", "high", "low", "m"),
+                                    state.submit(project, filename, fail),
+                                    aio.add_risk_entry("b", "high", "low", "m"),
+                                    return_exceptions=True)
+
+    first, error, second = asyncio.run(main())
+    assert isinstance(error, ValueError)
+    assert {get_risk_entries()[id]["description"] for id in (first, second)} == {"a", "b"}
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from faid.logging import SQLiteBackend, set_storage_backend, initialize_risk_log, add_risk_entry, get_risk_entries
+from faid.logging.yaml_utils import read, write, load, load_section, update, append_entry, update_entries
+
+
+@pytest.fixture
+def sqlite(project):
+    backend = SQLiteBackend()
+    set_storage_backend(backend)
+    yield backend
+    set_storage_backend(None)
+    backend.close()
+
+
+def test_yaml_log_is_imported_and_exported(project, sqlite):
+    filename = os.path.join(project.log_path, "data.yml")
+    document = {"description": {"name": "adult", "tasks": ["classification"]}, "risks": [{"name": "bias"}], "id": ""}
+    write(document, filename)
+    assert load(filename) == document
+    assert list(load(filename)) == ["description", "risks", "id"]
+    assert load(filename, keys=["risks", "missing"]) == {"risks": [{"name": "bias"}]}
+    with pytest.raises(KeyError):
+        load_section(filename, "missing")
+
+    update({"summary": "s"}, key="description", filename=filename)
+    append_entry(["risks"], {"name": "privacy"}, filename=filename, op="append")
+    update_entries([{"op": "set", "path": ["id", ], "value": "1"},
+                    {"op": "set", "path": ["new", "key"], "value": 2}], filename=filename)
+    expected = {"description": {"name": "adult", "tasks": ["classification"], "summary": "s"},
+                "risks": [{"name": "bias"}, {"name": "privacy"}], "id": "1", "new": {"key": 2}}
+    assert load(filename) == expected
+    # the yaml file is only the exchange format
+    assert read(filename) == document
+
+    sqlite.export_yaml(filename)
+    assert read(filename) == expected
+
+
+def test_changes_persist_in_the_database(project):
+    filename = os.path.join(project.log_path, "data.yml")
+    backend = SQLiteBackend()
+    backend.update({"a": 1}, key="section", filename=filename)
+    backend.close()
+    reopened = SQLiteBackend()
+    try:
+        assert reopened.load(filename) == {"section": {"a": 1}}
+    finally:
+        reopened.close()
+
+
+def test_risk_register_rows(project, sqlite):
+    initialize_risk_log()
+    ids = [add_risk_entry(f"risk {i}", "high", "low", "m") for i in range(3)]
+    assert add_risk_entry("risk 1", "high", "low", "m") is None
+    entries = get_risk_entries()
+    assert [entries[id]["description"] for id in ids] == ["risk 0", "risk 1", "risk 2"]
+    rows = sqlite.connection.execute("SELECT COUNT(*) FROM raid_entries WHERE kind = 'risks'").fetchone()[0]
+    assert rows == len(entries)
@@ -0,0 +1,55 @@
+import os
+from datetime import date
+
+from faid.logging import FairnessExperimentRecord, query_experiments, rebuild_experiment_index, yaml_utils
+
+
+def _experiment(name, start_time, tags, model="m", accuracy=None):
+    record = FairnessExperimentRecord(name)
+    record.set_context(start_time=start_time, tags=tags)
+    record.add_model_entry("name", model)
+    if accuracy is not None:
+        record.add_metric_entry({"group_name": "overall", "description": "", "label": "",
+                                 "metrics": [{"name": "accuracy", "value": accuracy}]})
+    return record
+
+
+def test_queries(project):
+    _experiment("a", "2024-04-01T10:00:00", ["nlp", "bias"], accuracy=0.8)
+    _experiment("b", "2024-05-02T10:00:00", ["nlp"], model="other")
+    _experiment("c", "2024-06-03T10:00:00", ["vision"])
+
+    assert [e["name"] for e in query_experiments()] == ["a", "b", "c"]
+    assert [e["name"] for e in query_experiments(tag="nlp")] == ["a", "b"]
+    assert [e["name"] for e in query_experiments(tag="nlp", since="2024-05-01")] == ["b"]
+    assert [e["name"] for e in query_experiments(since=date(2024, 5, 1), until="2024-06-01")] == ["b"]
+    assert [e["name"] for e in query_experiments(model="m")] == ["a", "c"]
+    assert query_experiments(tag="missing") == []
+
+    a = query_experiments(name="a")[0]
+    assert a["tags"] == ["bias", "nlp"]
+    assert a["metrics"] == {"accuracy": 0.8}
+    assert a["path"] == os.path.join(project.log_path, "fairness_a.yml")
+
+
+def test_index_follows_the_record(project):
+    record = _experiment("a", "2024-04-01T10:00:00", ["nlp"])
+    record.set_context(start_time="2024-04-01T10:00:00", tags=["vision"])
+    assert query_experiments(tag="nlp") == []
+    assert [e["name"] for e in query_experiments(tag="vision")] == ["a"]
+
+
+def test_rebuild_from_the_logs(project):
+    _experiment("a", "2024-04-01T10:00:00", ["nlp"])
+    yaml_utils.flush()
+    # a log copied into the folder outside of faid
+    document = yaml_utils.read(os.path.join(project.log_path, "fairness_a.yml"))
+    document["name"] = "copy"
+    yaml_utils.write(document, os.path.join(project.log_path, "fairness_copy.yml"))
+    assert [e["name"] for e in query_experiments(tag="nlp")] == ["a"]
+    rebuild_experiment_index()
+    assert [e["name"] for e in query_experiments(tag="nlp")] == ["a", "copy"]
+
+    os.remove(os.path.join(project.log_path, "fairness_copy.yml"))
+    assert project.experiment_index.paths() == [os.path.join(project.log_path, "fairness_a.yml")]
+    assert [e["name"] for e in query_experiments()] == ["a"]
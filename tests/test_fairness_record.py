@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from faid.logging import FairnessExperimentRecord, yaml_utils
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    written = []
+    write = yaml_utils.write
+
+    def counted(document, filename):
+        written.append(filename)
+        write(document, filename)
+
+    monkeypatch.setattr(yaml_utils, "write", counted)
+    return written
+
+
+def test_batch_writes_once(project, writes):
+    record = FairnessExperimentRecord("exp")
+    yaml_utils.flush()
+    writes.clear()
+    with record.batch():
+        for i in range(10):
+            record.add_context_entry(f"key {i}", i)
+        record.add_model_entry("name", "m")
+        # the changes are visible on the record, not in the log yet
+        assert record.get_context_entry("key 9") == 9
+        assert "key 0" not in yaml_utils.read(record.filename)["context"]
+    assert writes == [record.filename]
+    log = yaml_utils.read(record.filename)
+    assert log["context"]["key 9"] == 9 and log["model"]["name"] == "m"
+
+
+def test_batch_rollback(project):
+    record = FairnessExperimentRecord("exp")
+    record.add_context_entry("kept", 1)
+    yaml_utils.flush()
+    before = yaml_utils.read(record.filename)
+    with pytest.raises(RuntimeError):
+        with record.batch():
+            record.add_context_entry("kept", 2)
+            record.add_context_entry("discarded", 3)
+            record.log_metrics(0, {"a": {"accuracy": 0.5}})
+            with record.batch():
+                record.add_model_entry("name", "m")
+            raise RuntimeError("rollback")
+    assert record.get_context_entry("kept") == 1
+    assert record.get_context_entry("discarded") is None
+    assert record.model == {"name": ""}
+    assert not record.metrics_series
+    yaml_utils.flush()
+    assert yaml_utils.read(record.filename) == before
+
+    # the record keeps working after a rollback
+    with record.batch():
+        record.add_context_entry("after", 4)
+    assert yaml_utils.read(record.filename)["context"]["after"] == 4
@@ -0,0 +1,44 @@
+import os
+import threading
+
+from faid.logging.file_utils import file_lock, atomic_open, LOCAL_STATE_PATTERNS
+
+
+def test_locks_are_ignored(tmp_path):
+    filename = str(tmp_path / "data.yml")
+    with file_lock(filename):
+        pass
+    assert os.path.exists(filename + ".lock")
+    with open(tmp_path / ".gitignore") as file:
+        assert set(LOCAL_STATE_PATTERNS) <= set(file.read().splitlines())
+
+
+def test_existing_gitignore_is_kept(tmp_path):
+    (tmp_path / ".gitignore").write_text("custom\n")
+    with file_lock(str(tmp_path / "data.yml")):
+        pass
+    assert (tmp_path / ".gitignore").read_text() == "custom\n"
+
+
+def test_file_lock_serializes_threads(tmp_path):
+    filename = str(tmp_path / "counter")
+    with open(filename, "w") as file:
+        file.write("0")
+
+    def increment():
+        for _ in range(50):
+            with file_lock(filename):
+                with open(filename) as file:
+                    value = int(file.read())
+                with atomic_open(filename) as file:
+                    file.write(str(value + 1))
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(filename) as file:
+        assert file.read() == "200"
+    # the temporary files of the atomic writes are gone
+    assert sorted(os.listdir(tmp_path)) == [".gitignore", "counter", "counter.lock"]
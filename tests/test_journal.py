@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from faid.logging import FairnessExperimentRecord, yaml_utils
+from faid.logging.yaml_utils import load, append_entry, flush
+from faid.logging.journal import journal_size, read_journal, get_journal_path
+
+
+def test_journal_mode_appends_from_the_first_change(project):
+    record = FairnessExperimentRecord("exp", journal=True)
+    snapshot = os.stat(record.filename).st_mtime_ns
+    record.add_context_entry("a", 1)
+    record.add_context_entry("b", 2)
+    assert [entry["path"] for entry in read_journal(record.filename)] == [["context", "a"], ["context", "b"]]
+    # the log itself is not rewritten
+    assert os.stat(record.filename).st_mtime_ns == snapshot
+    assert load(record.filename)["context"]["b"] == 2
+
+
+def test_failed_append_leaves_the_document_unchanged(project, monkeypatch):
+    filename = os.path.join(project.log_path, "fairness_x.yml")
+    yaml_utils.write({"items": [1]}, filename)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(yaml_utils, "append_journal_record", fail)
+    with pytest.raises(OSError):
+        append_entry(["items"], 2, filename=filename, op="append")
+    assert load(filename) == {"items": [1]}
+    assert not os.path.exists(get_journal_path(filename))
+
+
+def test_journal_replay_and_compaction(project, monkeypatch):
+    filename = os.path.join(project.log_path, "fairness_x.yml")
+    yaml_utils.write({"items": [], "name": "a"}, filename)
+    for i in range(3):
+        append_entry(["items"], i, filename=filename, op="append")
+    append_entry(["nested", "key"], "b", filename=filename)
+    expected = {"items": [0, 1, 2], "name": "a", "nested": {"key": "b"}}
+    # the journal is replayed on top of the snapshot when the file is read again
+    assert yaml_utils.read(filename) == expected
+    assert len(read_journal(filename)) == 4
+
+    monkeypatch.setattr(yaml_utils.journal, "JOURNAL_COMPACT_THRESHOLD", 0)
+    append_entry(["name"], "c", filename=filename)
+    assert journal_size(filename) == 0
+    assert yaml_utils.read(filename) == {**expected, "name": "c"}
+    flush()
+    assert load(filename) == {**expected, "name": "c"}
+
+
+def test_partial_journal_record_is_ignored(project):
+    filename = os.path.join(project.log_path, "fairness_x.yml")
+    yaml_utils.write({"name": "a"}, filename)
+    append_entry(["name"], "b", filename=filename)
+    with open(get_journal_path(filename), "a") as file:
+        file.write("- {op: set, path: [name], val")
+    assert yaml_utils.read(filename) == {"name": "b"}
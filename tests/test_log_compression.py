@@ -0,0 +1,45 @@
+import os
+
+import zstandard
+
+from faid.logging import yaml_utils
+
+
+def _write_zst(path, text):
+    with open(path, "wb") as file:
+        file.write(zstandard.ZstdCompressor().compress(text.encode("utf-8")))
+
+
+def _large_log(project, head, tail=""):
+    filename = os.path.join(project.log_path, "large.yml")
+    # random data, so that the compressed file stays above the selective load threshold
+    padding = os.urandom(yaml_utils.SELECTIVE_LOAD_MIN_SIZE).hex()
+    _write_zst(filename + ".zst", head + f"padding: [{padding}]\n" + tail)
+    assert yaml_utils.log_size(filename) >= yaml_utils.SELECTIVE_LOAD_MIN_SIZE
+    return filename
+
+
+def test_selective_load_of_a_large_zst_log(project):
+    filename = _large_log(project, "before: 1\n", "after: {a: 2}\n")
+    assert yaml_utils.load_yaml(filename, keys=["before", "after", "missing"]) == {"before": 1, "after": {"a": 2}}
+
+
+def test_selective_load_of_a_large_zst_log_with_anchors(project):
+    # the requested value refers to an anchor in a skipped value
+    filename = _large_log(project, "base: &base {a: 1}\nderived: *base\n")
+    assert yaml_utils.load_yaml(filename, keys=["derived"]) == {"derived": {"a": 1}}
+
+
+def test_background_flush_uses_the_project_compression(project):
+    from faid.logging import set_log_compression, update, flush
+    set_log_compression("fairness", "zst")
+    filename = os.path.join(project.log_path, "fairness_x.yml")
+    flush()
+    project.store.set_flush_interval(0.05)
+    update({"a": 1}, filename=filename)
+    # the flusher thread writes the log, with no project active
+    flusher = project.store._flusher
+    assert flusher is not None
+    flusher.join(5)
+    assert os.path.exists(filename + ".zst")
+    assert not os.path.exists(filename)
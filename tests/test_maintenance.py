@@ -0,0 +1,43 @@
+from faid.logging.maintenance import compact_document, is_placeholder
+
+
+def test_compact_keeps_the_raid_ids():
+    risk = {"description": "a", "impact": "high", "likelihood": "low", "mitigation": "m"}
+    other = {**risk, "description": "b"}
+    placeholder = {"description": "", "impact": "", "likelihood": "", "mitigation": ""}
+    document, stats = compact_document({"risks": {0: placeholder, 1: risk, 2: dict(risk), 3: other}})
+    assert document == {"risks": {1: risk, 3: other}}
+    assert stats == {"duplicates": 1, "placeholders": 1}
+
+
+def test_compact_keeps_the_data_rows():
+    metric = {"name": "dp", "description": "", "value": 0, "threshold": 0, "bigger_is_better": False,
+              "label": "", "notes": "", "sg_params": {}}
+    log = {
+        "bias_metrics": [{"group_name": "sex", "description": "", "label": "", "metrics": [metric, dict(metric)]}],
+        "sample_data": {"tps": [{"x": 0, "y": 0}, {"x": 0, "y": 0}], "fps": [{"x": 0, "y": ""}]}
+    }
+    document, stats = compact_document(log)
+    # repeated metrics are duplicates, all-zero values and repeated sample rows are data
+    assert document["bias_metrics"][0]["metrics"] == [metric]
+    assert document["sample_data"] == log["sample_data"]
+    assert stats == {"duplicates": 1, "placeholders": 0}
+
+
+def test_compact_drops_the_template_entries():
+    template = {"group_name": "", "description": "", "label": "", "metrics": [
+        {"name": "", "description": "", "value": 0, "threshold": 0, "bigger_is_better": "",
+         "label": "", "notes": "", "sg_params": {}}]}
+    group = {"group_name": "sex", "description": "", "label": "", "metrics": []}
+    document, stats = compact_document({"bias_metrics": [template, group]})
+    assert document == {"bias_metrics": [group]}
+    # a list with only the template entry keeps it
+    assert compact_document({"bias_metrics": [template]})[0] == {"bias_metrics": [template]}
+
+
+def test_is_placeholder():
+    assert is_placeholder({"name": None, "mitigation_strategy": ""})
+    assert is_placeholder({"name": None, "mitigation_strategy": None})
+    assert not is_placeholder({"name": "x", "value": 0})
+    assert not is_placeholder({"value": 0, "flag": False})
+    assert not is_placeholder({})
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from faid.logging.merge import merge_logs
+from faid.logging.yaml_utils import read, write
+
+
+def _metrics(values:dict) -> list:
+    return [{"group_name": group, "description": "", "label": "",
+             "metrics": [{"name": name, "value": value} for name, value in metrics.items()]}
+            for group, metrics in values.items()]
+
+
+@pytest.fixture
+def shards(project, tmp_path):
+    paths = []
+    for i, values in enumerate([{"a": {"accuracy": 0.5, "recall": 0.1}, "overall": {"accuracy": 0.6}},
+                                {"a": {"accuracy": 0.7}, "b": {"accuracy": 0.9}, "overall": {"accuracy": 0.8}},
+                                {"a": {"accuracy": 0.6}}]):
+        path = str(tmp_path / f"node{i}" / "fairness_eval.yml")
+        os.makedirs(os.path.dirname(path))
+        write({"name": "eval", "context": {"tags": [f"node{i}"]}, "bias_metrics": _metrics(values),
+               "sample_data": {"tps": [{"y_true": 1, "y_pred": 1, "node": i}], "fps": [], "tns": [], "fns": []}}, path)
+        paths.append(path)
+    return paths
+
+
+def _values(merged:dict) -> dict:
+    return {group["group_name"]: {metric["name"]: metric["value"] for metric in group["metrics"]}
+            for group in merged["bias_metrics"]}
+
+
+@pytest.mark.parametrize("conflict, accuracy", [("first", 0.5), ("last", 0.6), ("min", 0.5), ("max", 0.7),
+                                                 ("mean", pytest.approx(0.6))])
+def test_metric_conflicts(project, shards, conflict, accuracy):
+    result = merge_logs(shards, "fairness_merged", conflict=conflict)
+    assert result["conflicts"] == 3
+    values = _values(read(result["out"]))
+    assert values["a"] == {"accuracy": accuracy, "recall": 0.1}
+    assert values["b"] == {"accuracy": 0.9}
+    assert list(values) == ["a", "overall", "b"]
+
+
+def test_conflict_error(project, shards):
+    with pytest.raises(SystemExit):
+        merge_logs(shards, "fairness_merged", conflict="error")
+    # shards that agree merge without error
+    result = merge_logs(shards[1:2] * 2, "fairness_merged", conflict="error")
+    assert result["conflicts"] == 0
+
+
+def test_other_sections_and_samples(project, shards):
+    merged = read(merge_logs(shards, "fairness_merged", seed=0)["out"])
+    assert merged["context"]["tags"] == ["node0", "node1", "node2"]
+    # by default, as many examples as the largest shard sample
+    assert len(merged["sample_data"]["tps"]) == 1
+    assert {"cell": "tps", "group": None, "seen": 3} in merged["sample_data"]["counts"]
+
+    merged = read(merge_logs(shards, "fairness_merged", k=3)["out"])
+    assert sorted(example["node"] for example in merged["sample_data"]["tps"]) == [0, 1, 2]
+
+
+def test_register_duplicates(project, tmp_path):
+    paths = []
+    for i, descriptions in enumerate([["a", "b"], ["b", "c"]]):
+        path = str(tmp_path / f"node{i}" / "risks.yml")
+        os.makedirs(os.path.dirname(path))
+        risks = {0: {"description": "", "impact": "", "likelihood": "", "mitigation": ""}}
+        risks.update({j + 1: {"description": d, "impact": f"node{i}", "likelihood": "", "mitigation": ""}
+                      for j, d in enumerate(descriptions)})
+        write({"risks": risks, "assumptions": {}, "issues": {}, "dependencies": {}}, path)
+        paths.append(path)
+
+    for conflict, impact in [("first", "node0"), ("last", "node1")]:
+        result = merge_logs(paths, os.path.join(project.log_path, f"risks_{conflict}.yml"), conflict=conflict)
+        assert result["duplicates"] == 1
+        risks = read(result["out"])["risks"]
+        assert [risk["description"] for risk in risks.values()] == ["a", "b", "c"]
+        assert list(risks) == [0, 1, 2]
+        assert risks[1]["impact"] == impact
@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pytest
+from fairlearn.metrics import MetricFrame
+from sklearn.metrics import accuracy_score
+
+from faid.logging import FairnessExperimentRecord
+from faid.logging.metric_table import save_metric_table, load_metric_table, metric_frame_to_table
+
+
+def _metric_frame(seed):
+    rng = np.random.default_rng(seed)
+    y_true = rng.integers(0, 2, 400)
+    y_pred = rng.integers(0, 2, 400)
+    groups = rng.integers(0, 8, 400).astype(str)
+    return MetricFrame(metrics={"accuracy": accuracy_score}, y_true=y_true, y_pred=y_pred, sensitive_features=groups)
+
+
+def test_rolled_back_table_keeps_the_committed_one(project, capsys):
+    record = FairnessExperimentRecord("exp")
+    committed = _metric_frame(0)
+    record.add_metric_entry_from_fairlearn(committed, columnar=True, silent=True)
+    with pytest.raises(RuntimeError):
+        with record.batch():
+            record.add_metric_entry_from_fairlearn(_metric_frame(1), columnar=True, silent=True)
+            raise RuntimeError("rollback")
+
+    frame = record.get_metric_frame()
+    assert np.allclose(frame["accuracy"].to_numpy(), committed.by_group["accuracy"].to_numpy())
+    assert "checksum" not in capsys.readouterr().out
+
+
+def test_metric_table_checksum(project, capsys):
+    filename = os.path.join(project.log_path, "fairness_exp.yml")
+    table = metric_frame_to_table(_metric_frame(0))
+    reference = save_metric_table(filename, table)
+    assert reference["sha256"][:12] in reference["path"]
+    assert np.array_equal(load_metric_table(filename, reference)["values"], table["values"])
+    assert "checksum" not in capsys.readouterr().out
+
+    # a table changed after it was logged is reported
+    other = save_metric_table(filename, metric_frame_to_table(_metric_frame(1)))
+    with open(os.path.join(project.log_path, other["path"]), "rb") as source:
+        content = source.read()
+    with open(os.path.join(project.log_path, reference["path"]), "wb") as file:
+        file.write(content)
+    load_metric_table(filename, reference)
+    assert "checksum does not match" in capsys.readouterr().out
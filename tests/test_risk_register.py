@@ -0,0 +1,22 @@
+from faid.logging import initialize_risk_log, add_risk_entry, get_risk_entries
+from faid.logging.yaml_utils import read
+from faid.logging.risk_register_utils import get_raid_register, get_risk_register_log_path
+from faid.logging.journal import journal_size
+
+
+def test_add_writes_the_register(project):
+    initialize_risk_log()
+    filename = get_risk_register_log_path()
+    id = add_risk_entry("a", "high", "low", "m")
+    # a single add rewrites the register, it does not switch it to a journal
+    assert journal_size(filename) == 0
+    assert read(filename)["risks"][id]["description"] == "a"
+    assert add_risk_entry("a", "high", "low", "m") is None
+
+
+def test_add_many(project):
+    initialize_risk_log()
+    register = get_raid_register()
+    ids = register.add_many("risks", [{"description": "a"}, {"description": "b"}, {"description": "a"}])
+    assert ids[2] is None and ids[1] == ids[0] + 1
+    assert [get_risk_entries()[id]["description"] for id in ids[:2]] == ["a", "b"]
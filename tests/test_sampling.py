@@ -0,0 +1,48 @@
+import numpy as np
+
+from faid.logging.sampling import ConfusionReservoirSampler, merge_reservoirs
+
+
+def test_cells_and_groups():
+    y_true = np.array([1, 1, 0, 0, 1, 0])
+    y_pred = np.array([1, 0, 1, 0, 1, 0])
+    group = np.array(["a", "a", "a", "b", "b", "b"])
+    sampler = ConfusionReservoirSampler(k=5, seed=0)
+    sampler.update(np.arange(6).reshape(6, 1), y_true, y_pred, group)
+    samples = sampler.samples()
+    assert [(example["features"], example["group"]) for example in samples["tps"]] == [([0], "a"), ([4], "b")]
+    assert [example["features"] for example in samples["fns"]] == [[1]]
+    assert [example["features"] for example in samples["fps"]] == [[2]]
+    assert [example["features"] for example in samples["tns"]] == [[3], [5]]
+    assert {"cell": "tns", "group": "b", "seen": 2} in sampler.counts()
+
+
+def test_reservoir_is_uniform():
+    n, k, runs = 20, 5, 4000
+    chunks = [3, 1, 7, 9]
+    included = np.zeros(n)
+    for seed in range(runs):
+        sampler = ConfusionReservoirSampler(k=k, seed=seed)
+        start = 0
+        for size in chunks:
+            rows = np.arange(start, start + size)
+            sampler.update(rows.reshape(-1, 1), np.ones(size), np.ones(size))
+            start += size
+        sample = [example["features"][0] for example in sampler.samples()["tps"]]
+        assert len(sample) == k and len(set(sample)) == k
+        included[sample] += 1
+    # each row is kept with probability k / n
+    assert np.all(np.abs(included / runs - k / n) < 0.04)
+
+
+def test_merged_reservoirs_are_uniform():
+    small = [("small", i) for i in range(10)]
+    large = [("large", i) for i in range(30)]
+    runs, k = 3000, 8
+    from_small = 0
+    for seed in range(runs):
+        merged = merge_reservoirs([(small, 10), (large, 30)], k=k, seed=seed)
+        assert len(merged) == k and len(set(merged)) == k
+        from_small += sum(1 for population, _ in merged if population == "small")
+    # the small population is a quarter of the union
+    assert abs(from_small / (runs * k) - 0.25) < 0.02
@@ -0,0 +1,66 @@
+import io
+
+import yaml
+import pytest
+
+from faid.logging import serializer
+
+DOCUMENTS = [
+    {"name": "plain", "nested": {"list": [1, 2.5, None, True], "empty": {}, "text": "a: b # c"}},
+    {"quotes": 'say "hi"', "single": "it's", "multiline": "line 1\nline 2\n"},
+    {"tab": "a\tb", "carriage": "a\rb", "unicode": "café", "spaces": "a \nb"},
+    {"": 1, "k" * 130: 2, "multi\nline": 3},
+    ["top", "level", {"list": []}],
+    "a single scalar",
+]
+
+
+@pytest.mark.parametrize("data", DOCUMENTS)
+def test_dump_matches_the_pure_emitter(data):
+    expected = yaml.dump(data, Dumper=yaml.SafeDumper, sort_keys=False, default_flow_style=False)
+    assert serializer.dump(data) == expected
+    assert serializer.parse(serializer.dump(data)) == data
+
+
+def test_dump_serializes_once(monkeypatch):
+    calls = []
+    dump = yaml.dump
+
+    def counted(*args, **kwargs):
+        calls.append(kwargs["Dumper"])
+        return dump(*args, **kwargs)
+
+    monkeypatch.setattr(serializer.yaml, "dump", counted)
+    for data in DOCUMENTS:
+        calls.clear()
+        serializer.dump(data, io.StringIO())
+        assert len(calls) == 1
+
+
+def test_parse_keys():
+    text = "a: 1\nb: {c: [1, 2]}\nlarge: [x, y, z]\nd: last\n"
+    assert serializer.parse_keys(io.StringIO(text), ["d", "b", "missing"]) == {"d": "last", "b": {"c": [1, 2]}}
+    assert serializer.parse_keys(io.StringIO(""), ["a"]) == {}
+    assert serializer.parse_keys(io.StringIO("- 1\n- 2\n"), ["a"]) == {}
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_parse_keys_with_anchors(fast):
+    text = "base: &base {a: 1}\nskipped: &list [1, 2]\nderived: *base\nmerged: {<<: *base, b: 2}\nlist: *list\n"
+    expected = yaml.safe_load(text)
+    # from a file and from a string
+    for source in (io.StringIO(text), text):
+        assert serializer.parse_keys(source, ["derived", "merged", "list"], fast=fast) == \
+            {key: expected[key] for key in ["derived", "merged", "list"]}
+    # the anchors defined in a requested value are resolved without the fallback
+    assert serializer.parse_keys(io.StringIO(text), ["base", "derived"], fast=fast) == {"base": {"a": 1}, "derived": {"a": 1}}
+
+
+def test_load_yaml_reads_only_the_requested_keys(project, monkeypatch):
+    import os
+    from faid.logging import yaml_utils
+    filename = os.path.join(project.log_path, "data.yml")
+    yaml_utils.write({"small": 1, "large": ["x" * 100] * 100}, filename)
+    monkeypatch.setattr(yaml_utils, "SELECTIVE_LOAD_MIN_SIZE", 0)
+    monkeypatch.setattr(serializer, "parse", lambda *args, **kwargs: pytest.fail("the whole file was parsed"))
+    assert yaml_utils.load_yaml(filename, keys=["small"]) == {"small": 1}
@@ -0,0 +1,82 @@
+import os
+
+from faid.logging import FaidProject
+from faid.logging.yaml_utils import new_document_store, read, write
+
+
+def _set(key, value):
+    def mutation(document):
+        document[key] = value
+        return document
+    return mutation
+
+
+def test_flush_replays_the_changes_on_top_of_other_writers(project):
+    filename = os.path.join(project.log_path, "data.yml")
+    write({"a": 0, "b": 0}, filename)
+    first, second = new_document_store(), new_document_store()
+    first.set_flush_interval(None)
+    second.set_flush_interval(None)
+    first.apply(filename, _set("a", 1))
+    # another process writes the file before the first store is flushed
+    second.apply(filename, _set("b", 2))
+    second.flush()
+    first.flush()
+    assert read(filename) == {"a": 1, "b": 2}
+    assert first.get(filename) == {"a": 1, "b": 2}
+    assert not first.is_dirty(filename)
+
+
+def test_put_overrides_other_writers(project):
+    filename = os.path.join(project.log_path, "data.yml")
+    write({"a": 0}, filename)
+    store = new_document_store()
+    store.set_flush_interval(None)
+    store.put(filename, {"c": 3})
+    write({"a": 1}, filename)
+    store.flush()
+    assert read(filename) == {"c": 3}
+
+
+def test_clean_documents_are_parsed_again_when_the_file_changes(project):
+    filename = os.path.join(project.log_path, "data.yml")
+    write({"a": 0}, filename)
+    store = new_document_store()
+    assert store.get(filename) == {"a": 0}
+    assert store.get(filename) == {"a": 0}
+    write({"a": 1, "longer": True}, filename)
+    assert store.get(filename) == {"a": 1, "longer": True}
+    assert store.cache_info()["misses"] == 2
+
+
+class _Exit:
+    """
+    Record the atexit callbacks
+    """
+
+    def __init__(self):
+        self.callbacks = []
+
+    def register(self, callback):
+        self.callbacks.append(callback)
+
+    def unregister(self, callback):
+        self.callbacks = [other for other in self.callbacks if other != callback]
+
+
+def test_closed_projects_are_not_kept_alive(tmp_path, monkeypatch):
+    from faid.logging import store, writer
+    exit = _Exit()
+    monkeypatch.setattr(store, "atexit", exit)
+    monkeypatch.setattr(writer, "atexit", exit)
+
+    other = FaidProject(str(tmp_path))
+    os.makedirs(other.log_path)
+    other.update({"a": 1}, key="a", filename="data")
+    record = other.FairnessExperimentRecord("exp", background=True)
+    record.add_context_entry("a", 1)
+    assert len(exit.callbacks) == 2
+    other.close()
+    assert exit.callbacks == []
+    assert other.store._flusher is None
+    assert read(os.path.join(other.log_path, "data.yml")) == {"a": {"a": 1}}
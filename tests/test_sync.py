@@ -0,0 +1,42 @@
+from faid.logging import init_log, sync_all, load, get_risk_entries
+
+
+def test_sync_all_on_a_new_project(project):
+    init_log()
+    result = sync_all()
+    assert result["skipped"] == []
+    assert sorted(result["synced"]) == sorted(["model_to_risk", "data_to_risk", "risk_to_data", "data_to_model",
+                                                "risk_to_model", "model_to_transparency", "data_to_transparency",
+                                                "risk_to_transparency"])
+    assert all(isinstance(risk["description"], str) for risk in get_risk_entries().values())
+    transparency = load("transparency")["risks_mitigations_and_impact_assessments"]
+    assert isinstance(transparency["risks_and_mitigations"], str)
+
+    # nothing changed, nothing to sync
+    assert sync_all()["written"] == []
+
+
+def test_sync_all_on_the_example_logs(project):
+    init_log(test=True)
+    sync_all()
+    risks = load("model")["considerations"]["risks"]
+    assert sync_all()["written"] == []
+    assert load("model")["considerations"]["risks"] == risks
+
+
+def test_local_state_is_ignored(project):
+    import os
+    import subprocess
+    from faid.logging import FairnessExperimentRecord
+    init_log()
+    FairnessExperimentRecord("exp")
+    sync_all()
+    project.flush()
+    names = set(os.listdir(project.log_path))
+    assert {"sync_state.json", "experiments.sqlite", "data.yml.lock"} <= names
+    subprocess.run(["git", "init", "-q", project.root], check=True)
+    status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=all"], cwd=project.root,
+                            capture_output=True, text=True, check=True).stdout
+    untracked = {os.path.basename(line[3:]) for line in status.splitlines()}
+    assert "data.yml" in untracked and "fairness_exp.yml" in untracked
+    assert not {name for name in untracked if name.endswith(".lock") or name.startswith(("experiments.sqlite", "sync_state"))}
@@ -0,0 +1,37 @@
+import os
+import threading
+
+from faid.logging import FairnessExperimentRecord, yaml_utils
+
+
+def _call(function, timeout=5):
+    """
+    Call a function in a thread, return what it raised, fail if it hangs
+    """
+    raised = []
+
+    def run():
+        try:
+            function()
+        except BaseException as e:
+            raised.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), f"{function.__name__} hangs"
+    return raised[0] if raised else None
+
+
+def test_background_writer_survives_a_missing_log(project):
+    record = FairnessExperimentRecord("exp", background=True)
+    record.flush()
+    # the log disappears while the writer is running: persisting exits through error_msg
+    os.remove(record.filename)
+    yaml_utils.get_document_store().discard(record.filename)
+    record.add_context_entry("a", 1)
+    assert isinstance(_call(record.writer.flush), SystemExit)
+    assert record.writer._thread.is_alive()
+
+    assert _call(record.writer.flush) is None
+    assert _call(record.close) is None